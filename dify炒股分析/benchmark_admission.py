@@ -0,0 +1,80 @@
+"""
+准入控制基准测试
+模拟上游变慢后的过载：后端同时只能处理WORKERS个任务、每个耗时SERVICE_TIME秒，客户端在CLIENT_TIMEOUT秒后放弃。
+分别统计不做准入控制与使用AdmissionController时的有效吞吐（客户端超时前完成的请求数/秒）和交互、批量请求的成功率
+"""
+import time
+import random
+import asyncio
+from collections import Counter as TallyCounter
+
+from utils.admission import AdmissionController, AdmissionRejected, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+
+WORKERS = 4
+SERVICE_TIME = 0.05
+CLIENT_TIMEOUT = 1.0
+DURATION = 5.0
+BATCH_SHARE = 0.5
+CAPACITY = WORKERS / SERVICE_TIME
+
+
+async def run(overload: float, controller: AdmissionController = None):
+    """按overload倍容量的速率发送请求，返回（有效吞吐, 各类结果计数）"""
+    backend = asyncio.Semaphore(WORKERS)
+    tally = TallyCounter()
+    rate = CAPACITY * overload
+    rng = random.Random(42)
+
+    async def work():
+        async with backend:
+            await asyncio.sleep(SERVICE_TIME)
+
+    async def one(priority: str):
+        start = time.perf_counter()
+        try:
+            if controller is None:
+                await work()
+            else:
+                async with controller.admit(priority):
+                    await work()
+        except AdmissionRejected:
+            tally[(priority, "rejected")] += 1
+            return
+        # 服务端仍会把已接收的请求做完，但客户端超时后的结果没有人读取
+        outcome = "ok" if time.perf_counter() - start <= CLIENT_TIMEOUT else "timeout"
+        tally[(priority, outcome)] += 1
+
+    tasks = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        priority = PRIORITY_BATCH if rng.random() < BATCH_SHARE else PRIORITY_INTERACTIVE
+        tasks.append(asyncio.create_task(one(priority)))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+    # 包含停止发送后处理剩余请求的时间
+    elapsed = time.perf_counter() - start
+
+    goodput = (tally[(PRIORITY_INTERACTIVE, "ok")] + tally[(PRIORITY_BATCH, "ok")]) / elapsed
+    return goodput, tally
+
+
+def success_rate(tally: TallyCounter, priority: str) -> float:
+    total = sum(count for (name, _), count in tally.items() if name == priority)
+    return tally[(priority, "ok")] / total * 100 if total else 0.0
+
+
+def main():
+    print(f"后端容量 {CAPACITY:.0f} 请求/秒，客户端超时 {CLIENT_TIMEOUT}s，批量请求占比 {BATCH_SHARE:.0%}")
+    print(f"{'负载':<6}{'准入控制':<10}{'有效吞吐':>10}{'占容量':>8}{'交互成功率':>12}{'批量成功率':>12}")
+    for overload in (1, 2, 10):
+        for label, controller in (
+            ("无", None),
+            ("有", AdmissionController(max_in_flight=WORKERS, max_queue=WORKERS * 16, max_wait=CLIENT_TIMEOUT / 2)),
+        ):
+            goodput, tally = asyncio.run(run(overload, controller))
+            print(f"{overload:>3}x  {label:<10}{goodput:>10.1f}{goodput / CAPACITY:>8.0%}"
+                  f"{success_rate(tally, PRIORITY_INTERACTIVE):>11.1f}%{success_rate(tally, PRIORITY_BATCH):>11.1f}%")
+
+
+if __name__ == "__main__":
+    main()
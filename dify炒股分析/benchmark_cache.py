@@ -0,0 +1,134 @@
+"""
+持久化缓存基准测试
+测量进程重启后的预热耗时、首个请求耗时以及缓存命中率
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import subprocess
+import logging
+import numpy as np
+import pandas as pd
+
+from utils.cache import SimpleCache, PersistentCache, TieredCache, generate_cache_key
+
+# 配置日志
+logging.basicConfig(
+    level=logging.WARNING,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SYMBOL_COUNT = 300
+HISTORY_DAYS = 250
+
+
+def build_stock_data(stock_code: str, days: int = HISTORY_DAYS) -> dict:
+    """构造与StockDataService返回结构一致的测试数据"""
+    rng = np.random.default_rng(int(stock_code))
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+    raw_data = pd.DataFrame({
+        '日期': pd.date_range(end='2024-12-31', periods=days, freq='B'),
+        '开盘': close * 0.99,
+        '收盘': close,
+        '最高': close * 1.02,
+        '最低': close * 0.98,
+        '成交量': rng.integers(1_000_000, 10_000_000, days)
+    })
+    return {
+        'stock_info': {'code': stock_code, 'name': f'股票{stock_code}', 'market': 'A',
+                       'current_price': float(close[-1]), 'change': None, 'change_percent': None},
+        'recent_data': [],
+        'raw_data': raw_data
+    }
+
+
+def cache_key(stock_code: str) -> str:
+    return generate_cache_key("stock_data", stock_code=stock_code, market_type="A", days=60)
+
+
+def populate(db_path: str):
+    """写入持久化缓存，模拟上一个进程留下的数据"""
+    store = PersistentCache(db_path)
+    start = time.perf_counter()
+    for i in range(SYMBOL_COUNT):
+        code = f"{600000 + i:06d}"
+        store.set(cache_key(code), build_stock_data(code), 3600)
+    elapsed = (time.perf_counter() - start) * 1000
+    store.close()
+    print(f"写入 {SYMBOL_COUNT} 条缓存耗时: {elapsed:.1f}ms "
+          f"(文件大小 {os.path.getsize(db_path) / 1024:.0f}KB)")
+
+
+def child_main(db_path: str):
+    """子进程：模拟服务冷启动后的预热与首个请求"""
+    boot_start = time.perf_counter()
+    tiered = TieredCache(SimpleCache(), PersistentCache(db_path))
+    open_ms = (time.perf_counter() - boot_start) * 1000
+
+    loaded = tiered.warm_up(SYMBOL_COUNT)
+
+    start = time.perf_counter()
+    value = tiered.get(cache_key("600000"))
+    first_get_ms = (time.perf_counter() - start) * 1000
+
+    print(json.dumps({
+        "open_ms": round(open_ms, 2),
+        "warm_up_ms": round(tiered.warm_up_ms, 2),
+        "warm_loaded": loaded,
+        "first_get_ms": round(first_get_ms, 3),
+        "first_get_hit": value is not None
+    }))
+
+
+def measure_hit_rate(db_path: str, warm: bool, requests: int = 5000) -> dict:
+    """按Zipf分布模拟请求，统计命中率"""
+    tiered = TieredCache(SimpleCache(), PersistentCache(db_path))
+    if warm:
+        tiered.warm_up(SYMBOL_COUNT)
+
+    rng = random.Random(42)
+    weights = [1 / (rank + 1) for rank in range(SYMBOL_COUNT * 2)]
+    codes = [f"{600000 + i:06d}" for i in range(SYMBOL_COUNT * 2)]
+    for code in rng.choices(codes, weights=weights, k=requests):
+        if tiered.get(cache_key(code)) is None:
+            tiered.set(cache_key(code), build_stock_data(code, 30), 3600)
+    stats = tiered.get_stats()
+    tiered.close()
+    return stats
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench_cache.db")
+        populate(db_path)
+
+        output = subprocess.check_output(
+            [sys.executable, __file__, "--child", db_path],
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        startup = json.loads(output.decode().strip().splitlines()[-1])
+        print(f"冷启动打开数据库: {startup['open_ms']}ms")
+        print(f"预热 {startup['warm_loaded']} 条: {startup['warm_up_ms']}ms")
+        print(f"首个请求: {startup['first_get_ms']}ms, 命中: {startup['first_get_hit']}")
+
+        for warm in (False, True):
+            # 每轮使用独立副本，避免上一轮写入的数据影响结果
+            run_path = os.path.join(tmp_dir, f"bench_cache_{int(warm)}.db")
+            shutil.copy(db_path, run_path)
+            stats = measure_hit_rate(run_path, warm)
+            label = "预热后" if warm else "未预热"
+            print(f"{label}: 命中率 {stats['hit_rate']:.2%} "
+                  f"(内存 {stats['memory_hits']}, 持久化 {stats['persistent_hits']}, "
+                  f"未命中 {stats['misses']})")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--child":
+        child_main(sys.argv[2])
+    else:
+        main()
@@ -0,0 +1,73 @@
+"""
+计算调度基准测试
+对比在事件循环中直接计算、进程池不可用时的线程池回退与进程池计算的吞吐量，以及计算期间事件循环的最大阻塞时间
+"""
+import os
+import time
+import asyncio
+
+from benchmark_cache import build_stock_data
+from services.compute_scheduler import ComputeScheduler
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """周期性唤醒，记录事件循环的最大延迟（毫秒）"""
+    max_lag = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, time.perf_counter() - start - interval)
+    return max_lag * 1000
+
+
+async def run(scheduler: ComputeScheduler, samples: list, concurrency: int):
+    """并发执行分析任务，返回（每秒请求数, 事件循环最大延迟毫秒）"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(stock_data):
+        async with semaphore:
+            indicators = await scheduler.compute_indicators(stock_data['raw_data'])
+            await scheduler.generate_report(stock_data['stock_info'], indicators,
+                                            stock_data['recent_data'])
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(stock_data) for stock_data in samples))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return len(samples) / elapsed, await lag_task
+
+
+async def main():
+    rows = 250
+    requests = 400
+    samples = [build_stock_data(f"{600000 + i % 50:06d}", rows) for i in range(requests)]
+    cpu_count = os.cpu_count() or 1
+
+    print(f"{requests} 次分析，每次 {rows} 行，CPU核数 {cpu_count}")
+    print(f"{'模式':<16}{'请求/秒':>10}{'循环最大阻塞(ms)':>20}")
+
+    inline = ComputeScheduler(enabled=False, inline_max_rows=rows)
+    rps, lag = await run(inline, samples, concurrency=cpu_count * 2)
+    print(f"{'inline':<16}{rps:>10.1f}{lag:>20.1f}")
+
+    # 进程池不可用时的回退路径
+    threaded = ComputeScheduler(enabled=False, inline_max_rows=0)
+    rps, lag = await run(threaded, samples, concurrency=cpu_count * 2)
+    print(f"{'thread':<16}{rps:>10.1f}{lag:>20.1f}")
+
+    workers = 1
+    while workers <= cpu_count:
+        scheduler = ComputeScheduler(max_workers=workers, inline_max_rows=0)
+        scheduler.start()
+        try:
+            rps, lag = await run(scheduler, samples, concurrency=workers * 2)
+        finally:
+            scheduler.shutdown()
+        print(f"{'pool x' + str(workers):<16}{rps:>10.1f}{lag:>20.1f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+数据获取链路压测（不访问网络或只在录制时访问）
+每个场景用CONCURRENCY个并发请求获取一组股票的日线，经过线程池、重试、熔断和缓存，
+统计吞吐、请求耗时分位数、失败数以及实际发出的上游调用次数（含重试）：
+- DATA_SOURCE=synthetic（默认）：合成行情，按SCENARIOS注入不同的上游延迟和错误率
+- DATA_SOURCE=record：调用FIXTURE_RECORD_SOURCE并录制夹具（akshare时使用RECORD_CODES）
+- DATA_SOURCE=replay：回放已录制的夹具，结果可重复，适合在CI中做性能回归
+"""
+import os
+
+os.environ.setdefault("DATA_SOURCE", "synthetic")
+os.environ.setdefault("REQUEST_DELAY", "0")
+
+import time
+import asyncio
+import logging
+import statistics
+from typing import List
+
+from config import settings
+from services.data_source import data_source
+from services.fixture_source import FixtureRecorder, FixtureReplayer
+from services.stock_data_service import stock_data_service
+from services.synthetic_market import SyntheticMarket
+from utils.cache import cache
+
+SYMBOLS = 64
+CONCURRENCY = 16
+DAYS = 120
+# (上游延迟中位数ms, 错误率)
+SCENARIOS = [(0, 0.0), (50, 0.0), (200, 0.0), (50, 0.05)]
+# 录制真实接口时使用的股票
+RECORD_CODES = ["600519", "000001", "600036", "601318", "000858", "600276", "000333", "601166",
+                "600030", "002415", "300750", "600900", "601888", "000651", "688981", "600887"]
+
+
+async def run(codes: List[str]):
+    """返回（总耗时, 各请求耗时, 失败数）"""
+    data_source.calls.clear()
+    cache.clear()
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(code: str):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await stock_data_service.get_stock_data(code, "A", DAYS)
+                return time.perf_counter() - start, True
+            except Exception:
+                return time.perf_counter() - start, False
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(code) for code in codes))
+    elapsed = time.perf_counter() - start
+    return elapsed, [duration for duration, _ in results], sum(1 for _, ok in results if not ok)
+
+
+def report(label: str, codes: List[str]):
+    elapsed, durations, failures = asyncio.run(run(codes))
+    durations.sort()
+    p95 = durations[max(int(len(durations) * 0.95) - 1, 0)]
+    print(f"{label:<14}{len(codes) / elapsed:>12.1f}{statistics.median(durations) * 1000:>10.0f}"
+          f"{p95 * 1000:>10.0f}{failures:>6}{sum(data_source.calls.values()):>10}")
+
+
+def main():
+    # 注入错误时重试和失败日志很多，只输出统计结果
+    logging.disable(logging.CRITICAL)
+    print(f"数据源 {settings.DATA_SOURCE}，并发 {CONCURRENCY}，每只 {DAYS} 天日线")
+    print(f"{'场景':<14}{'吞吐(只/秒)':>12}{'p50(ms)':>10}{'p95(ms)':>10}{'失败':>6}{'上游调用':>10}")
+
+    if isinstance(data_source, SyntheticMarket):
+        codes = data_source.universe("A")[:SYMBOLS]
+        for latency_ms, error_rate in SCENARIOS:
+            data_source.latency_ms = latency_ms
+            data_source.error_rate = error_rate
+            report(f"{latency_ms}ms/{error_rate:.0%}", codes)
+    elif isinstance(data_source, FixtureRecorder):
+        source = data_source.source
+        codes = source.universe("A")[:SYMBOLS] if isinstance(source, SyntheticMarket) else RECORD_CODES
+        report("录制", codes)
+        print(f"夹具已写入 {settings.FIXTURE_DIR}")
+    elif isinstance(data_source, FixtureReplayer):
+        codes = data_source.symbols("stock_zh_a_hist")[:SYMBOLS]
+        if not codes:
+            raise SystemExit(f"{settings.FIXTURE_DIR} 中没有夹具，请先用 DATA_SOURCE=record 运行")
+        latency = "录制耗时" if data_source.latency_ms < 0 else f"{data_source.latency_ms:g}ms"
+        report(f"回放({latency})", codes)
+    else:
+        raise SystemExit("请使用 DATA_SOURCE=synthetic、record 或 replay 运行")
+
+
+if __name__ == "__main__":
+    main()
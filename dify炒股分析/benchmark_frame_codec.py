@@ -0,0 +1,73 @@
+"""
+数据帧序列化基准测试
+对比pickle、JSON与二进制帧编码在1年和10年日线数据上的耗时和体积
+"""
+import io
+import time
+import pickle
+import numpy as np
+import pandas as pd
+
+from utils.frame_codec import encode_frame, decode_frame, decode_arrays
+
+
+def build_history(days: int) -> pd.DataFrame:
+    """构造与akshare stock_zh_a_hist结构一致的日线数据"""
+    rng = np.random.default_rng(days)
+    close = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.02, days))), 2)
+    volume = rng.integers(100_000, 5_000_000, days)
+    return pd.DataFrame({
+        '日期': pd.date_range(end='2024-12-31', periods=days, freq='B').date,
+        '股票代码': '600519',
+        '开盘': np.round(close * 0.99, 2),
+        '收盘': close,
+        '最高': np.round(close * 1.02, 2),
+        '最低': np.round(close * 0.98, 2),
+        '成交量': volume,
+        '成交额': np.round(volume * close * 100, 2),
+        '振幅': np.round(rng.uniform(0, 10, days), 2),
+        '涨跌幅': np.round(rng.normal(0, 2, days), 2),
+        '涨跌额': np.round(rng.normal(0, 0.2, days), 2),
+        '换手率': np.round(rng.uniform(0, 5, days), 2)
+    })
+
+
+def timeit(func, repeat: int) -> float:
+    """返回单次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def bench(label: str, df: pd.DataFrame, repeat: int):
+    codecs = {
+        'pickle': (
+            lambda: pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL),
+            pickle.loads
+        ),
+        'json': (
+            lambda: df.to_json(orient='split', date_format='iso').encode('utf-8'),
+            lambda data: pd.read_json(io.StringIO(data.decode('utf-8')), orient='split')
+        ),
+        'frame f8': (lambda: encode_frame(df), decode_frame),
+        'frame f4': (lambda: encode_frame(df, price_dtype='<f4'), decode_frame),
+        'arrays f8': (lambda: encode_frame(df), decode_arrays),
+    }
+
+    print(f"\n{label} ({len(df)} 行)")
+    print(f"{'格式':<10}{'字节数':>10}{'编码(us)':>12}{'解码(us)':>12}")
+    for name, (encode, decode) in codecs.items():
+        data = encode()
+        encode_us = timeit(encode, repeat)
+        decode_us = timeit(lambda: decode(data), repeat)
+        print(f"{name:<10}{len(data):>10}{encode_us:>12.1f}{decode_us:>12.1f}")
+
+
+def main():
+    bench("1年日线", build_history(250), repeat=200)
+    bench("10年日线", build_history(2500), repeat=50)
+
+
+if __name__ == "__main__":
+    main()
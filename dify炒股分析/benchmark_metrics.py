@@ -0,0 +1,68 @@
+"""
+监控指标开销基准测试
+测量计数器/直方图单次更新耗时、请求耗时中间件对单个请求的额外开销，以及/metrics导出耗时
+"""
+import time
+import asyncio
+
+from utils.metrics import Counter, Histogram, MetricsMiddleware, register_metric, render_prometheus
+
+REPEAT = 100_000
+
+
+def timeit(func, repeat: int) -> float:
+    """返回单次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+async def _app(scope, receive, send):
+    """最简ASGI应用，用于隔离中间件本身的开销"""
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+class _Route:
+    path = "/analyze-stock/"
+
+
+async def time_asgi(app, repeat: int) -> float:
+    """返回单个请求的平均处理耗时（微秒）"""
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        scope = {"type": "http", "method": "POST", "path": "/analyze-stock/", "route": _Route}
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    counter = register_metric(Counter("bench_requests_total", "基准测试计数器", labelnames=("market",)))
+    histogram = register_metric(Histogram("bench_duration_seconds", "基准测试直方图", labelnames=("stage", "source")))
+
+    print(f"{'操作':<28}{'耗时(us)':>12}")
+    print(f"{'Counter.inc':<28}{timeit(lambda: counter.inc(market='A'), REPEAT):>12.2f}")
+    print(f"{'Histogram.observe':<28}{timeit(lambda: histogram.observe(0.003, stage='compute', source='run'), REPEAT):>12.2f}")
+
+    bare = asyncio.run(time_asgi(_app, REPEAT))
+    wrapped = asyncio.run(time_asgi(MetricsMiddleware(_app), REPEAT))
+    print(f"{'ASGI请求（无中间件）':<28}{bare:>12.2f}")
+    print(f"{'ASGI请求（MetricsMiddleware）':<28}{wrapped:>12.2f}")
+    print(f"{'中间件额外开销':<28}{wrapped - bare:>12.2f}")
+
+    # 模拟较多序列时的导出耗时
+    for i in range(200):
+        histogram.observe(0.01, stage=f"stage{i % 20}", source=f"source{i // 20}")
+    text = render_prometheus()
+    print(f"{'/metrics导出':<28}{timeit(render_prometheus, 200):>12.2f}  ({len(text.splitlines())} 行)")
+
+
+if __name__ == "__main__":
+    main()
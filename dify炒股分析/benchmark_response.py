@@ -0,0 +1,121 @@
+"""
+响应序列化基准测试
+对比FastAPI通用序列化（Dict[str, Any] + jsonable_encoder + json）与强类型模型 + orjson在250根K线响应上的耗时，
+以及字段投影和gzip/brotli压缩后的响应字节数
+"""
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+from models.response_models import (
+    StockAnalysisResponse, StockAnalysisData, StockInfo, TechnicalSummary,
+    RecentData, AnalysisReport
+)
+from services.technical_analysis import technical_analysis
+from services.report_generator import report_generator
+from services.analysis_pipeline import parse_fields, project_response
+from utils.compression import compress, HAS_BROTLI
+from utils.json_response import FastJSONResponse, HAS_ORJSON, dumps as json_dumps
+
+BARS = 250
+
+
+class LegacyStockAnalysisResponse(BaseModel):
+    """改造前的响应模型（data为无类型字典）"""
+    status: str
+    data: Dict[str, Any]
+    message: Optional[str] = None
+    timestamp: datetime = Field(default_factory=datetime.now)
+
+
+def build_payload(bars: int):
+    """构造包含bars根K线的分析结果"""
+    rng = np.random.default_rng(bars)
+    close = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.02, bars))), 2)
+    raw_data = pd.DataFrame({
+        '日期': pd.date_range(end='2024-12-31', periods=bars, freq='B'),
+        '开盘': np.round(close * 0.99, 2),
+        '收盘': close,
+        '最高': np.round(close * 1.02, 2),
+        '最低': np.round(close * 0.98, 2),
+        '成交量': rng.integers(1_000_000, 10_000_000, bars)
+    })
+    recent_data = [
+        {
+            'date': row['日期'].strftime('%Y-%m-%d'),
+            'open': float(row['开盘']),
+            'close': float(row['收盘']),
+            'high': float(row['最高']),
+            'low': float(row['最低']),
+            'volume': int(row['成交量']),
+            'amount': None
+        }
+        for _, row in raw_data.iterrows()
+    ]
+    stock_info = {'code': '600519', 'name': '贵州茅台', 'market': 'A',
+                  'current_price': float(close[-1]), 'change': None, 'change_percent': None}
+    indicators = technical_analysis.calculate_all_indicators(raw_data)
+    report = report_generator.generate_analysis_report(stock_info, indicators, recent_data)
+    summary = {field: indicators.get(field) for field in TechnicalSummary.model_fields}
+    return stock_info, summary, recent_data, report
+
+
+def timeit(func, repeat: int) -> float:
+    """返回单次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    stock_info, summary, recent_data, report = build_payload(BARS)
+    data = {'stock_info': stock_info, 'technical_summary': summary,
+            'recent_data': recent_data, 'report': report}
+
+    def legacy():
+        result = LegacyStockAnalysisResponse(status="success", data=data)
+        return JSONResponse(jsonable_encoder(result)).body
+
+    def typed():
+        result = StockAnalysisResponse(
+            status="success",
+            data=StockAnalysisData(
+                stock_info=StockInfo(**stock_info),
+                technical_summary=TechnicalSummary(**summary),
+                recent_data=[RecentData(**item) for item in recent_data],
+                report=AnalysisReport(**report)
+            )
+        )
+        return FastJSONResponse(result).body
+
+    typed_result = StockAnalysisResponse(status="success", data=StockAnalysisData(**data))
+    projection = parse_fields("stock_info.current_price,technical_summary.rsi,technical_summary.ma5")
+
+    cases = {
+        'Dict + jsonable_encoder + json': legacy,
+        '类型模型 + FastJSONResponse': typed,
+        '仅序列化（命中结果缓存）': lambda: FastJSONResponse(typed_result).body,
+        '字段投影（3个字段）': lambda: json_dumps(project_response(typed_result, projection)),
+    }
+
+    print(f"{BARS} 根K线响应，orjson: {'已安装' if HAS_ORJSON else '未安装'}，"
+          f"brotli: {'已安装' if HAS_BROTLI else '未安装'}")
+    print(f"{'方式':<32}{'字节数':>10}{'gzip字节数':>12}{'耗时(us)':>12}")
+    for name, func in cases.items():
+        body = func()
+        print(f"{name:<32}{len(body):>10}{len(compress(body, 'gzip')):>12}{timeit(func, 300):>12.1f}")
+
+    body = cases['仅序列化（命中结果缓存）']()
+    encodings = ['gzip'] + (['br'] if HAS_BROTLI else [])
+    for encoding in encodings:
+        print(f"{encoding}压缩完整响应耗时(us): {timeit(lambda: compress(body, encoding), 300):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@
 配置文件
 """
 import os
-from typing import List
+from typing import Dict, List
 from pydantic_settings import BaseSettings
 
 
@@ -26,17 +26,67 @@ class Settings(BaseSettings):
     
     # API密钥配置（用于Bearer Token认证）
     VALID_API_KEYS: List[str] = ["xue1234", "test_api_key"]
+    ADMIN_API_KEYS: List[str] = ["xue1234"]  # 允许访问管理接口的API密钥
     
     # 缓存配置
     REDIS_URL: str = "redis://localhost:6379/0"
     CACHE_EXPIRE_SECONDS: int = 300  # 5分钟
+    MEMORY_CACHE_MAX_ENTRIES: int = 2000  # 内存缓存最大条目数，超出后按LRU淘汰
+    CACHE_STATS_TOP_N: int = 10           # 缓存统计中返回的热点键数量
+
+    # 持久化缓存配置（进程重启后仍可命中，避免冷启动时集中请求akshare）
+    PERSISTENT_CACHE_ENABLED: bool = False
+    PERSISTENT_CACHE_PATH: str = "cache/stock_cache.db"
+    PERSISTENT_CACHE_WARM_LIMIT: int = 500  # 启动时预加载到内存的最大条目数
+    CACHE_SCHEMA_VERSION: int = 3           # 缓存数据结构版本，升级后旧缓存自动失效
+
+    # HTTP条件请求配置
+    RESPONSE_SCHEMA_VERSION: int = 1         # 分析接口响应结构版本，参与ETag计算
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000   # 分析结果缓存的最大条目数
+    HTTP_CACHE_MAX_AGE_TRADING: int = 30     # 交易时间内的Cache-Control max-age（秒）
+    HTTP_CACHE_MAX_AGE_CLOSED: int = 1800    # 休市期间的Cache-Control max-age上限（秒）
     
+    # 计算任务配置（技术指标计算在进程池中执行，避免阻塞事件循环）
+    COMPUTE_PROCESS_POOL_ENABLED: bool = True
+    COMPUTE_WORKERS: int = 0               # 进程池大小，0表示按CPU核数
+    COMPUTE_INLINE_MAX_ROWS: int = 30      # 不超过该行数的数据直接在事件循环中计算
+
+    # 批量分析配置（NDJSON流式输出，每完成一只股票输出一行）
+    BATCH_MAX_SYMBOLS: int = 500           # 单次批量分析的最大股票数
+    BATCH_CONCURRENCY: int = 8             # 同时进行分析的股票数
+
+    # 实时推送配置
+    SPOT_CACHE_SECONDS: int = 10           # 交易时间内实时行情快照的缓存时间（秒）
+    LIVE_UPDATE_INTERVAL: int = 5          # 交易时间内的推送刷新间隔（秒）
+    LIVE_UPDATE_CLOSED_INTERVAL: int = 300 # 休市期间的推送刷新间隔上限（秒）
+    LIVE_HISTORY_DAYS: int = 120           # 计算实时指标所用的历史数据天数
+    LIVE_MAX_SYMBOLS_PER_CLIENT: int = 50  # 单个订阅最多包含的股票数
+    LIVE_HEARTBEAT_SECONDS: int = 15       # 无更新时发送心跳的间隔（秒）
+
+    # 市场概览配置
+    MARKET_OVERVIEW_TOP_N: int = 3         # 每个行业返回的领涨股数量
+    SECTOR_MAP_CACHE_SECONDS: int = 86400  # 个股行业分类的缓存时间（秒），每天更新一次即可
+
     # 数据源配置
     AKSHARE_TIMEOUT: int = 30
     MAX_RETRY_ATTEMPTS: int = 5  # 增加重试次数以提高成功率
     ENABLE_REAL_DATA: bool = True   # 启用真实数据获取
     USE_MOCK_DATA: bool = False     # 禁用模拟数据，只返回真实数据
     OFFLINE_MODE: bool = False      # 完全离线模式
+    DATA_SOURCE: str = "akshare"    # 行情数据源：akshare（真实接口）、synthetic（合成行情）、record（录制）或 replay（回放）
+
+    # 合成行情配置（DATA_SOURCE=synthetic时生效，模拟数据模式也用它生成K线）
+    SYNTHETIC_SEED: int = 0                 # 随机种子，相同种子生成相同的行情
+    SYNTHETIC_LATENCY_MS: float = 0.0       # 每次调用注入的延迟中位数（毫秒）
+    SYNTHETIC_LATENCY_JITTER: float = 0.5   # 延迟的对数正态分布sigma，越大长尾越明显
+    SYNTHETIC_ERROR_RATE: float = 0.0       # 每次调用失败的概率
+    SYNTHETIC_UNIVERSE_SIZE: int = 300      # 实时行情快照中每个市场的股票数
+
+    # 录制与回放配置（record：调用FIXTURE_RECORD_SOURCE并把结果写入夹具；replay：只读夹具，不访问网络）
+    FIXTURE_DIR: str = "fixtures/akshare"
+    FIXTURE_RECORD_SOURCE: str = "akshare"     # 被录制的数据源：akshare 或 synthetic
+    FIXTURE_REPLAY_LATENCY_MS: float = -1.0    # 回放时每次调用的延迟（毫秒），小于0时按录制时的实际耗时
+    FIXTURE_REPLAY_LATENCY_SCALE: float = 1.0  # 按录制耗时回放时的倍数
 
     # 重试机制配置
     RETRY_BASE_DELAY: float = 1.0      # 基础延迟时间（秒）
@@ -73,8 +123,45 @@ class Settings(BaseSettings):
     LOG_RETENTION: str = "30 days"
     
     # 限流配置
+    RATE_LIMIT_ENABLED: bool = True
     RATE_LIMIT_REQUESTS: int = 100
     RATE_LIMIT_WINDOW: int = 60  # 60秒窗口
+    RATE_LIMIT_BACKEND: str = "memory"           # memory 或 redis（多进程部署时共享配额，使用REDIS_URL）
+    RATE_LIMIT_KEY_LIMITS: Dict[str, int] = {}   # 按API密钥单独配置窗口内请求数，0表示不限流
+    RATE_LIMIT_EXEMPT_PATHS: List[str] = ["/", "/health", "/livez", "/readyz", "/metrics",
+                                          "/docs", "/redoc", "/openapi.json"]
+
+    # 响应压缩配置（客户端Accept-Encoding协商，优先brotli，未安装brotli时使用gzip）
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024        # 小于该字节数的响应不压缩
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+
+    # 监控指标配置
+    METRICS_ENABLED: bool = True              # 是否开放/metrics（Prometheus文本格式）
+    METRICS_MAX_SERIES: int = 1000            # 每个指标的标签组合上限，超出后归入__overflow__
+    METRICS_SYMBOL_LABELS: bool = False       # 是否按股票代码打标签（基数与股票数量相同，默认关闭）
+    METRICS_LOOP_LAG_INTERVAL: float = 0.5    # 事件循环延迟采样间隔（秒）
+
+    # 准入控制（分析任务的并发上限与排队，超出时返回503；批量请求优先被拒绝）
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_IN_FLIGHT: int = 16           # 同时执行的分析任务数
+    ADMISSION_MAX_QUEUE: int = 64               # 排队任务数上限
+    ADMISSION_MAX_WAIT: float = 5.0             # 最长排队时间（秒），预计等待超过该值时直接拒绝
+    ADMISSION_BATCH_QUEUE_RATIO: float = 0.25   # 批量请求最多占用的队列比例
+
+    # 熔断配置（按akshare接口分别熔断）
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5     # 连续失败次数达到该值后打开熔断器
+    CIRCUIT_BREAKER_RECOVERY_SECONDS: float = 30   # 打开后经过该秒数放行一个探测请求
+
+    # 健康检查配置（依赖探测在后台定时执行，健康检查接口只读取最近一次结果）
+    HEALTH_PROBE_INTERVAL: float = 15        # 探测间隔（秒）
+    HEALTH_PROBE_TIMEOUT: float = 3          # 单次探测超时（秒）
+    HEALTH_UPSTREAM_URLS: List[str] = ["https://push2.eastmoney.com", "https://quote.eastmoney.com"]
+    HEALTH_MAX_LOOP_LAG: float = 0.5         # 事件循环延迟超过该秒数视为饱和
+    HEALTH_MAX_IN_PROGRESS: int = 200        # 处理中的HTTP请求数上限
+    HEALTH_MAX_UPSTREAM_IN_FLIGHT: int = 16  # 进行中的akshare调用数上限（占用默认线程池）
+    HEALTH_MAX_COMPUTE_PENDING_RATIO: float = 4.0  # 计算进程池排队任务数 / 进程数 的上限
     
     class Config:
         env_file = ".env"
@@ -93,6 +180,14 @@ SUPPORTED_MARKETS = {
     "ETF": "ETF基金"
 }
 
+# 市场概览展示的主要指数（代码 -> 名称）
+MAIN_INDICES = {
+    "A": {"000001": "上证指数", "399001": "深证成指", "399006": "创业板指", "000300": "沪深300", "000688": "科创50"},
+    "ETF": {"000001": "上证指数", "399001": "深证成指", "000300": "沪深300"},
+    "HK": {"HSI": "恒生指数", "HSCEI": "国企指数", "HSTECH": "恒生科技指数"},
+    "US": {}
+}
+
 # 股票代码格式验证规则
 STOCK_CODE_PATTERNS = {
     "A": r"^[0-9]{6}$",           # A股：6位数字
@@ -105,10 +200,12 @@ STOCK_CODE_PATTERNS = {
 ERROR_MESSAGES = {
     "INVALID_STOCK_CODE": "股票代码格式不正确",
     "INVALID_MARKET_TYPE": "不支持的市场类型",
+    "INVALID_FIELDS": "不支持的响应字段",
     "DATA_NOT_FOUND": "未找到股票数据",
     "CALCULATION_ERROR": "技术指标计算失败",
     "NETWORK_ERROR": "网络请求失败",
     "RATE_LIMIT_EXCEEDED": "请求频率超限",
+    "SERVICE_OVERLOADED": "服务繁忙，请稍后重试",
     "UNAUTHORIZED": "认证失败",
     "INTERNAL_ERROR": "内部服务器错误"
 }
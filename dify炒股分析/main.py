@@ -1,29 +1,44 @@
 """
 股票分析系统API服务
 """
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
+import asyncio
 import logging
+import re
+from contextlib import asynccontextmanager, nullcontext
 from datetime import datetime
-from typing import Dict, Any
+from typing import AsyncIterator, Dict, Any, List, Optional
 
 # 导入配置和模型
-from config import settings, ERROR_MESSAGES
-from models.request_models import StockAnalysisRequest, MarketOverviewRequest
+from config import settings, ERROR_MESSAGES, SUPPORTED_MARKETS, STOCK_CODE_PATTERNS
+from models.request_models import (
+    StockAnalysisRequest, BatchAnalysisRequest, MarketOverviewRequest, CacheInvalidateRequest
+)
 from models.response_models import (
-    StockAnalysisResponse, MarketOverviewResponse, 
-    ErrorResponse, HealthCheckResponse
+    StockAnalysisResponse, MarketOverviewResponse,
+    ErrorResponse, HealthCheckResponse, CacheAdminResponse, PipelineStatsResponse
 )
 
 # 导入服务
-from services.stock_data_service import stock_data_service
-from services.technical_analysis import technical_analysis
-from services.report_generator import report_generator
+from services.compute_scheduler import compute_scheduler
+from services.health import health_monitor
+from services.analysis_pipeline import (
+    analysis_pipeline, AnalysisContext, FieldProjection, stage_duration, parse_fields, project_data
+)
+from services.live_updates import live_update_hub
+from services.market_overview import market_overview_service
 
 # 导入认证
-from utils.auth import get_current_api_key
+from utils.auth import get_current_api_key, get_admin_api_key
+from utils.cache import cache, cache_registry
+from utils.json_response import FastJSONResponse, dumps as json_dumps
+from utils.rate_limiter import rate_limiter, RateLimitMiddleware
+from utils.admission import admission_controller, AdmissionRejected, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from utils.compression import CompressionMiddleware
+from utils.metrics import MetricsMiddleware, loop_lag_monitor, render_prometheus
 
 # 配置日志
 logging.basicConfig(
@@ -32,15 +47,49 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期管理"""
+    # 启动时从持久化缓存预热，避免重启后流量集中打到akshare
+    cache.warm_up(settings.PERSISTENT_CACHE_WARM_LIMIT)
+    compute_scheduler.start()
+    # 事件循环延迟同时用于就绪检查，不随METRICS_ENABLED关闭
+    loop_lag_monitor.start()
+    health_monitor.start()
+    yield
+    # 先标记为未就绪，负载均衡摘除后再释放资源
+    await health_monitor.stop()
+    await loop_lag_monitor.stop()
+    await live_update_hub.close()
+    await rate_limiter.backend.close()
+    compute_scheduler.shutdown()
+    cache.close()
+
+
 # 创建FastAPI应用
 app = FastAPI(
     title=settings.API_TITLE,
     version=settings.API_VERSION,
     description=settings.API_DESCRIPTION,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
+# 添加限流中间件（位于CORS中间件内层，429响应同样带有CORS头部）
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        limiter=rate_limiter,
+        exempt_paths=settings.RATE_LIMIT_EXEMPT_PATHS
+    )
+
+# 添加响应压缩中间件（流式响应不压缩）
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE)
+
 # 添加CORS中间件
 app.add_middleware(
     CORSMiddleware,
@@ -50,6 +99,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 添加请求耗时中间件（最外层，429等中间件直接返回的响应同样计入）
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -67,189 +120,303 @@ async def global_exception_handler(request, exc):
 @app.get("/", response_model=HealthCheckResponse)
 async def root():
     """根路径健康检查"""
+    report = health_monitor.get_report()
     return HealthCheckResponse(
+        status=report["status"],
         version=settings.API_VERSION,
-        dependencies={
-            "akshare": "正常",
-            "talib": "正常"
-        }
+        dependencies=report["dependencies"]
     )
 
 
 @app.get("/health", response_model=HealthCheckResponse)
 async def health_check():
-    """健康检查接口"""
-    return HealthCheckResponse(
-        version=settings.API_VERSION,
-        dependencies={
-            "akshare": "正常",
-            "talib": "正常"
-        }
+    """
+    健康检查接口
+
+    依赖状态来自后台定时探测的最近结果，饱和度和熔断器状态为实时值；
+    status为healthy/degraded/unhealthy，接口本身始终返回200
+    """
+    return HealthCheckResponse(version=settings.API_VERSION, **health_monitor.get_report())
+
+
+@app.get("/livez", include_in_schema=False)
+async def liveness():
+    """存活检查：事件循环能响应即返回200，不检查任何依赖"""
+    return Response(content=b"ok", media_type="text/plain")
+
+
+@app.get("/readyz", include_in_schema=False)
+async def readiness():
+    """
+    就绪检查
+
+    启动未完成、正在关闭或资源饱和（事件循环延迟、处理中请求、akshare调用、计算排队超过阈值）时返回503，
+    负载均衡据此暂停向本实例分配请求，饱和解除后自动恢复
+    """
+    ready, reasons = health_monitor.readiness()
+    if ready:
+        return Response(content=b"ok", media_type="text/plain")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"ready": False, "reasons": reasons},
+        headers={"Retry-After": "1"}
     )
 
 
-@app.post("/analyze-stock/", response_model=StockAnalysisResponse)
-async def analyze_stock(
-    request: StockAnalysisRequest,
-    api_key: str = Depends(get_current_api_key)
-):
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
     """
-    股票分析接口
+    监控指标接口（Prometheus文本格式）
 
-    根据股票代码和市场类型获取股票数据，计算技术指标，生成分析报告
+    包括各路由请求耗时、akshare调用耗时与错误数、重试次数、缓存命中率、
+    计算进程池排队深度和事件循环延迟
     """
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return Response(content=render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _admission(priority: str):
+    """获取一个分析任务执行名额（准入控制关闭时不限制）"""
+    if not settings.ADMISSION_ENABLED:
+        return nullcontext()
+    return admission_controller.admit(priority)
+
+
+def _overloaded(error: AdmissionRejected) -> HTTPException:
+    """准入控制拒绝时的503响应"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=ERROR_MESSAGES["SERVICE_OVERLOADED"],
+        headers={"Retry-After": error.retry_after_header}
+    )
+
+
+async def _run_analysis(request: StockAnalysisRequest, http_request: Request, mode: str = "",
+                        fields: Optional[str] = None) -> Response:
+    """
+    通过分析流水线处理单只股票的分析请求
+
+    响应带有ETag、Cache-Control和各阶段耗时的Server-Timing头部；
+    指定fields时只返回请求的字段，未用到的计算阶段直接跳过；
+    超出准入控制的并发和排队上限时返回503
+    """
+    projection = parse_fields(fields)
     try:
-        logger.info(f"开始分析股票: {request.stock_code}, 市场: {request.market_type}")
-        
-        # 1. 获取股票数据
-        stock_data = await stock_data_service.get_stock_data(
-            request.stock_code,
-            request.market_type,
-            request.period
-        )
-        
-        if not stock_data or not stock_data.get('recent_data'):
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=ERROR_MESSAGES["DATA_NOT_FOUND"]
-            )
-        
-        # 2. 计算技术指标
-        raw_data = stock_data.get('raw_data')
-        if raw_data is not None and not raw_data.empty:
-            technical_indicators = technical_analysis.calculate_all_indicators(raw_data)
-        else:
-            technical_indicators = technical_analysis._get_empty_indicators()
-        
-        # 3. 生成分析报告
-        analysis_report = report_generator.generate_analysis_report(
-            stock_data['stock_info'],
-            technical_indicators,
-            stock_data['recent_data']
-        )
-        
-        # 4. 构建响应数据
-        response_data = {
-            "stock_info": stock_data['stock_info'],
-            "technical_summary": {
-                "trend": technical_indicators.get('trend', '未知'),
-                "ma5": technical_indicators.get('ma5'),
-                "ma10": technical_indicators.get('ma10'),
-                "ma20": technical_indicators.get('ma20'),
-                "ma60": technical_indicators.get('ma60'),
-                "macd": technical_indicators.get('macd'),
-                "macd_signal": technical_indicators.get('macd_signal'),
-                "macd_histogram": technical_indicators.get('macd_histogram'),
-                "kdj_k": technical_indicators.get('kdj_k'),
-                "kdj_d": technical_indicators.get('kdj_d'),
-                "kdj_j": technical_indicators.get('kdj_j'),
-                "rsi": technical_indicators.get('rsi'),
-                "bollinger_upper": technical_indicators.get('bollinger_upper'),
-                "bollinger_middle": technical_indicators.get('bollinger_middle'),
-                "bollinger_lower": technical_indicators.get('bollinger_lower'),
-                "support_levels": technical_indicators.get('support_levels', []),
-                "resistance_levels": technical_indicators.get('resistance_levels', [])
-            },
-            "recent_data": stock_data['recent_data'][-14:],  # 返回最近14天数据
-            "report": analysis_report
-        }
-        
-        logger.info(f"股票分析完成: {request.stock_code}")
-        
-        return StockAnalysisResponse(
-            status="success",
-            data=response_data
-        )
-        
+        async with _admission(PRIORITY_INTERACTIVE):
+            logger.info(f"开始分析股票{mode}: {request.stock_code}, 市场: {request.market_type}")
+            ctx = await analysis_pipeline.run(AnalysisContext(
+                request=request,
+                if_none_match=http_request.headers.get("if-none-match"),
+                fields=projection
+            ))
+        logger.info(f"股票分析完成{mode}: {request.stock_code}, 耗时: {ctx.server_timing()}")
+        return ctx.to_response()
+
+    except AdmissionRejected as e:
+        logger.warning(f"服务繁忙，拒绝分析请求{mode}: {request.stock_code}, 原因: {e.reason}")
+        raise _overloaded(e)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"股票分析失败: {request.stock_code}, 错误: {str(e)}")
+        logger.error(f"股票分析失败{mode}: {request.stock_code}, 错误: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"分析失败: {str(e)}"
         )
 
 
+@app.post("/analyze-stock/", response_model=StockAnalysisResponse)
+async def analyze_stock(
+    request: StockAnalysisRequest,
+    http_request: Request,
+    fields: Optional[str] = None,
+    api_key: str = Depends(get_current_api_key)
+):
+    """
+    股票分析接口
+
+    根据股票代码和市场类型获取股票数据，计算技术指标，生成分析报告；
+    fields为逗号分隔的字段路径（如 stock_info.current_price,technical_summary.rsi），只返回这些字段
+    """
+    return await _run_analysis(request, http_request, fields=fields)
+
+
 @app.post("/analyze-stock-test/", response_model=StockAnalysisResponse)
-async def analyze_stock_test(request: StockAnalysisRequest):
+async def analyze_stock_test(request: StockAnalysisRequest, http_request: Request,
+                             fields: Optional[str] = None):
     """
     股票分析测试接口（无需认证）
 
     用于测试Dify连接，不需要API密钥认证
     """
+    return await _run_analysis(request, http_request, mode="（测试模式）", fields=fields)
+
+
+async def _analyze_batch_item(stock_code: str, batch: BatchAnalysisRequest,
+                              projection: Optional[FieldProjection] = None) -> StockAnalysisResponse:
+    """分析批量请求中的单只股票，复用各阶段缓存（以批量优先级参与准入控制）"""
+    request = StockAnalysisRequest(
+        stock_code=stock_code,
+        market_type=batch.market_type,
+        period=batch.period
+    )
+    async with _admission(PRIORITY_BATCH):
+        ctx = await analysis_pipeline.run(AnalysisContext(request=request, render=False, fields=projection))
+    return ctx.result
+
+
+async def _stream_batch_analysis(batch: BatchAnalysisRequest,
+                                 projection: Optional[FieldProjection] = None) -> AsyncIterator[bytes]:
+    """
+    按完成顺序逐行输出批量分析结果（NDJSON）
+
+    同时最多分析BATCH_CONCURRENCY只股票，已输出的结果不再保留，内存占用与批量大小无关
+    """
+    codes = iter(batch.stock_codes)
+    pending: Dict[asyncio.Task, str] = {}
+    succeeded = failed = 0
+
+    def schedule_next():
+        stock_code = next(codes, None)
+        if stock_code is not None:
+            pending[asyncio.create_task(_analyze_batch_item(stock_code, batch, projection))] = stock_code
+
+    for _ in range(settings.BATCH_CONCURRENCY):
+        schedule_next()
+
     try:
-        logger.info(f"开始分析股票（测试模式）: {request.stock_code}, 市场: {request.market_type}")
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                stock_code = pending.pop(task)
+                schedule_next()
+                try:
+                    result = task.result()
+                    data = project_data(result.data, projection) if projection else result.data
+                    line = {"stock_code": stock_code, "status": "success", "data": data}
+                    succeeded += 1
+                except HTTPException as e:
+                    line = {"stock_code": stock_code, "status": "error", "message": e.detail}
+                    failed += 1
+                except AdmissionRejected as e:
+                    line = {"stock_code": stock_code, "status": "error",
+                            "message": ERROR_MESSAGES["SERVICE_OVERLOADED"], "retry_after": e.retry_after_header}
+                    failed += 1
+                except Exception as e:
+                    logger.error(f"批量分析失败: {stock_code}, 错误: {str(e)}")
+                    line = {"stock_code": stock_code, "status": "error", "message": str(e)}
+                    failed += 1
+                yield json_dumps(line) + b"\n"
+    finally:
+        # 客户端断开时取消尚未完成的分析任务
+        for task in pending:
+            task.cancel()
 
-        # 1. 获取股票数据
-        stock_data = await stock_data_service.get_stock_data(
-            request.stock_code,
-            request.market_type,
-            request.period
-        )
+    logger.info(f"批量分析完成: 成功{succeeded}只, 失败{failed}只")
+    yield json_dumps({
+        "status": "done",
+        "total": succeeded + failed,
+        "succeeded": succeeded,
+        "failed": failed,
+        "timestamp": datetime.now()
+    }) + b"\n"
 
-        if not stock_data or not stock_data.get('recent_data'):
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=ERROR_MESSAGES["DATA_NOT_FOUND"]
-            )
 
-        # 2. 计算技术指标
-        raw_data = stock_data.get('raw_data')
-        if raw_data is not None and not raw_data.empty:
-            technical_indicators = technical_analysis.calculate_all_indicators(raw_data)
-        else:
-            technical_indicators = technical_analysis._get_empty_indicators()
-
-        # 3. 生成分析报告
-        analysis_report = report_generator.generate_analysis_report(
-            stock_data['stock_info'],
-            technical_indicators,
-            stock_data['recent_data']
-        )
+@app.post("/analyze-stocks/")
+async def analyze_stocks(
+    batch: BatchAnalysisRequest,
+    fields: Optional[str] = None,
+    api_key: str = Depends(get_current_api_key)
+):
+    """
+    批量股票分析接口
 
-        # 4. 构建响应数据
-        response_data = {
-            "stock_info": stock_data['stock_info'],
-            "technical_summary": {
-                "trend": technical_indicators.get('trend', '未知'),
-                "ma5": technical_indicators.get('ma5'),
-                "ma10": technical_indicators.get('ma10'),
-                "ma20": technical_indicators.get('ma20'),
-                "ma60": technical_indicators.get('ma60'),
-                "macd": technical_indicators.get('macd'),
-                "macd_signal": technical_indicators.get('macd_signal'),
-                "macd_histogram": technical_indicators.get('macd_histogram'),
-                "kdj_k": technical_indicators.get('kdj_k'),
-                "kdj_d": technical_indicators.get('kdj_d'),
-                "kdj_j": technical_indicators.get('kdj_j'),
-                "rsi": technical_indicators.get('rsi'),
-                "bollinger_upper": technical_indicators.get('bollinger_upper'),
-                "bollinger_middle": technical_indicators.get('bollinger_middle'),
-                "bollinger_lower": technical_indicators.get('bollinger_lower'),
-                "support_levels": technical_indicators.get('support_levels', []),
-                "resistance_levels": technical_indicators.get('resistance_levels', [])
-            },
-            "recent_data": stock_data['recent_data'][-14:],  # 返回最近14天数据
-            "report": analysis_report
-        }
+    以NDJSON格式流式返回：每只股票分析完成后立即输出一行，最后一行为汇总信息；
+    fields的含义与单只股票分析接口相同。
+    服务繁忙时在开始输出前直接返回503；输出过程中被准入控制拒绝的股票单独标记为错误，可稍后重试
+    """
+    projection = parse_fields(fields)
+    if settings.ADMISSION_ENABLED:
+        try:
+            admission_controller.check(PRIORITY_BATCH)
+        except AdmissionRejected as e:
+            logger.warning(f"服务繁忙，拒绝批量分析请求: {len(batch.stock_codes)}只股票, 原因: {e.reason}")
+            raise _overloaded(e)
+    logger.info(f"开始批量分析: {len(batch.stock_codes)}只股票, 市场: {batch.market_type}")
+    return StreamingResponse(
+        _stream_batch_analysis(batch, projection),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-        logger.info(f"股票分析完成（测试模式）: {request.stock_code}")
 
-        return StockAnalysisResponse(
-            status="success",
-            data=response_data
+def _parse_live_symbols(symbols: str, market_type: str) -> List[str]:
+    """解析并校验订阅的股票代码列表"""
+    if market_type not in SUPPORTED_MARKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES["INVALID_MARKET_TYPE"]
         )
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"股票分析失败（测试模式）: {request.stock_code}, 错误: {str(e)}")
+    codes = list(dict.fromkeys(code.strip() for code in symbols.split(",") if code.strip()))
+    if not codes or len(codes) > settings.LIVE_MAX_SYMBOLS_PER_CLIENT:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"分析失败: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"订阅股票数量需在1到{settings.LIVE_MAX_SYMBOLS_PER_CLIENT}之间"
         )
 
+    pattern = STOCK_CODE_PATTERNS[market_type]
+    invalid = [code for code in codes if not re.match(pattern, code)]
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{ERROR_MESSAGES['INVALID_STOCK_CODE']}: {', '.join(invalid)}"
+        )
+    return codes
+
+
+@app.get("/live/stream")
+async def live_stream(
+    http_request: Request,
+    symbols: str,
+    market_type: str = "A",
+    api_key: str = Depends(get_current_api_key)
+):
+    """
+    实时行情推送接口（Server-Sent Events）
+
+    订阅逗号分隔的股票代码，交易时间内定时推送价格和技术指标的变化字段；
+    所有客户端共享同一份上游行情，订阅者数量不会增加akshare请求
+    """
+    codes = _parse_live_symbols(symbols, market_type)
+    subscription = live_update_hub.subscribe(market_type, codes)
+    logger.info(f"新增实时订阅: {market_type} {len(codes)}只股票, 当前订阅数: {live_update_hub.subscription_count}")
+
+    async def event_stream() -> AsyncIterator[bytes]:
+        try:
+            while not subscription.closed:
+                if await http_request.is_disconnected():
+                    break
+                updates = await subscription.next_batch(settings.LIVE_HEARTBEAT_SECONDS)
+                if updates:
+                    payload = json_dumps({
+                        "market_type": market_type,
+                        "updates": updates,
+                        "timestamp": datetime.now()
+                    })
+                    yield b"event: update\ndata: " + payload + b"\n\n"
+                else:
+                    yield b": keepalive\n\n"
+        finally:
+            live_update_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
 @app.get("/market-overview/", response_model=MarketOverviewResponse)
 async def market_overview(
@@ -259,39 +426,17 @@ async def market_overview(
     """
     市场概览接口
     
-    获取指定市场的整体概况数据
+    获取指定市场的整体概况数据：主要指数、涨跌家数、涨跌停家数、成交额和行业表现，
+    由同一份全市场实时行情快照聚合得到，快照刷新前直接返回缓存的聚合结果
     """
+    if market_type not in SUPPORTED_MARKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{ERROR_MESSAGES['INVALID_MARKET_TYPE']}: {market_type}"
+        )
+
     try:
-        logger.info(f"获取市场概览: {market_type}")
-        
-        # 这里可以实现市场概览的具体逻辑
-        # 暂时返回示例数据
-        market_data = {
-            "market_info": {
-                "market_type": market_type,
-                "market_name": "A股市场" if market_type == "A" else f"{market_type}市场",
-                "trading_status": "正常交易"
-            },
-            "main_indices": [
-                {
-                    "name": "上证指数",
-                    "code": "000001",
-                    "current_value": 3200.0,
-                    "change": 15.6,
-                    "change_percent": 0.49
-                }
-            ],
-            "sector_performance": [
-                {
-                    "name": "科技股",
-                    "change_percent": 2.1,
-                    "leading_stocks": ["000001", "000002"]
-                }
-            ]
-        }
-        
-        logger.info(f"市场概览获取完成: {market_type}")
-        
+        market_data = await market_overview_service.get_overview(market_type)
         return MarketOverviewResponse(
             status="success",
             data=market_data
@@ -305,6 +450,65 @@ async def market_overview(
         )
 
 
+@app.get("/admin/cache/stats", response_model=CacheAdminResponse)
+async def cache_stats(
+    top_n: int = settings.CACHE_STATS_TOP_N,
+    api_key: str = Depends(get_admin_api_key)
+):
+    """
+    缓存统计接口（需要管理权限）
+    
+    返回各命名缓存的条目数、占用字节数、命中/未命中/过期/淘汰次数及热点键
+    """
+    caches = {name: instance.get_stats(top_n) for name, instance in cache_registry.items()}
+    return CacheAdminResponse(status="success", data={"caches": caches})
+
+
+@app.get("/admin/pipeline/stats", response_model=PipelineStatsResponse)
+async def pipeline_stats(api_key: str = Depends(get_admin_api_key)):
+    """
+    分析流水线耗时统计接口（需要管理权限）
+
+    按阶段和来源（执行/缓存/跳过）返回调用次数、平均耗时及P50/P95/P99，以及准入控制的并发与排队情况
+    """
+    return PipelineStatsResponse(
+        status="success",
+        data={
+            "stages": analysis_pipeline.stage_names,
+            "timings": stage_duration.get_stats(),
+            "admission": admission_controller.get_stats()
+        }
+    )
+
+
+@app.post("/admin/cache/invalidate", response_model=CacheAdminResponse)
+async def cache_invalidate(
+    request: CacheInvalidateRequest,
+    api_key: str = Depends(get_admin_api_key)
+):
+    """
+    缓存失效接口（需要管理权限）
+    
+    按键前缀或股票代码删除指定缓存（或全部缓存）中的条目
+    """
+    if request.cache_name:
+        if request.cache_name not in cache_registry:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"未知的缓存: {request.cache_name}，可用缓存: {list(cache_registry.keys())}"
+            )
+        targets = {request.cache_name: cache_registry[request.cache_name]}
+    else:
+        targets = cache_registry
+
+    removed = {
+        name: instance.invalidate(prefix=request.prefix, symbol=request.stock_code)
+        for name, instance in targets.items()
+    }
+    logger.info(f"缓存失效: prefix={request.prefix}, stock_code={request.stock_code}, 结果: {removed}")
+    return CacheAdminResponse(status="success", data={"removed": removed})
+
+
 if __name__ == "__main__":
     # 启动服务器
     uvicorn.run(
@@ -2,9 +2,9 @@
 请求数据模型
 """
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import List, Optional
 import re
-from config import SUPPORTED_MARKETS, STOCK_CODE_PATTERNS
+from config import settings, SUPPORTED_MARKETS, STOCK_CODE_PATTERNS
 
 
 class StockAnalysisRequest(BaseModel):
@@ -30,6 +30,29 @@ class StockAnalysisRequest(BaseModel):
         return v
 
 
+class BatchAnalysisRequest(BaseModel):
+    """批量股票分析请求模型"""
+    stock_codes: List[str] = Field(..., description="股票代码列表", example=["000333", "600519"])
+    market_type: str = Field(..., description="市场类型", example="A")
+    period: Optional[int] = Field(30, description="分析周期（天数）", example=30)
+    
+    @validator('stock_codes')
+    def validate_stock_codes(cls, v):
+        # 去重并保持原有顺序，单个代码的格式在分析时逐个校验
+        codes = list(dict.fromkeys(code.strip() for code in v if code and code.strip()))
+        if not codes:
+            raise ValueError("股票代码列表不能为空")
+        if len(codes) > settings.BATCH_MAX_SYMBOLS:
+            raise ValueError(f"单次最多分析{settings.BATCH_MAX_SYMBOLS}只股票")
+        return codes
+    
+    @validator('market_type')
+    def validate_market_type(cls, v):
+        if v not in SUPPORTED_MARKETS:
+            raise ValueError(f"不支持的市场类型: {v}，支持的类型: {list(SUPPORTED_MARKETS.keys())}")
+        return v
+
+
 class MarketOverviewRequest(BaseModel):
     """市场概览请求模型"""
     market_type: Optional[str] = Field("A", description="市场类型，默认为A股", example="A")
@@ -41,6 +64,19 @@ class MarketOverviewRequest(BaseModel):
         return v
 
 
+class CacheInvalidateRequest(BaseModel):
+    """缓存失效请求模型"""
+    cache_name: Optional[str] = Field(None, description="缓存名称，为空时作用于所有缓存", example="data")
+    prefix: Optional[str] = Field(None, description="缓存键前缀", example="stock_data")
+    stock_code: Optional[str] = Field(None, description="股票代码", example="000333")
+    
+    @validator('stock_code', always=True)
+    def validate_target(cls, v, values):
+        if not v and not values.get('prefix'):
+            raise ValueError("prefix和stock_code至少需要提供一个")
+        return v
+
+
 class HealthCheckRequest(BaseModel):
     """健康检查请求模型"""
     pass
@@ -57,10 +57,18 @@ class AnalysisReport(BaseModel):
     trading_suggestion: str = Field(..., description="交易建议")
 
 
+class StockAnalysisData(BaseModel):
+    """股票分析数据"""
+    stock_info: StockInfo = Field(..., description="股票基础信息")
+    technical_summary: TechnicalSummary = Field(..., description="技术指标摘要")
+    recent_data: List[RecentData] = Field(default_factory=list, description="最近交易数据")
+    report: AnalysisReport = Field(..., description="分析报告")
+
+
 class StockAnalysisResponse(BaseModel):
     """股票分析响应模型"""
     status: str = Field(..., description="响应状态")
-    data: Dict[str, Any] = Field(..., description="响应数据")
+    data: StockAnalysisData = Field(..., description="响应数据")
     message: Optional[str] = Field(None, description="响应消息")
     timestamp: datetime = Field(default_factory=datetime.now, description="响应时间")
 
@@ -89,6 +97,20 @@ class MarketOverviewResponse(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.now, description="响应时间")
 
 
+class CacheAdminResponse(BaseModel):
+    """缓存管理响应模型"""
+    status: str = Field(..., description="响应状态")
+    data: Dict[str, Any] = Field(..., description="缓存统计或失效结果")
+    timestamp: datetime = Field(default_factory=datetime.now, description="响应时间")
+
+
+class PipelineStatsResponse(BaseModel):
+    """分析流水线耗时统计响应模型"""
+    status: str = Field(..., description="响应状态")
+    data: Dict[str, Any] = Field(..., description="各阶段的调用次数与耗时分位数")
+    timestamp: datetime = Field(default_factory=datetime.now, description="响应时间")
+
+
 class ErrorResponse(BaseModel):
     """错误响应模型"""
     status: str = Field("error", description="响应状态")
@@ -103,3 +125,4 @@ class HealthCheckResponse(BaseModel):
     version: str = Field(..., description="服务版本")
     timestamp: datetime = Field(default_factory=datetime.now, description="检查时间")
     dependencies: Dict[str, str] = Field(default_factory=dict, description="依赖服务状态")
+    checks: Dict[str, Any] = Field(default_factory=dict, description="探测与饱和度明细")
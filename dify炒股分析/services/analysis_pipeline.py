@@ -0,0 +1,402 @@
+"""
+股票分析流水线
+将一次分析拆分为 校验 → 获取数据 → 标准化 → 计算指标 → 生成报告 → 序列化 六个阶段，
+每个阶段独立计时、可缓存、可跳过，互不依赖的阶段可并行执行
+"""
+import re
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple, Union
+from fastapi import HTTPException, Response, status
+
+from config import settings, ERROR_MESSAGES, STOCK_CODE_PATTERNS
+from models.request_models import StockAnalysisRequest
+from models.response_models import (
+    StockAnalysisResponse, StockAnalysisData, StockInfo, TechnicalSummary,
+    RecentData, AnalysisReport
+)
+from services.stock_data_service import stock_data_service
+from services.technical_analysis import technical_analysis
+from services.report_generator import report_generator
+from services.compute_scheduler import compute_scheduler
+from utils.cache import SimpleCache, register_cache, generate_cache_key
+from utils.http_cache import compute_etag, etag_matches, build_cache_control
+from utils.json_response import dumps as json_dumps
+from utils.metrics import Counter, Histogram, register_metric
+
+logger = logging.getLogger(__name__)
+
+# 各阶段的结果缓存（按ETag索引），数据未变化时可直接复用
+indicator_cache = register_cache("indicators", SimpleCache(settings.RESPONSE_CACHE_MAX_ENTRIES))
+report_cache = register_cache("reports", SimpleCache(settings.RESPONSE_CACHE_MAX_ENTRIES))
+response_cache = register_cache("responses", SimpleCache(settings.RESPONSE_CACHE_MAX_ENTRIES))
+
+# 阶段耗时直方图，source标签区分实际执行(run)、命中缓存(cache)和跳过(skip)
+stage_duration = register_metric(Histogram(
+    "analysis_stage_duration_seconds",
+    "股票分析流水线各阶段耗时",
+    labelnames=("stage", "source")
+))
+
+# 分析请求数，按股票代码打标签会使序列数与股票数量相同，需显式开启METRICS_SYMBOL_LABELS
+analysis_requests = register_metric(Counter(
+    "analysis_requests_total",
+    "通过校验的股票分析请求数",
+    labelnames=("market", "symbol") if settings.METRICS_SYMBOL_LABELS else ("market",)
+))
+
+
+# 字段投影：响应data下的部分名称 -> 保留的子字段（None表示保留整个部分）
+FieldProjection = Dict[str, Optional[FrozenSet[str]]]
+
+# data下各部分对应的模型（None表示不支持子字段投影）
+SECTION_MODELS = {
+    "stock_info": StockInfo,
+    "technical_summary": TechnicalSummary,
+    "recent_data": None,
+    "report": AnalysisReport,
+}
+
+# 各部分依赖的可跳过阶段，投影中没有用到的阶段不再执行
+SECTION_STAGES = {
+    "stock_info": set(),
+    "recent_data": set(),
+    "technical_summary": {"compute"},
+    "report": {"compute", "report"},
+}
+
+
+def parse_fields(fields: Optional[str]) -> Optional[FieldProjection]:
+    """
+    解析fields参数
+
+    Args:
+        fields: 逗号分隔的字段路径，如 "stock_info.current_price,technical_summary.rsi,report"
+
+    Returns:
+        Optional[FieldProjection]: 字段投影，未指定时返回None（返回完整响应）
+    """
+    if not fields or not fields.strip():
+        return None
+
+    projection: Dict[str, Optional[Set[str]]] = {}
+    for item in fields.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        section, _, name = item.partition(".")
+        model = SECTION_MODELS.get(section)
+        if section not in SECTION_MODELS or (name and (model is None or name not in model.model_fields)):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{ERROR_MESSAGES['INVALID_FIELDS']}: {item}"
+            )
+        if not name:
+            projection[section] = None
+        elif section not in projection or projection[section] is not None:
+            projection.setdefault(section, set()).add(name)
+
+    return {section: frozenset(names) if names is not None else None
+            for section, names in projection.items()} or None
+
+
+def fields_key(projection: Optional[FieldProjection]) -> str:
+    """生成字段投影的规范化表示，用于ETag"""
+    if not projection:
+        return ""
+    return ",".join(
+        section if names is None else ",".join(f"{section}.{name}" for name in sorted(names))
+        for section, names in sorted(projection.items())
+    )
+
+
+def project_data(data: StockAnalysisData, projection: FieldProjection) -> Dict[str, Any]:
+    """按字段投影裁剪分析数据"""
+    return data.model_dump(include={
+        section: True if names is None else set(names)
+        for section, names in projection.items()
+    })
+
+
+def project_response(result: StockAnalysisResponse, projection: FieldProjection) -> Dict[str, Any]:
+    """按字段投影裁剪分析响应，status/message/timestamp始终保留"""
+    response = result.model_dump(include={"status", "message", "timestamp"})
+    response["data"] = project_data(result.data, projection)
+    return response
+
+
+@dataclass
+class AnalysisContext:
+    """一次分析请求在各阶段之间传递的状态"""
+    request: StockAnalysisRequest
+    if_none_match: Optional[str] = None
+    render: bool = True                                 # 是否生成响应体（批量分析只需要模型）
+    skip_stages: Set[str] = field(default_factory=set)  # 调用方指定跳过的阶段
+    fields: Optional[FieldProjection] = None            # 字段投影，未请求部分依赖的阶段自动跳过
+
+    # 各阶段输出
+    params: Optional[Dict[str, Any]] = None
+    stock_data: Optional[Dict[str, Any]] = None
+    etag: Optional[str] = None
+    indicators: Optional[Dict[str, Any]] = None
+    report: Optional[Dict[str, str]] = None
+    result: Optional[StockAnalysisResponse] = None
+    body: Optional[bytes] = None
+
+    headers: Dict[str, str] = field(default_factory=dict)
+    response: Optional[Response] = None                 # 提前结束时的响应（如304）
+    timings: List[Tuple[str, float, str]] = field(default_factory=list)
+
+    def __post_init__(self):
+        if self.fields:
+            needed = set().union(*(SECTION_STAGES[section] for section in self.fields))
+            self.skip_stages = set(self.skip_stages) | ({"compute", "report"} - needed)
+
+    def server_timing(self) -> str:
+        """生成Server-Timing头部值"""
+        entries = [
+            f'{name};dur={elapsed_ms:.2f}' + (f';desc="{source}"' if source != "run" else "")
+            for name, elapsed_ms, source in self.timings
+        ]
+        entries.append(f'total;dur={sum(elapsed for _, elapsed, _ in self.timings):.2f}')
+        return ", ".join(entries)
+
+    def to_response(self) -> Response:
+        """根据流水线结果生成HTTP响应"""
+        headers = dict(self.headers)
+        headers["Server-Timing"] = self.server_timing()
+        if self.response is not None:
+            self.response.headers.update(headers)
+            return self.response
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+@dataclass
+class Stage:
+    """流水线阶段"""
+    name: str
+    func: Callable[[AnalysisContext], Awaitable[Any]]    # 返回值写入output指定的上下文属性
+    output: str
+    cache: Optional[SimpleCache] = None
+    cache_key: Optional[Callable[[AnalysisContext], Optional[str]]] = None
+    skip_when: Optional[Callable[[AnalysisContext], bool]] = None
+    on_skip: Optional[Callable[[AnalysisContext], Any]] = None   # 被调用方跳过时的默认输出
+
+
+class AnalysisPipeline:
+    """
+    分析流水线
+
+    stages中的元素可以是单个阶段，也可以是阶段列表（列表内的阶段互不依赖，并行执行）
+    """
+
+    def __init__(self, stages: Sequence[Union[Stage, Sequence[Stage]]]):
+        self.stages = stages
+
+    @property
+    def stage_names(self) -> List[str]:
+        """按执行顺序返回所有阶段名称"""
+        names = []
+        for entry in self.stages:
+            names.extend(stage.name for stage in (entry if isinstance(entry, (list, tuple)) else [entry]))
+        return names
+
+    async def run(self, ctx: AnalysisContext) -> AnalysisContext:
+        """
+        依次执行各阶段，某阶段给出提前响应（如304）时停止
+
+        Args:
+            ctx: 分析上下文
+
+        Returns:
+            AnalysisContext: 执行完成的上下文
+        """
+        for entry in self.stages:
+            if isinstance(entry, (list, tuple)):
+                await asyncio.gather(*(self._run_stage(stage, ctx) for stage in entry))
+            else:
+                await self._run_stage(entry, ctx)
+            if ctx.response is not None:
+                break
+        return ctx
+
+    async def _run_stage(self, stage: Stage, ctx: AnalysisContext):
+        """执行单个阶段并记录耗时"""
+        start = time.perf_counter()
+        source = "run"
+
+        if stage.name in ctx.skip_stages:
+            source = "skip"
+            if getattr(ctx, stage.output) is None and stage.on_skip is not None:
+                setattr(ctx, stage.output, stage.on_skip(ctx))
+        elif getattr(ctx, stage.output) is not None or (stage.skip_when and stage.skip_when(ctx)):
+            # 输出已由前面的阶段提供（如整体响应命中缓存）
+            source = "skip"
+        else:
+            key = stage.cache_key(ctx) if stage.cache is not None and stage.cache_key else None
+            value = stage.cache.get(key) if key else None
+            if value is not None:
+                source = "cache"
+            else:
+                value = await stage.func(ctx)
+                if key and value is not None:
+                    stage.cache.set(key, value, settings.CACHE_EXPIRE_SECONDS)
+            setattr(ctx, stage.output, value)
+
+        elapsed = time.perf_counter() - start
+        stage_duration.observe(elapsed, stage=stage.name, source=source)
+        ctx.timings.append((stage.name, elapsed * 1000, source))
+
+
+# ---------------------------------------------------------------------------
+# 各阶段实现
+# ---------------------------------------------------------------------------
+
+async def _validate(ctx: AnalysisContext) -> Dict[str, Any]:
+    """校验股票代码格式并确定数据天数"""
+    request = ctx.request
+    stock_code = request.stock_code.strip()
+    if request.market_type == "US":
+        stock_code = stock_code.upper()
+
+    pattern = STOCK_CODE_PATTERNS.get(request.market_type)
+    if pattern and not re.match(pattern, stock_code):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{ERROR_MESSAGES['INVALID_STOCK_CODE']}: {stock_code}"
+        )
+
+    analysis_requests.inc(market=request.market_type, symbol=stock_code)
+    return {
+        'stock_code': stock_code,
+        'market_type': request.market_type,
+        'days': request.period
+    }
+
+
+async def _fetch(ctx: AnalysisContext) -> Dict[str, Any]:
+    """获取行情数据（内部已使用数据缓存）"""
+    params = ctx.params
+    stock_data = await stock_data_service.get_stock_data(
+        params['stock_code'],
+        params['market_type'],
+        params['days']
+    )
+    if not stock_data or not stock_data.get('recent_data'):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ERROR_MESSAGES["DATA_NOT_FOUND"]
+        )
+    return stock_data
+
+
+async def _normalize(ctx: AnalysisContext) -> str:
+    """
+    计算ETag并处理条件请求
+
+    ETag仅依赖股票代码、最新K线、指标参数指纹和响应结构版本，指定字段投影时再叠加投影；
+    客户端ETag匹配时直接返回304，整体响应已缓存时后续计算阶段全部跳过。
+    返回不含投影的数据版本，各阶段缓存按它索引，不同投影共享指标和报告缓存
+    """
+    params = ctx.params
+    last_bar = ctx.stock_data['recent_data'][-1]
+    data_etag = compute_etag(
+        params['market_type'], params['stock_code'], params['days'],
+        last_bar.get('date'), last_bar.get('close'), last_bar.get('volume'),
+        technical_analysis.get_param_fingerprint(),
+        settings.RESPONSE_SCHEMA_VERSION
+    )
+    etag = compute_etag(data_etag, fields_key(ctx.fields)) if ctx.fields else data_etag
+    ctx.headers.update({"ETag": etag, "Cache-Control": build_cache_control(params['market_type'])})
+
+    if etag_matches(ctx.if_none_match, etag):
+        ctx.response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    else:
+        ctx.result = response_cache.get(_stage_cache_key("response", ctx, data_etag))
+    return data_etag
+
+
+def _stage_cache_key(prefix: str, ctx: AnalysisContext, etag: Optional[str] = None) -> str:
+    """
+    各阶段结果缓存键
+
+    指标只依赖行情数据；报告和整体响应还取决于跳过了哪些阶段，需分开缓存
+    """
+    kwargs = {'stock_code': ctx.params['stock_code'], 'etag': etag or ctx.etag}
+    if prefix != "indicators":
+        kwargs['skip'] = ",".join(sorted(ctx.skip_stages))
+    return generate_cache_key(prefix, **kwargs)
+
+
+async def _compute(ctx: AnalysisContext) -> Dict[str, Any]:
+    """计算技术指标（在进程池中执行）"""
+    return await compute_scheduler.compute_indicators(ctx.stock_data.get('raw_data'))
+
+
+async def _report(ctx: AnalysisContext) -> Dict[str, str]:
+    """生成分析报告"""
+    return await compute_scheduler.generate_report(
+        ctx.stock_data['stock_info'],
+        ctx.indicators,
+        ctx.stock_data['recent_data']
+    )
+
+
+async def _serialize(ctx: AnalysisContext) -> Optional[bytes]:
+    """组装强类型响应模型并序列化，指定了字段投影时只序列化请求的字段"""
+    if ctx.result is None:
+        ctx.result = build_analysis_response(ctx.stock_data, ctx.indicators, ctx.report)
+        response_cache.set(_stage_cache_key("response", ctx), ctx.result, settings.CACHE_EXPIRE_SECONDS)
+    if not ctx.render:
+        return None
+    return json_dumps(project_response(ctx.result, ctx.fields) if ctx.fields else ctx.result)
+
+
+def build_analysis_response(stock_data: Dict[str, Any], technical_indicators: Dict[str, Any],
+                            analysis_report: Dict[str, str]) -> StockAnalysisResponse:
+    """
+    构建股票分析响应
+
+    使用强类型模型一次性完成校验，由orjson直接序列化
+    """
+    summary = {
+        name: technical_indicators.get(name)
+        for name in TechnicalSummary.model_fields
+    }
+    summary['trend'] = technical_indicators.get('trend') or '未知'
+    summary['support_levels'] = technical_indicators.get('support_levels') or []
+    summary['resistance_levels'] = technical_indicators.get('resistance_levels') or []
+
+    return StockAnalysisResponse(
+        status="success",
+        data=StockAnalysisData(
+            stock_info=StockInfo(**stock_data['stock_info']),
+            technical_summary=TechnicalSummary(**summary),
+            recent_data=[RecentData(**item) for item in stock_data['recent_data'][-14:]],  # 返回最近14天数据
+            report=AnalysisReport(**analysis_report)
+        )
+    )
+
+
+def _has_result(ctx: AnalysisContext) -> bool:
+    return ctx.result is not None
+
+
+# 创建全局流水线
+analysis_pipeline = AnalysisPipeline([
+    Stage("validate", _validate, output="params"),
+    Stage("fetch", _fetch, output="stock_data"),
+    Stage("normalize", _normalize, output="etag"),
+    Stage("compute", _compute, output="indicators",
+          cache=indicator_cache, cache_key=lambda ctx: _stage_cache_key("indicators", ctx),
+          skip_when=_has_result,
+          on_skip=lambda ctx: technical_analysis.get_empty_indicators()),
+    Stage("report", _report, output="report",
+          cache=report_cache, cache_key=lambda ctx: _stage_cache_key("reports", ctx),
+          skip_when=_has_result,
+          on_skip=lambda ctx: report_generator.get_default_report()),
+    Stage("serialize", _serialize, output="body",
+          skip_when=lambda ctx: not ctx.render and ctx.result is not None),
+])
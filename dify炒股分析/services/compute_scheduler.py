@@ -0,0 +1,202 @@
+"""
+计算任务调度服务
+将技术指标计算和分析报告生成放到进程池中执行，避免pandas计算阻塞事件循环
+"""
+import os
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+import pandas as pd
+
+from config import settings
+from services.technical_analysis import technical_analysis
+from services.report_generator import report_generator
+from utils.frame_codec import encode_frame, decode_frame, FrameCodecError
+from utils.metrics import Gauge, register_metric
+
+logger = logging.getLogger(__name__)
+
+# 指标计算实际用到的列（中英文列名），其余列不传给子进程
+COMPUTE_COLUMNS = ['日期', 'date', '开盘', 'open', '收盘', 'close',
+                   '最高', 'high', '最低', 'low', '成交量', 'volume']
+
+
+def _compact_frame(raw_data: pd.DataFrame) -> bytes:
+    """只保留指标计算所需的列，并编码为紧凑的二进制数组"""
+    columns = [col for col in COMPUTE_COLUMNS if col in raw_data.columns]
+    frame = raw_data[columns] if columns else raw_data
+    # 计算只用到列的值，去掉排序等操作留下的索引
+    return encode_frame(frame.reset_index(drop=True))
+
+
+def _calculate_indicators(raw_data: Optional[pd.DataFrame]) -> Dict:
+    """计算技术指标（数据为空时返回空指标）"""
+    if raw_data is None or raw_data.empty:
+        return technical_analysis.get_empty_indicators()
+    return technical_analysis.calculate_all_indicators(raw_data)
+
+
+def _run_indicators(payload: bytes) -> Dict:
+    """子进程入口：解码数据并计算技术指标"""
+    return _calculate_indicators(decode_frame(payload))
+
+
+def _run_report(stock_info: Dict, technical_indicators: Dict, recent_data: List[Dict]) -> Dict[str, str]:
+    """子进程入口：生成分析报告"""
+    return report_generator.generate_analysis_report(stock_info, technical_indicators, recent_data)
+
+
+def _warm_worker() -> int:
+    """预热子进程（触发pandas等模块导入）"""
+    return os.getpid()
+
+
+class ComputeScheduler:
+    """计算任务调度器"""
+
+    def __init__(self, max_workers: int = 0, inline_max_rows: int = 30, enabled: bool = True):
+        """
+        Args:
+            max_workers: 进程池大小，0表示按CPU核数
+            inline_max_rows: 行数不超过该值的输入直接在事件循环中计算
+            enabled: 是否启用进程池，关闭时较大的输入在线程池中计算
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.inline_max_rows = inline_max_rows
+        self.enabled = enabled
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.pending = 0  # 已提交到进程池、尚未完成的任务数
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """获取进程池（首次使用时创建）"""
+        if self._executor is None:
+            # 服务进程中已有事件循环和线程，使用spawn避免fork后的锁状态问题
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"计算进程池已创建，进程数: {self.max_workers}")
+        return self._executor
+
+    def start(self):
+        """
+        创建进程池并预热所有子进程，避免首个请求承担进程启动开销
+
+        进程池无法启动时（如受限环境中无法创建子进程）记录错误并关闭进程池，
+        服务照常启动，计算改为在线程池中执行
+        """
+        if not self.enabled:
+            return
+        try:
+            executor = self._get_executor()
+            for future in [executor.submit(_warm_worker) for _ in range(self.max_workers)]:
+                future.result()
+        except (BrokenProcessPool, OSError) as e:
+            logger.error(f"计算进程池预热失败，改为在线程池中计算: {str(e)}")
+            self._drop_executor()
+            self.enabled = False
+
+    def shutdown(self):
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _drop_executor(self):
+        """关闭并丢弃进程池（不等待子进程），下次使用时重新创建"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _should_inline(self, raw_data: Optional[pd.DataFrame]) -> bool:
+        """判断输入是否足够小，可以直接在事件循环中计算"""
+        return raw_data is None or len(raw_data) <= self.inline_max_rows
+
+    async def _run_in_pool(self, func, *args):
+        """
+        在进程池中执行
+
+        Returns:
+            计算结果；进程池未启用或异常退出时返回None，由调用方改为在线程池中计算
+        """
+        if not self.enabled:
+            return None
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        except BrokenProcessPool:
+            logger.error("计算进程池异常退出，重建进程池并改为在线程池中计算")
+            self._drop_executor()
+            return None
+        finally:
+            self.pending -= 1
+
+    async def _submit(self, func, raw_data: pd.DataFrame, *args):
+        """
+        编码数据并提交到进程池
+
+        Returns:
+            计算结果；数据无法编码或进程池不可用时返回None
+        """
+        if not self.enabled:
+            return None
+        try:
+            payload = _compact_frame(raw_data)
+        except FrameCodecError as e:
+            logger.warning(f"数据编码失败，改为在线程池中计算: {str(e)}")
+            return None
+        return await self._run_in_pool(func, payload, *args)
+
+    async def compute_indicators(self, raw_data: Optional[pd.DataFrame]) -> Dict:
+        """
+        计算技术指标
+
+        Args:
+            raw_data: 原始行情数据
+
+        Returns:
+            Dict: 技术指标
+        """
+        if self._should_inline(raw_data):
+            return _calculate_indicators(raw_data)
+        indicators = await self._submit(_run_indicators, raw_data)
+        if indicators is None:
+            # 进程池不可用时仍不在事件循环中执行pandas计算
+            indicators = await asyncio.to_thread(_calculate_indicators, raw_data)
+        return indicators
+
+    async def generate_report(self, stock_info: Dict, technical_indicators: Dict,
+                              recent_data: List[Dict]) -> Dict[str, str]:
+        """
+        生成分析报告
+
+        报告只依赖指标结果和少量近期数据，参数直接传给子进程；进程池不可用时在线程池中生成
+
+        Args:
+            stock_info: 股票基础信息
+            technical_indicators: 技术指标
+            recent_data: 最近交易数据
+
+        Returns:
+            Dict: 分析报告
+        """
+        report = await self._run_in_pool(_run_report, stock_info, technical_indicators, recent_data)
+        if report is None:
+            report = await asyncio.to_thread(_run_report, stock_info, technical_indicators, recent_data)
+        return report
+
+
+# 创建全局实例
+compute_scheduler = ComputeScheduler(
+    max_workers=settings.COMPUTE_WORKERS,
+    inline_max_rows=settings.COMPUTE_INLINE_MAX_ROWS,
+    enabled=settings.COMPUTE_PROCESS_POOL_ENABLED
+)
+
+# 进程池排队深度在导出时读取
+register_metric(Gauge("compute_pending_tasks", "已提交到计算进程池、尚未完成的任务数")) \
+    .set_function(lambda: {(): compute_scheduler.pending})
@@ -0,0 +1,67 @@
+"""
+行情数据源选择
+stock_data_service 通过本模块调用akshare接口，DATA_SOURCE配置决定实际使用的实现：
+- akshare：真实接口（默认）
+- synthetic：合成行情（services.synthetic_market），函数名和返回结构与akshare一致，用于压测和离线测试
+- record：调用FIXTURE_RECORD_SOURCE，同时把结果录制为夹具（services.fixture_source）
+- replay：从夹具回放，不访问网络，用于离线、可重复的性能回归测试
+"""
+import logging
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+DATA_SOURCES = ("akshare", "synthetic", "record", "replay")
+
+
+def is_offline(name: str) -> bool:
+    """数据源是否不访问网络（此时无需探测上游行情源）"""
+    if name == "record":
+        return is_offline(settings.FIXTURE_RECORD_SOURCE)
+    return name in ("synthetic", "replay")
+
+
+def create_data_source(name: str):
+    """
+    创建数据源
+
+    Args:
+        name: 数据源名称，见 DATA_SOURCES
+
+    Returns:
+        提供akshare同名函数的对象（akshare模块本身或其替身）
+    """
+    if name == "akshare":
+        import akshare
+        return akshare
+    if name == "synthetic":
+        from services.synthetic_market import SyntheticMarket
+        logger.info(f"使用合成行情数据源: 种子={settings.SYNTHETIC_SEED}, "
+                    f"延迟={settings.SYNTHETIC_LATENCY_MS}ms, 错误率={settings.SYNTHETIC_ERROR_RATE}")
+        return SyntheticMarket(
+            seed=settings.SYNTHETIC_SEED,
+            latency_ms=settings.SYNTHETIC_LATENCY_MS,
+            latency_jitter=settings.SYNTHETIC_LATENCY_JITTER,
+            error_rate=settings.SYNTHETIC_ERROR_RATE,
+            universe_size=settings.SYNTHETIC_UNIVERSE_SIZE
+        )
+    if name == "record":
+        if settings.FIXTURE_RECORD_SOURCE not in ("akshare", "synthetic"):
+            raise ValueError(f"不支持录制的数据源: {settings.FIXTURE_RECORD_SOURCE}")
+        from services.fixture_source import FixtureRecorder
+        logger.info(f"录制数据源 {settings.FIXTURE_RECORD_SOURCE} 的调用到: {settings.FIXTURE_DIR}")
+        return FixtureRecorder(create_data_source(settings.FIXTURE_RECORD_SOURCE), settings.FIXTURE_DIR)
+    if name == "replay":
+        from services.fixture_source import FixtureReplayer
+        logger.info(f"从夹具回放数据: {settings.FIXTURE_DIR}")
+        return FixtureReplayer(
+            settings.FIXTURE_DIR,
+            latency_ms=settings.FIXTURE_REPLAY_LATENCY_MS,
+            latency_scale=settings.FIXTURE_REPLAY_LATENCY_SCALE
+        )
+    raise ValueError(f"不支持的数据源: {name}，可选: {', '.join(DATA_SOURCES)}")
+
+
+# 创建全局实例
+data_source = create_data_source(settings.DATA_SOURCE)
@@ -0,0 +1,198 @@
+"""
+akshare调用的录制与回放
+录制模式包装真实数据源，把每次成功调用的参数、结果和耗时写入压缩的夹具文件；
+回放模式不访问网络，从夹具文件返回录制的结果，并按录制时的耗时或固定值模拟延迟，
+用于离线、可重复的性能回归测试
+"""
+import os
+import gzip
+import json
+import time
+import pickle
+import hashlib
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from functools import wraps
+from typing import Any, Dict, List
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FIXTURE_SUFFIX = ".pkl.gz"
+# 开始和结束日期都给出时按跨度（天数）匹配，而不是具体日期：
+# 服务按"最近N天"计算日期，换一天回放仍能命中同一份夹具
+DATE_ARGUMENTS = ("start_date", "end_date")
+
+
+class FixtureNotFoundError(LookupError):
+    """回放时没有匹配的夹具"""
+
+
+def fixture_key(function: str, args: tuple, kwargs: dict) -> Dict[str, Any]:
+    """
+    夹具的匹配键
+
+    Args:
+        function: akshare函数名
+        args: 位置参数
+        kwargs: 关键字参数
+
+    Returns:
+        Dict: function和params（参数值统一转为字符串，日期参数换成date_span）
+    """
+    params = {f"arg{index}": value for index, value in enumerate(args)}
+    params.update(kwargs)
+    start, end = (params.get(name) for name in DATE_ARGUMENTS)
+    if start and end:
+        try:
+            span = (pd.Timestamp(str(end)) - pd.Timestamp(str(start))).days
+        except ValueError:
+            span = None
+        if span is not None:
+            for name in DATE_ARGUMENTS:
+                del params[name]
+            params["date_span"] = span
+    return {"function": function, "params": {name: str(value) for name, value in sorted(params.items())}}
+
+
+def fixture_path(directory: str, key: Dict[str, Any]) -> str:
+    """夹具文件路径：<目录>/<函数名>/<参数摘要>.pkl.gz"""
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return os.path.join(directory, key["function"], f"{digest[:16]}{FIXTURE_SUFFIX}")
+
+
+class FixtureRecorder:
+    """
+    录制数据源
+
+    函数调用原样转发给被包装的数据源，成功的结果写入夹具（同一参数重复录制时覆盖），
+    写入失败只记录日志，不影响调用方
+    """
+
+    def __init__(self, source: Any, directory: str):
+        """
+        Args:
+            source: 被录制的数据源（akshare模块或接口相同的替身）
+            directory: 夹具目录
+        """
+        self.source = source
+        self.directory = directory
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        if name.startswith("_") or name == "source":
+            raise AttributeError(name)
+        func = getattr(self.source, name)
+        if not callable(func):
+            return func
+
+        @wraps(func)
+        def recorded(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            with self._lock:
+                self.calls[name] += 1
+            self._save(fixture_key(name, args, kwargs), result, time.perf_counter() - start)
+            return result
+
+        return recorded
+
+    def _save(self, key: Dict[str, Any], result: Any, duration: float):
+        path = fixture_path(self.directory, key)
+        record = {
+            "key": key,
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+            "duration": duration,
+            "result": result
+        }
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # gzip头中不写入当前时间
+            payload = gzip.compress(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL), mtime=0)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+            logger.debug(f"录制夹具: {key['function']} {key['params']} -> {path}")
+        except Exception as e:
+            logger.warning(f"写入夹具失败: {path}, 错误: {str(e)}")
+
+
+class FixtureReplayer:
+    """
+    回放数据源
+
+    任意akshare函数名都可以调用，按参数查找夹具并返回录制结果的副本；
+    没有匹配的夹具时抛出FixtureNotFoundError（错误信息含"未找到"，服务不会重试）
+    """
+
+    def __init__(self, directory: str, latency_ms: float = -1.0, latency_scale: float = 1.0):
+        """
+        Args:
+            directory: 夹具目录
+            latency_ms: 每次调用的固定延迟（毫秒），小于0时按录制时的实际耗时
+            latency_scale: 按录制耗时回放时的倍数
+        """
+        self.directory = directory
+        self.latency_ms = latency_ms
+        self.latency_scale = latency_scale
+        self.calls = Counter()
+        self.misses = Counter()
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def replay(*args, **kwargs):
+            return self._replay(name, args, kwargs)
+
+        replay.__name__ = name
+        return replay
+
+    def _load(self, path: str) -> Dict[str, Any]:
+        """读取夹具（解压后的内容留在内存中，重复回放不再读文件）"""
+        with self._lock:
+            record = self._records.get(path)
+        if record is None:
+            with open(path, "rb") as f:
+                record = pickle.loads(gzip.decompress(f.read()))
+            with self._lock:
+                self._records[path] = record
+        return record
+
+    def _replay(self, name: str, args: tuple, kwargs: dict) -> Any:
+        key = fixture_key(name, args, kwargs)
+        path = fixture_path(self.directory, key)
+        try:
+            record = self._load(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses[name] += 1
+            raise FixtureNotFoundError(f"未找到回放夹具: {name} {key['params']}") from None
+
+        with self._lock:
+            self.calls[name] += 1
+        delay = record["duration"] * self.latency_scale if self.latency_ms < 0 else self.latency_ms / 1000
+        if delay > 0:
+            time.sleep(delay)
+        result = record["result"]
+        # 调用方可能修改返回的数据帧，不能影响后续回放
+        return result.copy() if isinstance(result, pd.DataFrame) else result
+
+    def symbols(self, function: str) -> List[str]:
+        """已录制的某个函数的symbol参数（按代码排序）"""
+        folder = os.path.join(self.directory, function)
+        if not os.path.isdir(folder):
+            return []
+        symbols = set()
+        for filename in os.listdir(folder):
+            if filename.endswith(FIXTURE_SUFFIX):
+                params = self._load(os.path.join(folder, filename))["key"]["params"]
+                symbols.add(params.get("symbol", params.get("arg0")))
+        return sorted(symbol for symbol in symbols if symbol is not None)
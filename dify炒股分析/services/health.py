@@ -0,0 +1,222 @@
+"""
+健康检查服务
+依赖探测（上游行情源、Redis、缓存内存占用）在后台任务中定时执行，健康检查接口只读取最近一次结果；
+饱和度（事件循环延迟、处理中请求数、akshare调用数、计算进程池排队）和熔断器状态直接读取内存计数，
+因此/livez、/readyz、/health本身不发起任何网络请求，也不会被慢依赖拖住
+"""
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+
+from config import settings
+from services.compute_scheduler import compute_scheduler
+from services.data_source import is_offline
+from services.technical_analysis import HAS_TALIB
+from utils.cache import cache_registry
+from utils.metrics import Gauge, event_loop_lag_last, http_requests_in_progress, metrics_registry, register_metric
+from utils.rate_limiter import rate_limiter
+from utils.retry_handler import CircuitState, circuit_breakers
+
+logger = logging.getLogger(__name__)
+
+# 探测结果状态
+PROBE_OK = "ok"
+PROBE_FAILED = "failed"
+PROBE_DISABLED = "disabled"
+PROBE_PENDING = "pending"
+
+
+class HealthMonitor:
+    """
+    依赖健康监控
+
+    后台任务每interval秒执行一轮探测，各探测相互独立、单独超时；
+    upstream_reachable供数据服务在发起请求前快速判断网络状态
+    """
+
+    def __init__(self, interval: float = 15.0, timeout: float = 3.0):
+        """
+        Args:
+            interval: 探测间隔（秒）
+            timeout: 单次探测超时（秒）
+        """
+        self.interval = interval
+        self.timeout = timeout
+        self.upstream_reachable = True  # 首轮探测完成前按可达处理
+        self.started = False
+        self.shutting_down = False
+        self.cache_bytes = 0
+        self._probes: Dict[str, Dict[str, Any]] = {
+            name: {"status": PROBE_PENDING} for name in ("upstream", "redis", "cache_memory")
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """在当前事件循环中启动探测任务"""
+        self.started = True
+        self.shutting_down = False
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """停止探测任务，之后就绪检查返回未就绪，负载均衡不再分配新请求"""
+        self.shutting_down = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        async with httpx.AsyncClient(timeout=self.timeout, follow_redirects=False) as client:
+            while True:
+                await self.run_probes(client)
+                await asyncio.sleep(self.interval)
+
+    async def run_probes(self, client: httpx.AsyncClient):
+        """执行一轮探测"""
+        results = await asyncio.gather(
+            self._probe_upstream(client),
+            self._probe_redis(),
+            self._probe_cache_memory(),
+            return_exceptions=True
+        )
+        checked_at = datetime.now().isoformat(timespec='seconds')
+        for name, result in zip(("upstream", "redis", "cache_memory"), results):
+            if isinstance(result, BaseException):
+                result = {"status": PROBE_FAILED, "error": str(result) or type(result).__name__}
+            result["checked_at"] = checked_at
+            if result["status"] == PROBE_FAILED and self._probes[name]["status"] != PROBE_FAILED:
+                logger.warning(f"依赖探测失败: {name}, {result.get('error')}")
+            self._probes[name] = result
+
+    async def _probe_upstream(self, client: httpx.AsyncClient) -> Dict[str, Any]:
+        """上游行情源可达性：任一地址返回HTTP响应（不论状态码）即视为可达"""
+        if not settings.ENABLE_REAL_DATA:
+            self.upstream_reachable = True
+            return {"status": PROBE_DISABLED, "detail": "模拟数据"}
+        if is_offline(settings.DATA_SOURCE):
+            self.upstream_reachable = True
+            return {"status": PROBE_DISABLED, "detail": f"数据源: {settings.DATA_SOURCE}"}
+
+        async def fetch(url: str) -> float:
+            start = time.perf_counter()
+            await client.head(url)
+            return time.perf_counter() - start
+
+        urls = settings.HEALTH_UPSTREAM_URLS
+        results = await asyncio.gather(*(fetch(url) for url in urls), return_exceptions=True)
+        reachable = {url: round(result * 1000, 1) for url, result in zip(urls, results)
+                     if not isinstance(result, BaseException)}
+        self.upstream_reachable = bool(reachable)
+        if reachable:
+            return {"status": PROBE_OK, "latency_ms": reachable}
+        return {"status": PROBE_FAILED, "error": f"{len(urls)} 个地址均不可达"}
+
+    async def _probe_redis(self) -> Dict[str, Any]:
+        """Redis连通性（仅在限流使用Redis存储时探测）"""
+        start = time.perf_counter()
+        reachable = await asyncio.wait_for(rate_limiter.backend.ping(), self.timeout)
+        if reachable is None:
+            return {"status": PROBE_DISABLED, "detail": "未启用"}
+        if not reachable:
+            return {"status": PROBE_FAILED, "error": "PING无响应"}
+        return {"status": PROBE_OK, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    async def _probe_cache_memory(self) -> Dict[str, Any]:
+        """缓存内存占用（逐条估算字节数，在线程池中执行）"""
+        def measure() -> Dict[str, int]:
+            return {name: instance.get_stats().get("bytes", 0)
+                    for name, instance in list(cache_registry.items()) if hasattr(instance, "get_stats")}
+
+        by_cache = await asyncio.get_running_loop().run_in_executor(None, measure)
+        self.cache_bytes = sum(by_cache.values())
+        return {"status": PROBE_OK, "bytes": self.cache_bytes, "by_cache": by_cache}
+
+    def saturation(self) -> Dict[str, Dict[str, Any]]:
+        """当前饱和度（只读内存计数，可在请求中直接调用）"""
+        upstream_in_flight = metrics_registry.get("akshare_requests_in_flight")
+        items = {
+            "event_loop_lag_seconds": (event_loop_lag_last.get(), settings.HEALTH_MAX_LOOP_LAG),
+            "requests_in_progress": (http_requests_in_progress.get(), settings.HEALTH_MAX_IN_PROGRESS),
+            "upstream_in_flight": (upstream_in_flight.get() if upstream_in_flight else 0,
+                                   settings.HEALTH_MAX_UPSTREAM_IN_FLIGHT),
+            "compute_pending": (compute_scheduler.pending,
+                                compute_scheduler.max_workers * settings.HEALTH_MAX_COMPUTE_PENDING_RATIO),
+        }
+        return {
+            name: {"value": round(value, 4), "limit": limit, "saturated": value > limit}
+            for name, (value, limit) in items.items()
+        }
+
+    @staticmethod
+    def circuits() -> Dict[str, Dict[str, Any]]:
+        """各熔断器状态"""
+        return {name: breaker.get_stats() for name, breaker in sorted(circuit_breakers.items())}
+
+    def readiness(self) -> Tuple[bool, List[str]]:
+        """
+        就绪检查
+
+        Returns:
+            Tuple[bool, List[str]]: 是否就绪及未就绪原因（启动中、关闭中或资源饱和）
+        """
+        if self.shutting_down:
+            return False, ["shutting_down"]
+        if not self.started:
+            return False, ["starting"]
+        reasons = [f"{name}_saturated" for name, item in self.saturation().items() if item["saturated"]]
+        return not reasons, reasons
+
+    def dependencies(self) -> Dict[str, str]:
+        """各依赖的简要状态"""
+        upstream = self._probes["upstream"]
+        return {
+            "akshare": upstream.get("detail") or {
+                PROBE_OK: "正常", PROBE_FAILED: "不可达", PROBE_PENDING: "检测中"
+            }[upstream["status"]],
+            "redis": {
+                PROBE_OK: "正常", PROBE_FAILED: "不可达", PROBE_DISABLED: "未启用", PROBE_PENDING: "检测中"
+            }[self._probes["redis"]["status"]],
+            "talib": "正常" if HAS_TALIB else "未安装（使用pandas实现）",
+        }
+
+    def get_report(self) -> Dict[str, Any]:
+        """
+        汇总健康状态
+
+        上游不可达为unhealthy；有熔断器打开、Redis不可达或资源饱和为degraded（仍可返回缓存数据）
+        """
+        ready, reasons = self.readiness()
+        circuits = self.circuits()
+        open_circuits = [name for name, stats in circuits.items() if stats["state"] != CircuitState.CLOSED.value]
+
+        if self._probes["upstream"]["status"] == PROBE_FAILED:
+            status = "unhealthy"
+        elif open_circuits or self._probes["redis"]["status"] == PROBE_FAILED or not ready:
+            status = "degraded"
+        else:
+            status = "healthy"
+
+        return {
+            "status": status,
+            "dependencies": self.dependencies(),
+            "checks": {
+                "ready": ready,
+                "not_ready_reasons": reasons,
+                "probes": self._probes,
+                "saturation": self.saturation(),
+                "circuit_breakers": circuits,
+            }
+        }
+
+
+# 创建全局实例
+health_monitor = HealthMonitor(settings.HEALTH_PROBE_INTERVAL, settings.HEALTH_PROBE_TIMEOUT)
+register_metric(Gauge("cache_memory_bytes", "缓存估算内存占用合计（后台探测更新）")) \
+    .set_function(lambda: {(): health_monitor.cache_bytes})
@@ -0,0 +1,413 @@
+"""
+实时行情推送服务
+按订阅股票的并集定时刷新实时行情，增量更新技术指标，只向订阅者推送发生变化的字段
+"""
+import asyncio
+import logging
+import math
+from collections import defaultdict, deque
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+import pandas as pd
+
+from config import settings
+from services.stock_data_service import stock_data_service
+from services.technical_analysis import technical_analysis
+from utils.market_session import get_market_now, get_refresh_interval
+from utils.metrics import Counter, Gauge, register_metric
+
+logger = logging.getLogger(__name__)
+
+SymbolKey = Tuple[str, str]
+
+
+def _to_float(value: Any) -> Optional[float]:
+    """转换为float，空值和NaN返回None"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+class IncrementalIndicators:
+    """
+    实时技术指标增量计算
+
+    用截至上一交易日的日线初始化各指标的中间状态，盘中每次行情更新只需按窗口大小计算当日指标，
+    无需重算全部历史。计算口径与TechnicalAnalysis的pandas实现一致（EMA采用pandas ewm的adjust=True公式）
+    """
+
+    def __init__(self, trade_date: date):
+        self.trade_date = trade_date
+        self.ma_periods = list(technical_analysis.ma_periods)
+        self.macd_fast = technical_analysis.macd_fast
+        self.macd_slow = technical_analysis.macd_slow
+        self.macd_signal = technical_analysis.macd_signal
+        self.rsi_period = technical_analysis.rsi_period
+        self.kdj_period = technical_analysis.kdj_period
+        self.bollinger_period = technical_analysis.bollinger_period
+        self.bollinger_std = technical_analysis.bollinger_std
+
+        window = max(self.ma_periods + [self.bollinger_period, self.rsi_period + 1])
+        self._closes = deque(maxlen=window - 1)
+        self._highs = deque(maxlen=self.kdj_period - 1)
+        self._lows = deque(maxlen=self.kdj_period - 1)
+        # EMA状态：(加权和, 权重和)，EMA = 加权和 / 权重和
+        self._ema_fast = (0.0, 0.0)
+        self._ema_slow = (0.0, 0.0)
+        self._ema_signal = (0.0, 0.0)
+        self._k_prev = 50.0
+        self._d_prev = 50.0
+        self._count = 0
+
+    @classmethod
+    def from_frame(cls, raw_data: Optional[pd.DataFrame], trade_date: date) -> Optional['IncrementalIndicators']:
+        """
+        用历史日线初始化指标状态（当日及之后的K线不参与初始化）
+
+        Args:
+            raw_data: 历史行情数据（中英文列名均可）
+            trade_date: 当前交易日
+
+        Returns:
+            IncrementalIndicators: 指标状态，数据为空时返回None
+        """
+        if raw_data is None or raw_data.empty:
+            return None
+
+        df = technical_analysis._prepare_data(raw_data.copy())
+        date_col = '日期' if '日期' in df.columns else 'date' if 'date' in df.columns else None
+        if date_col is not None:
+            dates = pd.to_datetime(df[date_col]).dt.date
+            df = df[dates < trade_date]
+        df = df.dropna(subset=['close', 'high', 'low'])
+
+        state = cls(trade_date)
+        for close, high, low in zip(df['close'].to_numpy(float), df['high'].to_numpy(float),
+                                    df['low'].to_numpy(float)):
+            state._step(close, high, low, commit=True)
+        return state
+
+    @staticmethod
+    def _ewm_next(ema_state: Tuple[float, float], value: float, span: int) -> Tuple[float, float]:
+        """pandas ewm(span, adjust=True)的递推形式"""
+        decay = 1 - 2 / (span + 1)
+        weighted, weights = ema_state
+        return value + decay * weighted, 1 + decay * weights
+
+    def update(self, price: float, high: float, low: float) -> Dict[str, Optional[float]]:
+        """
+        以当日最新价计算指标（不改变历史状态）
+
+        Args:
+            price: 最新价
+            high: 当日最高价
+            low: 当日最低价
+
+        Returns:
+            Dict: 与TechnicalSummary同名的指标字段
+        """
+        return self._step(price, high, low, commit=False)
+
+    def _step(self, close: float, high: float, low: float, commit: bool) -> Dict[str, Optional[float]]:
+        """计算加入一根K线后的指标，commit为True时将该K线计入历史状态"""
+        closes = np.append(np.fromiter(self._closes, dtype=float, count=len(self._closes)), close)
+        count = self._count + 1
+        values: Dict[str, Optional[float]] = {}
+
+        # 移动平均线
+        for period in self.ma_periods:
+            values[f'ma{period}'] = float(closes[-period:].mean()) if count >= period else None
+
+        # MACD
+        ema_fast = self._ewm_next(self._ema_fast, close, self.macd_fast)
+        ema_slow = self._ewm_next(self._ema_slow, close, self.macd_slow)
+        macd = ema_fast[0] / ema_fast[1] - ema_slow[0] / ema_slow[1]
+        ema_signal = self._ewm_next(self._ema_signal, macd, self.macd_signal)
+        signal = ema_signal[0] / ema_signal[1]
+        if count >= max(self.macd_fast, self.macd_slow) + self.macd_signal:
+            values.update(macd=macd, macd_signal=signal, macd_histogram=macd - signal)
+        else:
+            values.update(macd=None, macd_signal=None, macd_histogram=None)
+
+        # RSI
+        values['rsi'] = None
+        if count >= self.rsi_period + 1:
+            delta = np.diff(closes[-(self.rsi_period + 1):])
+            gain = delta[delta > 0].sum()
+            loss = -delta[delta < 0].sum()
+            if loss > 0:
+                values['rsi'] = float(100 - 100 / (1 + gain / loss))
+            elif gain > 0:
+                values['rsi'] = 100.0
+
+        # KDJ
+        k_value, d_value = self._k_prev, self._d_prev
+        values.update(kdj_k=None, kdj_d=None, kdj_j=None)
+        if count >= self.kdj_period:
+            highest = max(max(self._highs), high)
+            lowest = min(min(self._lows), low)
+            if highest > lowest:
+                rsv = (close - lowest) / (highest - lowest) * 100
+                k_value = (2 / 3) * self._k_prev + (1 / 3) * rsv
+                d_value = (2 / 3) * self._d_prev + (1 / 3) * k_value
+                values.update(kdj_k=k_value, kdj_d=d_value, kdj_j=3 * k_value - 2 * d_value)
+
+        # 布林带
+        if count >= self.bollinger_period:
+            window = closes[-self.bollinger_period:]
+            middle = float(window.mean())
+            std = float(window.std(ddof=1))
+            values.update(
+                bollinger_upper=middle + std * self.bollinger_std,
+                bollinger_middle=middle,
+                bollinger_lower=middle - std * self.bollinger_std
+            )
+        else:
+            values.update(bollinger_upper=None, bollinger_middle=None, bollinger_lower=None)
+
+        if commit:
+            self._closes.append(close)
+            self._highs.append(high)
+            self._lows.append(low)
+            self._ema_fast, self._ema_slow, self._ema_signal = ema_fast, ema_slow, ema_signal
+            self._k_prev, self._d_prev = k_value, d_value
+            self._count = count
+
+        return values
+
+
+class LiveSubscription:
+    """
+    单个客户端的订阅
+
+    未读取的更新按股票合并，客户端读取较慢时只保留每只股票的最新值，内存占用与订阅股票数成正比
+    """
+
+    def __init__(self, market_type: str, symbols: Iterable[str]):
+        self.market_type = market_type
+        self.symbols: Set[str] = set(symbols)
+        self.closed = False
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._event = asyncio.Event()
+
+    def push(self, symbol: str, delta: Dict[str, Any]):
+        """合并一只股票的变化字段"""
+        self._pending.setdefault(symbol, {}).update(delta)
+        self._event.set()
+
+    async def next_batch(self, timeout: float) -> Dict[str, Dict[str, Any]]:
+        """
+        等待并取出所有未读更新
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            Dict: 股票代码到变化字段的映射，超时或订阅关闭时返回空字典
+        """
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        self._event.clear()
+        batch, self._pending = self._pending, {}
+        return batch
+
+    def close(self):
+        """关闭订阅，唤醒等待中的读取方"""
+        self.closed = True
+        self._event.set()
+
+
+class LiveUpdateHub:
+    """实时行情推送中心"""
+
+    def __init__(self):
+        self._subscribers: Dict[SymbolKey, Set[LiveSubscription]] = defaultdict(set)
+        self._indicators: Dict[SymbolKey, Tuple[date, Optional[IncrementalIndicators]]] = {}
+        self._last_values: Dict[SymbolKey, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.subscription_count = 0
+        self.refresh_count = 0
+
+    @property
+    def symbol_count(self) -> int:
+        """当前订阅的股票数（所有订阅的并集）"""
+        return len(self._subscribers)
+
+    def subscribe(self, market_type: str, symbols: Iterable[str]) -> LiveSubscription:
+        """
+        订阅一组股票
+
+        已有数据的股票会立即推送一次完整状态，新股票会触发一次立即刷新
+
+        Args:
+            market_type: 市场类型
+            symbols: 股票代码
+
+        Returns:
+            LiveSubscription: 订阅对象，使用完毕后需调用unsubscribe
+        """
+        subscription = LiveSubscription(market_type, symbols)
+        has_new_symbol = False
+        for code in subscription.symbols:
+            key = (market_type, code)
+            has_new_symbol = has_new_symbol or key not in self._subscribers
+            self._subscribers[key].add(subscription)
+            if key in self._last_values:
+                subscription.push(code, self._last_values[key])
+
+        self.subscription_count += 1
+        self._ensure_running()
+        if has_new_symbol:
+            self._wakeup.set()
+        return subscription
+
+    def unsubscribe(self, subscription: LiveSubscription):
+        """取消订阅，不再有订阅者的股票停止刷新"""
+        if subscription.closed:
+            return
+        subscription.close()
+        self.subscription_count -= 1
+        for code in subscription.symbols:
+            key = (subscription.market_type, code)
+            subscribers = self._subscribers.get(key)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[key]
+                self._last_values.pop(key, None)
+                self._indicators.pop(key, None)
+
+    def _ensure_running(self):
+        """启动后台刷新任务"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        """后台刷新循环，没有订阅时自动退出"""
+        while self._subscribers:
+            self._wakeup.clear()
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"刷新实时行情失败: {str(e)}")
+
+            markets = {market for market, _ in self._subscribers}
+            interval = min(
+                (get_refresh_interval(market, settings.LIVE_UPDATE_INTERVAL,
+                                      settings.LIVE_UPDATE_CLOSED_INTERVAL)
+                 for market in markets),
+                default=settings.LIVE_UPDATE_INTERVAL
+            )
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def refresh(self):
+        """刷新一次所有订阅股票的行情，并向订阅者推送变化字段"""
+        symbols_by_market: Dict[str, List[str]] = defaultdict(list)
+        for market, code in list(self._subscribers):
+            symbols_by_market[market].append(code)
+
+        for market, codes in symbols_by_market.items():
+            # 每个市场只请求一次实时行情，与订阅者数量无关
+            snapshot = await stock_data_service.get_spot_snapshot(market, codes)
+            today = get_market_now(market).date()
+            await self._prepare_indicators([(market, code) for code in codes], today)
+
+            for code in codes:
+                key = (market, code)
+                if key not in self._subscribers or code not in snapshot.index:
+                    continue
+
+                values = self._build_values(key, snapshot.loc[code])
+                last = self._last_values.get(key, {})
+                delta = {name: value for name, value in values.items()
+                         if name not in last or last[name] != value}
+                if not delta:
+                    continue
+
+                self._last_values[key] = values
+                for subscription in self._subscribers[key]:
+                    subscription.push(code, delta)
+
+        self.refresh_count += 1
+
+    async def _prepare_indicators(self, keys: List[SymbolKey], today: date):
+        """为新订阅的股票（或跨交易日后）加载历史数据并初始化指标状态"""
+        missing = [key for key in keys
+                   if key not in self._indicators or self._indicators[key][0] != today]
+        if not missing:
+            return
+
+        semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+
+        async def load(key: SymbolKey):
+            market, code = key
+            async with semaphore:
+                try:
+                    stock_data = await stock_data_service.get_stock_data(
+                        code, market, settings.LIVE_HISTORY_DAYS
+                    )
+                    state = IncrementalIndicators.from_frame(stock_data.get('raw_data'), today)
+                except Exception as e:
+                    logger.warning(f"加载实时指标历史数据失败: {code}, 错误: {str(e)}")
+                    state = None
+            self._indicators[key] = (today, state)
+
+        await asyncio.gather(*(load(key) for key in missing))
+
+    def _build_values(self, key: SymbolKey, row: pd.Series) -> Dict[str, Any]:
+        """由行情快照和指标状态生成一只股票的当前值"""
+        price = _to_float(row.get('最新价'))
+        high = _to_float(row.get('最高'))
+        low = _to_float(row.get('最低'))
+        values: Dict[str, Any] = {
+            'price': price,
+            'change': _to_float(row.get('涨跌额')),
+            'change_percent': _to_float(row.get('涨跌幅')),
+            'volume': _to_float(row.get('成交量')),
+            'high': high,
+            'low': low
+        }
+
+        _, state = self._indicators.get(key, (None, None))
+        if state is not None and price is not None:
+            values.update(state.update(price, high or price, low or price))
+
+        # 统一精度，避免浮点误差导致无意义的推送
+        return {name: round(value, 4) if isinstance(value, float) else value
+                for name, value in values.items()}
+
+    async def close(self):
+        """停止刷新任务并关闭所有订阅"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for subscriptions in list(self._subscribers.values()):
+            for subscription in list(subscriptions):
+                self.unsubscribe(subscription)
+
+
+# 创建全局实例
+live_update_hub = LiveUpdateHub()
+
+# 实时推送指标在导出时读取
+register_metric(Gauge("live_subscriptions", "实时推送订阅连接数")) \
+    .set_function(lambda: {(): live_update_hub.subscription_count})
+register_metric(Gauge("live_symbols", "实时推送订阅的股票数")) \
+    .set_function(lambda: {(): live_update_hub.symbol_count})
+register_metric(Counter("live_refreshes_total", "实时行情刷新次数")) \
+    .set_function(lambda: {(): live_update_hub.refresh_count})
@@ -0,0 +1,249 @@
+"""
+市场概览服务
+基于一份全市场实时行情快照，以向量化分组聚合计算指数、涨跌家数、涨跌停、成交额和行业表现；
+聚合结果按交易时段缓存，快照刷新前的请求直接返回已算好的结果
+"""
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from config import settings, SUPPORTED_MARKETS, MAIN_INDICES
+from services.stock_data_service import stock_data_service
+from utils.cache import SimpleCache, register_cache, generate_cache_key
+from utils.market_session import is_trading_time, get_refresh_interval
+
+logger = logging.getLogger(__name__)
+
+# 聚合结果缓存（每个市场一条）
+overview_cache = register_cache("market_overview", SimpleCache(max_entries=len(SUPPORTED_MARKETS)))
+
+# A股涨跌幅限制（按代码前缀判断板块，风险警示股按名称判断）
+LIMIT_RATIO_MAIN = 0.10          # 主板
+LIMIT_RATIO_GROWTH = 0.20        # 创业板(300/301)、科创板(688/689)
+LIMIT_RATIO_BSE = 0.30           # 北交所(4/8/92开头)
+LIMIT_RATIO_ST = 0.05            # 主板风险警示股
+
+
+def _to_float(value) -> Optional[float]:
+    """转换为可JSON序列化的浮点数，NaN转为None"""
+    if value is None or pd.isna(value):
+        return None
+    return round(float(value), 4)
+
+
+def get_limit_ratios(snapshot: pd.DataFrame, market_type: str) -> np.ndarray:
+    """
+    计算每只股票的涨跌幅限制比例
+
+    Args:
+        snapshot: 实时行情快照
+        market_type: 市场类型
+
+    Returns:
+        np.ndarray: 限制比例，无涨跌幅限制（港股、美股、新股上市首日等）为NaN
+    """
+    count = len(snapshot)
+    if market_type == "ETF":
+        return np.full(count, LIMIT_RATIO_MAIN)
+    if market_type != "A":
+        return np.full(count, np.nan)
+
+    # 截断为定长字符串即可取前缀，避免逐个调用Python字符串方法
+    codes = snapshot['代码'].to_numpy().astype('U6')
+    names = snapshot['名称'].to_numpy().astype('U16')
+    growth = np.isin(codes.astype('U3'), ['300', '301', '688', '689'])
+    bse = np.isin(codes.astype('U1'), ['4', '8']) | (codes.astype('U2') == '92')
+    st = np.char.find(names, 'ST') >= 0
+    # 名称以N/C开头的为上市初期不设涨跌幅限制的新股
+    new_listing = np.isin(names.astype('U1'), ['N', 'C'])
+
+    return np.select(
+        [new_listing, bse, growth, st],
+        [np.nan, LIMIT_RATIO_BSE, LIMIT_RATIO_GROWTH, LIMIT_RATIO_ST],
+        default=LIMIT_RATIO_MAIN
+    )
+
+
+class MarketOverviewService:
+    """市场概览服务"""
+
+    def __init__(self, top_n: int = 3):
+        """
+        Args:
+            top_n: 每个行业返回的领涨股数量
+        """
+        self.top_n = top_n
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def get_overview(self, market_type: str) -> Dict[str, Any]:
+        """
+        获取市场概览
+
+        聚合结果的缓存时间与实时行情快照一致（交易时间内SPOT_CACHE_SECONDS秒，休市期间到下次开盘），
+        过期后只有一个请求重新聚合，其余请求等待共享结果
+
+        Args:
+            market_type: 市场类型
+
+        Returns:
+            Dict[str, Any]: 市场概览数据
+        """
+        cache_key = generate_cache_key("market_overview", market_type=market_type)
+        overview = overview_cache.get(cache_key)
+        if overview is not None:
+            return overview
+
+        lock = self._locks.setdefault(market_type, asyncio.Lock())
+        async with lock:
+            overview = overview_cache.get(cache_key)
+            if overview is None:
+                snapshot, indices, sector_map = await asyncio.gather(
+                    stock_data_service.get_spot_snapshot(market_type),
+                    stock_data_service.get_index_snapshot(market_type),
+                    stock_data_service.get_sector_map(market_type)
+                )
+                overview = self.build_overview(market_type, snapshot, indices, sector_map)
+                ttl = get_refresh_interval(
+                    market_type, settings.SPOT_CACHE_SECONDS, settings.HTTP_CACHE_MAX_AGE_CLOSED
+                )
+                overview_cache.set(cache_key, overview, ttl)
+        return overview
+
+    def build_overview(self, market_type: str, snapshot: pd.DataFrame, indices: pd.DataFrame,
+                       sector_map: pd.Series) -> Dict[str, Any]:
+        """
+        由行情快照计算市场概览
+
+        Args:
+            market_type: 市场类型
+            snapshot: 全市场实时行情快照
+            indices: 指数实时行情
+            sector_map: 股票代码 -> 行业名称
+
+        Returns:
+            Dict[str, Any]: 市场概览数据
+        """
+        start_time = time.perf_counter()
+        overview = {
+            "market_info": {
+                "market_type": market_type,
+                "market_name": f"{SUPPORTED_MARKETS.get(market_type, market_type)}市场",
+                "trading_status": "交易中" if is_trading_time(market_type) else "休市",
+                "stock_count": int(len(snapshot)),
+                "updated_at": datetime.now().isoformat(timespec='seconds')
+            },
+            "main_indices": self._main_indices(market_type, indices),
+            "breadth": self._breadth(market_type, snapshot),
+            "turnover": {
+                "amount": _to_float(snapshot['成交额'].sum(min_count=1)),
+                "volume": _to_float(snapshot['成交量'].sum(min_count=1))
+            },
+            "sector_performance": self._sector_performance(snapshot, sector_map)
+        }
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        logger.info(f"市场概览聚合完成: {market_type}, {len(snapshot)} 只股票, 耗时 {elapsed_ms:.1f}ms")
+        return overview
+
+    def _main_indices(self, market_type: str, indices: pd.DataFrame) -> List[Dict[str, Any]]:
+        """按配置顺序提取主要指数"""
+        result = []
+        for code, name in MAIN_INDICES.get(market_type, {}).items():
+            if code not in indices.index:
+                continue
+            row = indices.loc[code]
+            result.append({
+                "name": name,
+                "code": code,
+                "current_value": _to_float(row.get('最新价')),
+                "change": _to_float(row.get('涨跌额')),
+                "change_percent": _to_float(row.get('涨跌幅'))
+            })
+        return result
+
+    def _breadth(self, market_type: str, snapshot: pd.DataFrame) -> Dict[str, Any]:
+        """涨跌家数与涨跌停家数"""
+        price = snapshot['最新价'].to_numpy(dtype=float)
+        change = snapshot['涨跌幅'].to_numpy(dtype=float)
+        prev_close = snapshot['昨收'].to_numpy(dtype=float)
+        traded = ~np.isnan(price) & (snapshot['成交量'].fillna(0).to_numpy(dtype=float) > 0)
+
+        breadth = {
+            "advance": int(np.sum(traded & (change > 0))),
+            "decline": int(np.sum(traded & (change < 0))),
+            "flat": int(np.sum(traded & (change == 0))),
+            "suspended": int(np.sum(~traded)),
+            "limit_up": None,
+            "limit_down": None
+        }
+
+        ratios = get_limit_ratios(snapshot, market_type)
+        if not np.isnan(ratios).all():
+            limited = traded & ~np.isnan(ratios) & (prev_close > 0)
+            with np.errstate(invalid='ignore'):
+                # 涨跌停价按昨收计算并四舍五入到分
+                up_price = np.floor(prev_close * (1 + ratios) * 100 + 0.5) / 100
+                down_price = np.floor(prev_close * (1 - ratios) * 100 + 0.5) / 100
+                breadth["limit_up"] = int(np.sum(limited & (price >= up_price - 1e-6)))
+                breadth["limit_down"] = int(np.sum(limited & (price <= down_price + 1e-6)))
+        return breadth
+
+    def _sector_performance(self, snapshot: pd.DataFrame, sector_map: pd.Series) -> List[Dict[str, Any]]:
+        """
+        按行业分组统计平均涨跌幅、涨跌家数、成交额及领涨股
+
+        行业名称先编码为整数分组号，各项统计用bincount一次完成，领涨股按(分组号, 涨跌幅降序)排序后取每组前top_n
+        """
+        if sector_map.empty or snapshot.empty:
+            return []
+
+        sectors = snapshot['代码'].map(sector_map).to_numpy()
+        change = snapshot['涨跌幅'].to_numpy(dtype=float)
+        valid = pd.notna(sectors) & ~np.isnan(change)
+        if not valid.any():
+            return []
+
+        group_ids, labels = pd.factorize(sectors[valid])
+        change = change[valid]
+        amount = np.nan_to_num(snapshot['成交额'].to_numpy(dtype=float)[valid])
+        codes = snapshot['代码'].to_numpy()[valid]
+        names = snapshot['名称'].to_numpy()[valid]
+
+        group_count = len(labels)
+        stock_count = np.bincount(group_ids, minlength=group_count)
+        mean_change = np.bincount(group_ids, weights=change, minlength=group_count) / stock_count
+        advance = np.bincount(group_ids, weights=change > 0, minlength=group_count)
+        decline = np.bincount(group_ids, weights=change < 0, minlength=group_count)
+        total_amount = np.bincount(group_ids, weights=amount, minlength=group_count)
+
+        # 每组内按涨跌幅降序的名次，取前top_n
+        order = np.lexsort((-change, group_ids))
+        sorted_ids = group_ids[order]
+        group_starts = np.searchsorted(sorted_ids, np.arange(group_count))
+        rank = np.arange(len(order)) - group_starts[sorted_ids]
+        top_gainers: List[List[Dict[str, Any]]] = [[] for _ in range(group_count)]
+        for index in order[rank < self.top_n]:
+            top_gainers[group_ids[index]].append(
+                {"code": codes[index], "name": names[index], "change_percent": _to_float(change[index])}
+            )
+
+        return [
+            {
+                "name": labels[group],
+                "change_percent": _to_float(mean_change[group]),
+                "stock_count": int(stock_count[group]),
+                "advance": int(advance[group]),
+                "decline": int(decline[group]),
+                "amount": _to_float(total_amount[group]),
+                "leading_stocks": [item["code"] for item in top_gainers[group]],
+                "top_gainers": top_gainers[group]
+            }
+            for group in np.argsort(-mean_change, kind='stable')
+        ]
+
+
+# 创建全局实例
+market_overview_service = MarketOverviewService(top_n=settings.MARKET_OVERVIEW_TOP_N)
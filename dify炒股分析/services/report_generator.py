@@ -40,7 +40,7 @@ class ReportGenerator:
             
         except Exception as e:
             logger.error(f"生成分析报告失败: {str(e)}")
-            return self._get_default_report()
+            return self.get_default_report()
     
     def _generate_trend_analysis(self, indicators: Dict, recent_data: List[Dict]) -> str:
         """生成趋势分析"""
@@ -286,7 +286,7 @@ class ReportGenerator:
             logger.error(f"生成交易建议失败: {str(e)}")
             return "交易建议暂时无法生成，请稍后重试。"
     
-    def _get_default_report(self) -> Dict[str, str]:
+    def get_default_report(self) -> Dict[str, str]:
         """获取默认报告"""
         return {
             'trend_analysis': "趋势分析暂时无法生成，请稍后重试。",
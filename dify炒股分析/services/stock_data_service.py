@@ -1,21 +1,100 @@
 """
 股票数据获取服务
 """
-import akshare as ak
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterable
 import asyncio
 import logging
-from config import settings, ERROR_MESSAGES
+import time
+import zlib
+from config import settings, ERROR_MESSAGES, MAIN_INDICES, SUPPORTED_MARKETS
 from utils.retry_handler import (
     default_retry_handler, aggressive_retry_handler,
-    retry, RetryableError, NonRetryableError
+    retry, RetryableError, NonRetryableError, CircuitOpenError, CircuitState, get_circuit_breaker
 )
-from utils.network_utils import check_network_connectivity
+from utils.cache import cache, generate_cache_key, register_cache, SimpleCache
+from utils.market_session import get_refresh_interval
+from utils.metrics import Counter, Gauge, Histogram, register_metric
+from services.health import health_monitor
+from services.data_source import data_source as ak
+from services.synthetic_market import MARKET_PROFILES, generate_bars
 
 logger = logging.getLogger(__name__)
 
+# 上游接口指标，function为akshare函数名，market为市场类型
+upstream_duration = register_metric(Histogram(
+    "akshare_request_duration_seconds",
+    "单次akshare调用耗时（不含重试间隔）",
+    labelnames=("function", "market")
+))
+
+upstream_requests = register_metric(Counter(
+    "akshare_requests_total",
+    "akshare调用次数（outcome: ok 成功, error 失败）",
+    labelnames=("function", "market", "outcome")
+))
+
+upstream_in_flight = register_metric(Gauge(
+    "akshare_requests_in_flight",
+    "正在线程池中执行的akshare调用数"
+))
+
+# 全市场实时行情快照缓存（每个市场一条）
+spot_cache = register_cache("spot", SimpleCache(max_entries=len(SUPPORTED_MARKETS)))
+# 主要指数行情快照缓存（每个市场一条），与个股快照分开，避免互相挤出
+index_cache = register_cache("index", SimpleCache(max_entries=len(SUPPORTED_MARKETS)))
+
+# 各市场实时行情接口
+SPOT_FETCHERS = {
+    "A": lambda: ak.stock_zh_a_spot_em(),
+    "HK": lambda: ak.stock_hk_spot_em(),
+    "US": lambda: ak.stock_us_spot_em(),
+    "ETF": lambda: ak.fund_etf_spot_em(),
+}
+
+# 各市场实时行情接口名称（用于监控指标）
+SPOT_SOURCES = {
+    "A": "stock_zh_a_spot_em",
+    "HK": "stock_hk_spot_em",
+    "US": "stock_us_spot_em",
+    "ETF": "fund_etf_spot_em",
+}
+
+# 各市场主要指数实时行情接口（美股暂无）
+INDEX_FETCHERS = {
+    "A": lambda: ak.stock_zh_index_spot_em(symbol="沪深重要指数"),
+    "ETF": lambda: ak.stock_zh_index_spot_em(symbol="沪深重要指数"),
+    "HK": lambda: ak.stock_hk_index_spot_em(),
+}
+
+INDEX_SOURCES = {
+    "A": "stock_zh_index_spot_em",
+    "ETF": "stock_zh_index_spot_em",
+    "HK": "stock_hk_index_spot_em",
+}
+
+# 申万一级行业（2021版行业代码前两位 -> 行业名称）
+SW_INDUSTRY_NAMES = {
+    "11": "农林牧渔", "22": "基础化工", "23": "钢铁", "24": "有色金属", "27": "电子",
+    "28": "汽车", "33": "家用电器", "34": "食品饮料", "35": "纺织服饰", "36": "轻工制造",
+    "37": "医药生物", "41": "公用事业", "42": "交通运输", "43": "房地产", "45": "商贸零售",
+    "46": "社会服务", "48": "银行", "49": "非银金融", "51": "综合", "61": "建筑材料",
+    "62": "建筑装饰", "63": "电力设备", "64": "机械设备", "65": "国防军工", "71": "计算机",
+    "72": "传媒", "73": "通信", "74": "煤炭", "75": "石油石化", "76": "环保", "77": "美容护理",
+}
+
+# 不同接口的列名统一为A股实时行情的列名
+SPOT_COLUMN_MAPPING = {
+    '开盘价': '今开',
+    '最高价': '最高',
+    '最低价': '最低',
+    '昨收价': '昨收',
+}
+
+SPOT_NUMERIC_COLUMNS = ['最新价', '涨跌额', '涨跌幅', '成交量', '成交额', '今开', '最高', '最低', '昨收']
+
 
 class StockDataService:
     """股票数据获取服务类"""
@@ -24,10 +103,11 @@ class StockDataService:
         self.timeout = settings.AKSHARE_TIMEOUT
         self.max_retries = settings.MAX_RETRY_ATTEMPTS
         # 根据官方文档建议，增加请求间隔
-        self.request_delay = 2  # 秒
+        self.request_delay = settings.REQUEST_DELAY
         self.network_check_interval = 300  # 网络检查间隔（秒）
         self.last_network_check = 0
         self.network_available = True
+        self._spot_locks: Dict[str, asyncio.Lock] = {}
         
     async def get_stock_data(self, stock_code: str, market_type: str, days: int = None) -> Dict[str, Any]:
         """
@@ -47,28 +127,41 @@ class StockDataService:
         # 检查是否启用真实数据获取
         if not settings.ENABLE_REAL_DATA:
             logger.info(f"使用模拟数据模式: {stock_code}")
-            return self._get_mock_data(stock_code, market_type)
+            return self._get_mock_data(stock_code, market_type, days)
+
+        # 优先使用缓存（内存 + 可选的持久化层）
+        cache_key = generate_cache_key(
+            "stock_data", stock_code=stock_code, market_type=market_type, days=days
+        )
+        cached_data = cache.get(cache_key)
+        if cached_data is not None:
+            logger.info(f"命中缓存: {stock_code}, 市场: {market_type}")
+            return cached_data
 
         # 检查网络状态
         if not await self._check_network_status():
             logger.warning(f"网络不可用，使用模拟数据: {stock_code}")
             if settings.USE_MOCK_DATA:
-                return self._get_mock_data(stock_code, market_type)
+                return self._get_mock_data(stock_code, market_type, days)
             raise RetryableError("网络连接不可用，无法获取股票数据")
 
         try:
             # 根据市场类型选择不同的数据获取方法
             if market_type == "A":
-                return await self._get_a_stock_data(stock_code, days)
+                stock_data = await self._get_a_stock_data(stock_code, days)
             elif market_type == "HK":
-                return await self._get_hk_stock_data(stock_code, days)
+                stock_data = await self._get_hk_stock_data(stock_code, days)
             elif market_type == "US":
-                return await self._get_us_stock_data(stock_code, days)
+                stock_data = await self._get_us_stock_data(stock_code, days)
             elif market_type == "ETF":
-                return await self._get_etf_data(stock_code, days)
+                stock_data = await self._get_etf_data(stock_code, days)
             else:
                 raise NonRetryableError(f"不支持的市场类型: {market_type}")
 
+            # 只缓存真实数据，模拟数据不写入缓存
+            cache.set(cache_key, stock_data, settings.CACHE_EXPIRE_SECONDS)
+            return stock_data
+
         except NonRetryableError:
             # 不可重试错误直接抛出
             raise
@@ -77,43 +170,222 @@ class StockDataService:
             # 如果启用了模拟数据，则返回模拟数据
             if settings.USE_MOCK_DATA:
                 logger.info(f"切换到模拟数据: {stock_code}")
-                return self._get_mock_data(stock_code, market_type)
+                return self._get_mock_data(stock_code, market_type, days)
             raise
         except Exception as e:
             logger.error(f"获取股票数据失败（未知错误）: {stock_code}, 市场: {market_type}, 错误: {str(e)}")
             # 如果启用了模拟数据，则返回模拟数据
             if settings.USE_MOCK_DATA:
                 logger.info(f"切换到模拟数据: {stock_code}")
-                return self._get_mock_data(stock_code, market_type)
+                return self._get_mock_data(stock_code, market_type, days)
             raise RetryableError(f"未知错误: {str(e)}") from e
 
-    async def _check_network_status(self) -> bool:
-        """检查网络状态"""
-        import time
-        current_time = time.time()
+    async def get_spot_snapshot(self, market_type: str,
+                                symbols: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        获取全市场实时行情快照
+
+        每个市场同一时间只请求一次上游接口，并发调用方共享结果；
+        快照按交易时段缓存，交易时间内SPOT_CACHE_SECONDS秒刷新一次
+
+        Args:
+            market_type: 市场类型 (A, HK, US, ETF)
+            symbols: 只返回这些股票代码，默认返回全市场
 
-        # 如果距离上次检查时间不足间隔，返回缓存结果
-        if current_time - self.last_network_check < self.network_check_interval:
-            return self.network_available
+        Returns:
+            pd.DataFrame: 以股票代码为索引的行情快照，列名与stock_zh_a_spot_em一致
+        """
+        if not settings.ENABLE_REAL_DATA:
+            return self._get_mock_spot_snapshot(market_type, symbols)
+
+        if market_type not in SPOT_FETCHERS:
+            raise NonRetryableError(f"不支持的市场类型: {market_type}")
+
+        async def load() -> pd.DataFrame:
+            raw = await self._retry_request(
+                SPOT_FETCHERS[market_type], source=SPOT_SOURCES[market_type], market=market_type
+            )
+            snapshot = self._normalize_spot_snapshot(raw)
+            logger.info(f"刷新实时行情快照: {market_type}, 共 {len(snapshot)} 只")
+            return snapshot
+
+        snapshot = await self._load_shared(
+            spot_cache, generate_cache_key("spot", market_type=market_type), load,
+            get_refresh_interval(market_type, settings.SPOT_CACHE_SECONDS, settings.HTTP_CACHE_MAX_AGE_CLOSED)
+        )
+
+        if symbols is None:
+            return snapshot
+        return snapshot[snapshot.index.isin(list(symbols))]
+
+    async def get_index_snapshot(self, market_type: str) -> pd.DataFrame:
+        """
+        获取主要指数实时行情，刷新节奏与个股快照相同
+
+        Args:
+            market_type: 市场类型
+
+        Returns:
+            pd.DataFrame: 以指数代码为索引，包含名称、最新价、涨跌额、涨跌幅、成交额；市场无指数接口时为空表
+        """
+        if not settings.ENABLE_REAL_DATA:
+            return self._get_mock_index_snapshot(market_type)
+
+        if market_type not in INDEX_FETCHERS:
+            return self._normalize_index_snapshot(None)
+
+        async def load() -> pd.DataFrame:
+            raw = await self._retry_request(
+                INDEX_FETCHERS[market_type], source=INDEX_SOURCES[market_type], market=market_type
+            )
+            return self._normalize_index_snapshot(raw)
+
+        return await self._load_shared(
+            index_cache, generate_cache_key("index", market_type=market_type), load,
+            get_refresh_interval(market_type, settings.SPOT_CACHE_SECONDS, settings.HTTP_CACHE_MAX_AGE_CLOSED)
+        )
+
+    async def get_sector_map(self, market_type: str) -> pd.Series:
+        """
+        获取个股所属行业（申万一级），每天更新一次并写入持久化缓存
+
+        Args:
+            market_type: 市场类型，目前仅A股有行业分类
+
+        Returns:
+            pd.Series: 股票代码 -> 行业名称；无分类或获取失败时为空
+        """
+        if market_type != "A":
+            return pd.Series(dtype=object)
+        if not settings.ENABLE_REAL_DATA:
+            codes = self._get_mock_spot_snapshot(market_type).index
+            names = list(SW_INDUSTRY_NAMES.values())
+            return pd.Series([names[zlib.crc32(code.encode('utf-8')) % 8] for code in codes], index=codes)
+
+        async def load() -> pd.DataFrame:
+            raw = await self._retry_request(
+                lambda: ak.stock_industry_clf_hist_sw(), source="stock_industry_clf_hist_sw", market=market_type
+            )
+            # 分类变动历史中每只股票取最近一次的分类
+            latest = raw.sort_values('start_date').drop_duplicates('symbol', keep='last')
+            sectors = latest['industry_code'].astype(str).str[:2].map(SW_INDUSTRY_NAMES)
+            frame = pd.DataFrame({'代码': latest['symbol'].astype(str).str.zfill(6), '行业': sectors})
+            logger.info(f"刷新行业分类: 共 {len(frame)} 只")
+            return frame.dropna()
 
-        # 执行网络检查
         try:
-            self.network_available = check_network_connectivity([
-                'https://www.baidu.com',
-                'http://quote.eastmoney.com',
-                'https://xueqiu.com'
-            ])
-            self.last_network_check = current_time
+            frame = await self._load_shared(
+                cache, generate_cache_key("sector_map", market_type=market_type), load,
+                settings.SECTOR_MAP_CACHE_SECONDS
+            )
+        except Exception as e:
+            logger.warning(f"获取行业分类失败: {str(e)}")
+            return pd.Series(dtype=object)
+        return pd.Series(frame['行业'].values, index=frame['代码'].values)
+
+    async def _load_shared(self, cache_instance, cache_key: str, loader, ttl: int):
+        """
+        读取缓存，未命中时调用loader加载并写入缓存
 
+        同一缓存键同一时间只加载一次，并发调用方等待并共享结果
+        """
+        value = cache_instance.get(cache_key)
+        if value is None:
+            lock = self._spot_locks.setdefault(cache_key, asyncio.Lock())
+            async with lock:
+                value = cache_instance.get(cache_key)
+                if value is None:
+                    value = await loader()
+                    cache_instance.set(cache_key, value, ttl)
+        return value
+
+    def _normalize_spot_snapshot(self, raw: pd.DataFrame) -> pd.DataFrame:
+        """统一实时行情列名和类型，并以股票代码为索引"""
+        if raw is None or raw.empty:
+            return pd.DataFrame(columns=['代码', '名称'] + SPOT_NUMERIC_COLUMNS).set_index('代码', drop=False)
+
+        snapshot = raw.rename(columns=SPOT_COLUMN_MAPPING)
+        # 美股代码形如"105.AAPL"，去掉交易所前缀
+        snapshot['代码'] = snapshot['代码'].astype(str).str.split('.').str[-1]
+        for col in SPOT_NUMERIC_COLUMNS:
+            if col in snapshot.columns:
+                snapshot[col] = pd.to_numeric(snapshot[col], errors='coerce')
+        return snapshot.drop_duplicates('代码').set_index('代码', drop=False)
+
+    def _get_mock_spot_snapshot(self, market_type: str,
+                                symbols: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """获取模拟实时行情快照，价格随时间小幅波动"""
+        if symbols is not None:
+            codes = list(symbols)
+        else:
+            default_codes = {
+                "A": [f"{600000 + i}" for i in range(50)],
+                "ETF": [f"{510000 + i}" for i in range(50)],
+                "HK": [f"{700 + i:05d}" for i in range(50)],
+                "US": ["AAPL", "MSFT", "NVDA", "TSLA", "AMZN"],
+            }
+            codes = default_codes.get(market_type, default_codes["A"])
+
+        now = time.time()
+        rows = []
+        for code in codes:
+            phase = zlib.crc32(code.encode('utf-8')) % 360
+            prev_close = 10.0 + phase / 36
+            price = round(prev_close * (1 + 0.02 * np.sin(now / 60 + phase)), 2)
+            rows.append({
+                '代码': code,
+                '名称': f'测试{code}',
+                '最新价': price,
+                '涨跌额': round(price - prev_close, 2),
+                '涨跌幅': round((price / prev_close - 1) * 100, 2),
+                '成交量': 1000000 + phase * 1000,
+                '成交额': round(price * (1000000 + phase * 1000) * 100, 2),
+                '今开': prev_close,
+                '最高': round(max(price, prev_close) * 1.01, 2),
+                '最低': round(min(price, prev_close) * 0.99, 2),
+                '昨收': prev_close
+            })
+        return pd.DataFrame(rows, columns=['代码', '名称'] + SPOT_NUMERIC_COLUMNS).set_index('代码', drop=False)
+
+    def _normalize_index_snapshot(self, raw: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """统一指数行情列类型，并以指数代码为索引"""
+        columns = ['代码', '名称', '最新价', '涨跌额', '涨跌幅', '成交额']
+        if raw is None or raw.empty:
+            return pd.DataFrame(columns=columns).set_index('代码', drop=False)
+
+        snapshot = raw[[col for col in columns if col in raw.columns]].copy()
+        snapshot['代码'] = snapshot['代码'].astype(str)
+        for col in columns[2:]:
+            if col in snapshot.columns:
+                snapshot[col] = pd.to_numeric(snapshot[col], errors='coerce')
+        return snapshot.drop_duplicates('代码').set_index('代码', drop=False)
+
+    def _get_mock_index_snapshot(self, market_type: str) -> pd.DataFrame:
+        """获取模拟指数行情"""
+        now = time.time()
+        rows = []
+        for code, name in MAIN_INDICES.get(market_type, {}).items():
+            phase = zlib.crc32(code.encode('utf-8')) % 360
+            prev_close = 1000.0 + phase * 10
+            value = round(prev_close * (1 + 0.01 * np.sin(now / 60 + phase)), 2)
+            rows.append({
+                '代码': code,
+                '名称': name,
+                '最新价': value,
+                '涨跌额': round(value - prev_close, 2),
+                '涨跌幅': round((value / prev_close - 1) * 100, 2),
+                '成交额': 1e10 + phase * 1e8
+            })
+        return self._normalize_index_snapshot(pd.DataFrame(rows))
+
+    async def _check_network_status(self) -> bool:
+        """检查网络状态（读取后台健康探测的最近结果，不在请求中发起网络检查）"""
+        if health_monitor.upstream_reachable != self.network_available:
+            self.network_available = health_monitor.upstream_reachable
             if self.network_available:
-                logger.info("网络连接正常")
+                logger.info("网络连接恢复")
             else:
                 logger.warning("网络连接异常")
-
-        except Exception as e:
-            logger.error(f"网络检查失败: {str(e)}")
-            self.network_available = False
-
         return self.network_available
     
     async def _get_a_stock_data(self, stock_code: str, days: int) -> Dict[str, Any]:
@@ -134,7 +406,8 @@ class StockDataService:
                         start_date=start_date,
                         end_date=end_date,
                         adjust=""  # 不复权，避免负值问题
-                    )
+                    ),
+                    source="stock_zh_a_hist", market="A"
                 )
 
                 if hist_data is not None and not hist_data.empty:
@@ -171,7 +444,8 @@ class StockDataService:
                     start_date=start_date,
                     end_date=end_date,
                     adjust="qfq"
-                )
+                ),
+                source="stock_hk_hist", market="HK"
             )
             
             return self._process_hk_stock_data(stock_code, hist_data)
@@ -194,7 +468,8 @@ class StockDataService:
                     start_date=start_date,
                     end_date=end_date,
                     adjust="qfq"
-                )
+                ),
+                source="stock_us_hist", market="US"
             )
             
             return self._process_us_stock_data(stock_code, hist_data)
@@ -217,7 +492,8 @@ class StockDataService:
                     start_date=start_date,
                     end_date=end_date,
                     adjust=""
-                )
+                ),
+                source="fund_etf_hist_em", market="ETF"
             )
             
             return self._process_etf_data(stock_code, hist_data)
@@ -227,28 +503,64 @@ class StockDataService:
             raise
     
     @aggressive_retry_handler.retry_async
-    async def _retry_request(self, func):
+    async def _retry_request(self, func, source: str = "unknown", market: str = "unknown"):
         """
         智能重试请求机制
-        使用高级重试处理器，支持指数退避、网络检测等功能
+        使用高级重试处理器，支持指数退避、网络检测等功能；
+        每个akshare接口各有一个熔断器，连续失败后在恢复期内直接失败，不再等待和重试
+
+        Args:
+            func: 实际发起请求的同步函数
+            source: akshare函数名，用作监控指标标签
+            market: 市场类型，用作监控指标标签
         """
+        breaker = get_circuit_breaker(
+            f"akshare:{source}",
+            failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=settings.CIRCUIT_BREAKER_RECOVERY_SECONDS
+        )
+        if breaker.state == CircuitState.OPEN:
+            raise CircuitOpenError(f"{source} 熔断中，暂停调用")
+
         try:
             # 检查网络连接
-            if not check_network_connectivity():
+            if not await self._check_network_status():
                 raise RetryableError("网络连接不可用")
 
             # 添加请求前延迟，降低访问频率
             await asyncio.sleep(self.request_delay)
 
+            # 半开状态只放行有限的探测请求
+            if not breaker.allow_request():
+                raise CircuitOpenError(f"{source} 熔断中，暂停调用")
+
             # 在异步环境中运行同步函数
             loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(None, func)
-
-            # 请求成功后稍作延迟，避免频繁请求
-            await asyncio.sleep(0.5)
+            start = time.perf_counter()
+            outcome = "error"
+            upstream_in_flight.inc()
+            try:
+                result = await loop.run_in_executor(None, func)
+                outcome = "ok"
+                breaker.record_success()
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception:
+                breaker.record_failure()
+                raise
+            finally:
+                upstream_in_flight.dec()
+                upstream_duration.observe(time.perf_counter() - start, function=source, market=market)
+                upstream_requests.inc(function=source, market=market, outcome=outcome)
+
+            # 请求成功后稍作延迟，避免频繁请求（不超过请求间隔，压测时可一并设为0）
+            await asyncio.sleep(min(0.5, self.request_delay))
 
             return result
 
+        except CircuitOpenError:
+            raise
         except Exception as e:
             # 判断是否为数据相关错误（不可重试）
             error_msg = str(e).lower()
@@ -274,7 +586,8 @@ class StockDataService:
 
             # 使用工具函数获取数据
             data = await self._retry_request(
-                lambda: ak.tool_trade_date_hist_sina()
+                lambda: ak.tool_trade_date_hist_sina(),
+                source="tool_trade_date_hist_sina", market="A"
             )
 
             if data is not None and not data.empty:
@@ -286,67 +599,57 @@ class StockDataService:
 
         return pd.DataFrame()
 
-    def _get_mock_data(self, stock_code: str, market_type: str = "A") -> Dict[str, Any]:
-        """获取模拟数据用于测试"""
+    def _get_mock_data(self, stock_code: str, market_type: str = "A", days: int = None) -> Dict[str, Any]:
+        """获取模拟数据用于测试（合成K线，数据量与真实请求相同，可以正常计算技术指标）"""
         logger.info(f"使用模拟数据: {stock_code}")
+        if days is None:
+            days = settings.DEFAULT_DATA_DAYS
 
-        # 生成模拟的历史数据
-        dates = []
-        mock_data = []
-        base_price = 10.0
-
-        for i in range(14):  # 14天数据
-            date = (datetime.now() - timedelta(days=13-i)).strftime('%Y-%m-%d')
-            price = base_price + (i * 0.1) + (i % 3 * 0.05)  # 模拟价格波动
-
-            mock_data.append({
-                'date': date,
-                'open': round(price * 0.99, 2),
-                'close': round(price, 2),
-                'high': round(price * 1.02, 2),
-                'low': round(price * 0.98, 2),
-                'volume': 1000000 + (i * 100000),
-                'amount': None
-            })
-
-        # 根据市场类型设置不同的股票名称和价格
+        market = market_type if market_type in MARKET_PROFILES else "A"
+        bars = generate_bars(market, stock_code, settings.SYNTHETIC_SEED, datetime.now().date()).tail(days)
+        raw_data = pd.DataFrame({
+            '日期': pd.to_datetime(bars['date']),
+            '开盘': bars['open'],
+            '收盘': bars['close'],
+            '最高': bars['high'],
+            '最低': bars['low'],
+            '成交量': bars['volume'].astype(np.int64),
+            '成交额': bars['amount']
+        }).reset_index(drop=True)
+
+        recent_data = [{
+            'date': row.date.strftime('%Y-%m-%d'),
+            'open': float(row.open),
+            'close': float(row.close),
+            'high': float(row.high),
+            'low': float(row.low),
+            'volume': int(row.volume),
+            'amount': float(row.amount)
+        } for row in bars.tail(30).itertuples()]
+
+        # 根据市场类型设置不同的股票名称
         market_names = {
             "A": "A股测试",
             "HK": "港股测试",
             "US": "美股测试",
             "ETF": "ETF测试"
         }
+        last = bars.iloc[-1]
+        change = float(last['close'] - last['prev_close'])
 
         return {
             'stock_info': {
                 'code': stock_code,
                 'name': f'{market_names.get(market_type, "测试股票")}{stock_code}',
                 'market': market_type,
-                'current_price': round(base_price + 1.3, 2),
-                'change': 0.15,
-                'change_percent': 1.5
+                'current_price': float(last['close']),
+                'change': round(change, 3),
+                'change_percent': round(change / float(last['prev_close']) * 100, 2)
             },
-            'recent_data': mock_data,
-            'raw_data': self._create_mock_dataframe(mock_data)
+            'recent_data': recent_data,
+            'raw_data': raw_data
         }
 
-    def _create_mock_dataframe(self, mock_data: List[Dict]) -> pd.DataFrame:
-        """创建模拟DataFrame"""
-        df_data = []
-        for item in mock_data:
-            df_data.append({
-                '日期': item['date'],
-                '开盘': item['open'],
-                '收盘': item['close'],
-                '最高': item['high'],
-                '最低': item['low'],
-                '成交量': item['volume']
-            })
-
-        df = pd.DataFrame(df_data)
-        df['日期'] = pd.to_datetime(df['日期'])
-        return df
-    
     def _process_a_stock_data(self, stock_code: str, stock_info: pd.DataFrame, 
                              hist_data: pd.DataFrame, realtime_data: pd.DataFrame) -> Dict[str, Any]:
         """处理A股数据"""
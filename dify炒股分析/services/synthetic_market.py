@@ -0,0 +1,463 @@
+"""
+合成行情数据源
+按股票代码生成确定性的日线和实时行情：几何布朗运动价格，成交量在平静/活跃状态间切换，带开盘跳空、
+涨跌停限制和停牌；函数名、参数和返回的列与akshare一致，DATA_SOURCE=synthetic时替换akshare，用于压测和离线测试。
+每次调用可注入延迟和错误，模拟上游变慢或不稳定
+"""
+import math
+import time
+import zlib
+import random
+import logging
+import threading
+from collections import Counter
+from datetime import date, datetime, time as time_of_day
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from config import MAIN_INDICES
+
+logger = logging.getLogger(__name__)
+
+# 序列覆盖的交易日范围（工作日，不考虑节假日）；请求范围超出时截断
+SERIES_START = date(2005, 1, 4)
+SERIES_END = date(2035, 12, 31)
+# 锚定日：按市场参数抽取的初始价格是这一天的收盘价，保证近年的价格处在合理区间
+SERIES_ANCHOR = date(2024, 1, 2)
+TRADING_DAYS_PER_YEAR = 252
+# 每个交易日的开盘时间和分钟数，实时行情按当前分钟在当天K线上插值
+SESSION_OPEN = time_of_day(9, 30)
+SESSION_MINUTES = 240
+
+# 各市场参数：锚定日价格范围（对数均匀）、年化波动率范围、日均成交量、每单位成交量的股数（A股、ETF按手）、价格小数位
+MARKET_PROFILES = {
+    "A": {"price": (3.0, 80.0), "volatility": (0.2, 0.45), "volume": 2e5, "lot": 100, "decimals": 2},
+    "ETF": {"price": (0.8, 5.0), "volatility": (0.12, 0.25), "volume": 5e5, "lot": 100, "decimals": 3},
+    "HK": {"price": (0.5, 300.0), "volatility": (0.2, 0.5), "volume": 5e6, "lot": 1, "decimals": 3},
+    "US": {"price": (5.0, 500.0), "volatility": (0.2, 0.45), "volume": 3e6, "lot": 1, "decimals": 2},
+    "INDEX": {"price": (1000.0, 20000.0), "volatility": (0.12, 0.22), "volume": 2e8, "lot": 1, "decimals": 2},
+}
+
+SUSPENSION_RATE = 1 / 500    # 每个交易日开始停牌的概率
+SUSPENSION_MEAN_DAYS = 5     # 平均停牌天数
+JUMP_RATE = 0.01             # 出现大幅跳空的交易日比例
+REGIME_MEAN_DAYS = 20        # 成交量状态的平均持续天数
+ACTIVE_VOLATILITY = 1.3      # 活跃期的波动率倍数
+ACTIVE_VOLUME = 2.2          # 活跃期的成交量倍数
+
+# 日线的列（与akshare一致），A股额外包含股票代码列
+HIST_COLUMNS = ['日期', '开盘', '收盘', '最高', '最低', '成交量', '成交额', '振幅', '涨跌幅', '涨跌额', '换手率']
+
+
+def price_limit(market: str, symbol: str) -> Optional[float]:
+    """涨跌停幅度：主板和ETF 10%，创业板、科创板20%，北交所30%，港股、美股和指数不设限制"""
+    if market == "ETF":
+        return 0.1
+    if market != "A":
+        return None
+    if symbol.startswith(("300", "301", "688", "689")):
+        return 0.2
+    if symbol.startswith(("4", "8", "92")):
+        return 0.3
+    return 0.1
+
+
+def _rng(seed: int, market: str, symbol: str, salt: str = "") -> np.random.Generator:
+    return np.random.default_rng(zlib.crc32(f"{seed}:{market}:{symbol}:{salt}".encode("utf-8")))
+
+
+@lru_cache(maxsize=1)
+def trading_calendar() -> np.ndarray:
+    """SERIES_START到SERIES_END的交易日（datetime64[D]）"""
+    days = np.arange(np.datetime64(SERIES_START), np.datetime64(SERIES_END) + 1, dtype='datetime64[D]')
+    return days[np.is_busday(days)]
+
+
+def current_session(now: Optional[datetime] = None) -> Tuple[date, int]:
+    """
+    当前（或最近一个）交易日及已交易的分钟数
+
+    开盘前和非交易日返回上一个交易日，已交易分钟数为SESSION_MINUTES（已收盘）
+    """
+    now = now or datetime.now()
+    today = np.datetime64(now.date())
+    opened = datetime.combine(now.date(), SESSION_OPEN)
+    if np.is_busday(today) and now >= opened:
+        minute = int(min((now - opened).total_seconds() // 60, SESSION_MINUTES))
+        return now.date(), minute
+    previous = np.busday_offset(today, -1, roll='forward')
+    return previous.astype(object), SESSION_MINUTES
+
+
+@lru_cache(maxsize=64)
+def _series(market: str, symbol: str, seed: int) -> pd.DataFrame:
+    """生成整个交易日历上的日线，同一(市场, 代码, 种子)的结果固定（随机数的抽取次数与请求范围无关）"""
+    profile = MARKET_PROFILES[market]
+    rng = _rng(seed, market, symbol)
+    dates = trading_calendar()
+    n = len(dates)
+
+    low_price, high_price = profile["price"]
+    anchor_price = math.exp(rng.uniform(math.log(low_price), math.log(high_price)))
+    sigma = rng.uniform(*profile["volatility"]) / math.sqrt(TRADING_DAYS_PER_YEAR)
+    drift = rng.normal(0.03, 0.1) / TRADING_DAYS_PER_YEAR
+
+    # 成交量状态：平静(0)与活跃(1)交替，持续天数服从几何分布；活跃期波动和成交量都更大
+    durations = rng.geometric(1 / REGIME_MEAN_DAYS, size=n)
+    active = (np.repeat(np.arange(n) % 2, durations)[:n] == 1)
+
+    # 对数收益率服从正态分布（几何布朗运动）
+    returns = drift + sigma * np.where(active, ACTIVE_VOLATILITY, 1.0) * rng.standard_normal(n)
+    # 开盘跳空：多数交易日幅度很小，少数交易日（消息面）出现2~4倍日波动的跳空
+    gaps = rng.normal(0, sigma * 0.3, n)
+    jumps = rng.random(n) < JUMP_RATE
+    gaps[jumps] += rng.choice([-1.0, 1.0], jumps.sum()) * rng.uniform(2, 4, jumps.sum()) * sigma
+    returns[jumps] += gaps[jumps]
+
+    # 停牌：停牌期间价格不变、不出现在日线中，复牌当天补涨补跌
+    suspended = np.zeros(n, dtype=bool)
+    if market != "INDEX":
+        count = rng.poisson(n * SUSPENSION_RATE)
+        starts = rng.integers(0, n, count)
+        lengths = rng.geometric(1 / SUSPENSION_MEAN_DAYS, count)
+        resume_moves = rng.normal(0, 3 * sigma, count)
+        for start, length, move in zip(starts, lengths, resume_moves):
+            suspended[start:start + length] = True
+            if start + length < n:
+                returns[start + length] += move
+    returns[suspended] = 0.0
+    gaps[suspended] = 0.0
+
+    limit = price_limit(market, symbol)
+    if limit is not None:
+        bounds = (math.log(1 - limit), math.log(1 + limit))
+        returns = np.clip(returns, *bounds)
+        gaps = np.clip(gaps, *bounds)
+
+    decimals = profile["decimals"]
+    tick = 10.0 ** -decimals
+    anchor = int(np.searchsorted(dates, np.datetime64(SERIES_ANCHOR)))
+    log_close = np.cumsum(returns)
+    close = np.round(anchor_price * np.exp(log_close - log_close[anchor]), decimals)
+    close = np.maximum(close, 10 * tick)
+    prev_close = np.concatenate([close[:1], close[:-1]])
+    open_ = np.round(prev_close * np.exp(gaps), decimals)
+    wick = np.abs(rng.normal(0, sigma * 0.5, (2, n)))
+    high = np.maximum(open_, close) * np.exp(wick[0])
+    low = np.minimum(open_, close) * np.exp(-wick[1])
+    if limit is not None:
+        high = np.minimum(high, prev_close * (1 + limit))
+        low = np.maximum(low, prev_close * (1 - limit))
+    high = np.round(np.maximum(high, np.maximum(open_, close)), decimals)
+    low = np.maximum(np.round(np.minimum(low, np.minimum(open_, close)), decimals), tick)
+
+    # 成交量：基础量 × 状态倍数 × 对数正态噪声，价格波动越大成交越活跃
+    volume = np.floor(profile["volume"] * np.where(active, ACTIVE_VOLUME, 1.0)
+                      * np.exp(rng.normal(0, 0.4, n)) * (1 + 20 * np.abs(returns)))
+    amount = np.round(volume * profile["lot"] * (open_ + close + high + low) / 4, 2)
+    float_shares = profile["volume"] * profile["lot"] * rng.uniform(50, 400)
+    turnover = np.round(volume * profile["lot"] / float_shares * 100, 2)
+
+    frame = pd.DataFrame({
+        'date': dates, 'open': open_, 'close': close, 'high': high, 'low': low,
+        'prev_close': prev_close, 'volume': volume, 'amount': amount, 'turnover': turnover
+    })
+    return frame[~suspended].reset_index(drop=True)
+
+
+def generate_bars(market: str, symbol: str, seed: int, end: date,
+                  start: Optional[date] = None) -> pd.DataFrame:
+    """
+    合成日线（停牌日不包含在内）
+
+    同一(市场, 代码, 种子)的序列固定，不同日期范围的结果在重叠部分完全一致
+
+    Args:
+        market: 市场参数，见 MARKET_PROFILES
+        symbol: 代码
+        seed: 随机种子
+        end: 结束日期（含）
+        start: 开始日期（含），默认从序列开始
+
+    Returns:
+        pd.DataFrame: date（datetime.date）、open、close、high、low、prev_close、volume、amount、turnover列
+    """
+    series = _series(market, symbol, seed)
+    dates = series['date'].to_numpy()
+    lower = 0 if start is None else int(np.searchsorted(dates, np.datetime64(start), side='left'))
+    upper = int(np.searchsorted(dates, np.datetime64(end), side='right'))
+    bars = series.iloc[lower:upper].reset_index(drop=True)
+    bars['date'] = bars['date'].dt.date
+    return bars
+
+
+def _to_date(value) -> Optional[date]:
+    """解析akshare风格的日期参数（20240101 或 2024-01-01）"""
+    if value in (None, ""):
+        return None
+    return pd.Timestamp(str(value)).date()
+
+
+def _letters(index: int) -> str:
+    """0 -> A, 25 -> Z, 26 -> AA ...（生成美股代码）"""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+class SyntheticMarket:
+    """
+    合成行情数据源（akshare替身）
+
+    日线按代码确定性生成，实时行情为当天K线上的布朗桥插值（收盘时与日线一致）；
+    所有函数都是同步调用，可直接放进线程池，延迟和错误按配置随机注入
+    """
+
+    def __init__(self, seed: int = 0, latency_ms: float = 0.0, latency_jitter: float = 0.5,
+                 error_rate: float = 0.0, universe_size: int = 300):
+        """
+        Args:
+            seed: 随机种子，相同种子生成相同的行情
+            latency_ms: 每次调用的延迟中位数（毫秒），0表示不注入延迟
+            latency_jitter: 延迟的对数正态分布sigma，越大长尾越明显
+            error_rate: 每次调用失败的概率
+            universe_size: 实时行情快照中每个市场的股票数
+        """
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.universe_size = universe_size
+        self.calls = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._spot_bases: Dict[Tuple[str, date], pd.DataFrame] = {}
+
+    def _simulate_call(self, name: str):
+        """记录调用次数，按配置注入延迟和错误"""
+        with self._lock:
+            self.calls[name] += 1
+            delay = self._random.lognormvariate(math.log(self.latency_ms), self.latency_jitter) / 1000 \
+                if self.latency_ms > 0 else 0.0
+            failed = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise ConnectionError(f"合成数据源模拟网络错误: {name}")
+
+    # 日线
+
+    def _history(self, market: str, symbol: str, start_date, end_date) -> pd.DataFrame:
+        # 最新一根K线是当前（或最近一个）交易日
+        session_day, _ = current_session()
+        end = min(_to_date(end_date) or session_day, session_day)
+        bars = generate_bars(market, symbol, self.seed, end, _to_date(start_date))
+        change = bars['close'] - bars['prev_close']
+        decimals = MARKET_PROFILES[market]["decimals"]
+        return pd.DataFrame({
+            '日期': bars['date'].values,
+            '开盘': bars['open'].values,
+            '收盘': bars['close'].values,
+            '最高': bars['high'].values,
+            '最低': bars['low'].values,
+            '成交量': bars['volume'].values.astype(np.int64),
+            '成交额': bars['amount'].values,
+            '振幅': np.round((bars['high'] - bars['low']) / bars['prev_close'] * 100, 2).values,
+            '涨跌幅': np.round(change / bars['prev_close'] * 100, 2).values,
+            '涨跌额': np.round(change, decimals).values,
+            '换手率': bars['turnover'].values,
+        }, columns=HIST_COLUMNS)
+
+    def stock_zh_a_hist(self, symbol: str, period: str = "daily", start_date: str = "19700101",
+                        end_date: str = "20500101", adjust: str = "") -> pd.DataFrame:
+        """A股日线（合成数据没有分红送股，复权参数不影响结果）"""
+        self._simulate_call("stock_zh_a_hist")
+        data = self._history("A", symbol, start_date, end_date)
+        data.insert(1, '股票代码', symbol)
+        return data
+
+    def stock_hk_hist(self, symbol: str, period: str = "daily", start_date: str = "19700101",
+                      end_date: str = "22220101", adjust: str = "") -> pd.DataFrame:
+        """港股日线"""
+        self._simulate_call("stock_hk_hist")
+        return self._history("HK", symbol, start_date, end_date)
+
+    def stock_us_hist(self, symbol: str, period: str = "daily", start_date: str = "19700101",
+                      end_date: str = "22220101", adjust: str = "") -> pd.DataFrame:
+        """美股日线（代码可带交易所前缀，如 105.AAPL）"""
+        self._simulate_call("stock_us_hist")
+        return self._history("US", symbol.split('.')[-1], start_date, end_date)
+
+    def fund_etf_hist_em(self, symbol: str, period: str = "daily", start_date: str = "19700101",
+                         end_date: str = "20500101", adjust: str = "") -> pd.DataFrame:
+        """ETF日线"""
+        self._simulate_call("fund_etf_hist_em")
+        return self._history("ETF", symbol, start_date, end_date)
+
+    # 实时行情
+
+    def universe(self, market: str) -> List[str]:
+        """实时行情快照包含的股票代码"""
+        size = self.universe_size
+        if market == "A":
+            prefixes = ("600", "601", "603", "000", "002", "300", "688")
+            return [f"{prefixes[i % len(prefixes)]}{i // len(prefixes) + 1:03d}" for i in range(size)]
+        if market == "ETF":
+            return [f"{510000 + i * 10}" for i in range(size)]
+        if market == "HK":
+            return [f"{i + 1:05d}" for i in range(size)]
+        return [_letters(i + 26 + 26 * 26) for i in range(size)]  # 从三个字母的代码开始
+
+    def _spot_base(self, market: str, codes: List[str], names: List[str], session_day: date) -> pd.DataFrame:
+        """当天及前一交易日的K线（每个市场每天生成一次）"""
+        profile = "INDEX" if market.startswith("INDEX") else market
+        key = (market, session_day)
+        with self._lock:
+            base = self._spot_bases.get(key)
+        if base is not None:
+            return base
+
+        rows = []
+        for code, name in zip(codes, names):
+            series = _series(profile, code, self.seed)
+            position = int(np.searchsorted(series['date'].to_numpy(), np.datetime64(session_day), side='right'))
+            last = series.iloc[max(position - 1, 0)]
+            # 当天停牌：价格保持上一交易日收盘价，成交为0
+            trading = last['date'] == pd.Timestamp(session_day)
+            rows.append({
+                '代码': code, '名称': name, 'prev_close': last['prev_close'] if trading else last['close'],
+                'open': last['open'] if trading else last['close'], 'close': last['close'],
+                'high': last['high'] if trading else last['close'], 'low': last['low'] if trading else last['close'],
+                'volume': last['volume'] if trading else 0.0, 'amount': last['amount'] if trading else 0.0,
+            })
+        base = pd.DataFrame(rows)
+        with self._lock:
+            # 只保留当天的数据
+            self._spot_bases = {k: v for k, v in self._spot_bases.items() if k[1] == session_day}
+            self._spot_bases[key] = base
+        return base
+
+    def _spot(self, market: str, codes: List[str], names: List[str], now: Optional[datetime] = None) -> pd.DataFrame:
+        """按当前时间在当天K线上插值得到实时行情"""
+        session_day, minute = current_session(now)
+        base = self._spot_base(market, codes, names, session_day)
+        profile = MARKET_PROFILES["INDEX" if market.startswith("INDEX") else market]
+
+        # 布朗桥：从开盘价出发，收盘时刚好到达日线收盘价；最高、最低取已走过路径的极值
+        rng = _rng(self.seed, market, str(session_day), "intraday")
+        steps = rng.standard_normal((len(base), SESSION_MINUTES)) / math.sqrt(SESSION_MINUTES)
+        walk = np.cumsum(steps, axis=1)
+        t = np.arange(1, SESSION_MINUTES + 1) / SESSION_MINUTES
+        bridge = walk - t * walk[:, -1:]
+        log_open = np.log(base['open'].to_numpy())
+        log_close = np.log(base['close'].to_numpy())
+        spread = np.abs(np.log(base['high'].to_numpy()) - np.log(base['low'].to_numpy()))
+        path = log_open[:, None] + t * (log_close - log_open)[:, None] + 0.3 * spread[:, None] * bridge
+        path = np.concatenate([log_open[:, None], path], axis=1)[:, :minute + 1]
+
+        decimals = profile["decimals"]
+        price = np.round(np.exp(path[:, -1]), decimals)
+        prev_close = base['prev_close'].to_numpy()
+        fraction = minute / SESSION_MINUTES
+        traded = base['volume'].to_numpy() > 0
+        price = np.where(traded, price, prev_close)
+        high = np.where(traded, np.round(np.exp(path.max(axis=1)), decimals), prev_close)
+        low = np.where(traded, np.round(np.exp(path.min(axis=1)), decimals), prev_close)
+        change = price - prev_close
+        return pd.DataFrame({
+            '序号': np.arange(1, len(base) + 1),
+            '代码': base['代码'],
+            '名称': base['名称'],
+            '最新价': price,
+            '涨跌幅': np.round(change / prev_close * 100, 2),
+            '涨跌额': np.round(change, decimals),
+            '成交量': np.floor(base['volume'].to_numpy() * fraction),
+            '成交额': np.round(base['amount'].to_numpy() * fraction, 2),
+            '振幅': np.round((high - low) / prev_close * 100, 2),
+            '最高': high,
+            '最低': low,
+            '今开': base['open'].to_numpy(),
+            '昨收': prev_close,
+        })
+
+    def stock_zh_a_spot_em(self) -> pd.DataFrame:
+        """A股实时行情"""
+        self._simulate_call("stock_zh_a_spot_em")
+        codes = self.universe("A")
+        return self._spot("A", codes, [f"测试{code}" for code in codes])
+
+    def stock_hk_spot_em(self) -> pd.DataFrame:
+        """港股实时行情"""
+        self._simulate_call("stock_hk_spot_em")
+        codes = self.universe("HK")
+        return self._spot("HK", codes, [f"测试{code}" for code in codes])
+
+    def stock_us_spot_em(self) -> pd.DataFrame:
+        """美股实时行情（代码带交易所前缀，开盘价等列名与A股不同，与akshare一致）"""
+        self._simulate_call("stock_us_spot_em")
+        codes = self.universe("US")
+        spot = self._spot("US", codes, [f"测试{code}" for code in codes])
+        spot['代码'] = "105." + spot['代码']
+        return spot.rename(columns={'今开': '开盘价', '最高': '最高价', '最低': '最低价', '昨收': '昨收价'})
+
+    def fund_etf_spot_em(self) -> pd.DataFrame:
+        """ETF实时行情"""
+        self._simulate_call("fund_etf_spot_em")
+        codes = self.universe("ETF")
+        return self._spot("ETF", codes, [f"测试ETF{code}" for code in codes])
+
+    def stock_zh_index_spot_em(self, symbol: str = "沪深重要指数") -> pd.DataFrame:
+        """A股主要指数实时行情"""
+        self._simulate_call("stock_zh_index_spot_em")
+        indices = MAIN_INDICES["A"]
+        return self._spot("INDEX:A", list(indices), list(indices.values()))
+
+    def stock_hk_index_spot_em(self) -> pd.DataFrame:
+        """港股主要指数实时行情"""
+        self._simulate_call("stock_hk_index_spot_em")
+        indices = MAIN_INDICES["HK"]
+        return self._spot("INDEX:HK", list(indices), list(indices.values()))
+
+    # 其他接口
+
+    def stock_individual_info_em(self, symbol: str) -> pd.DataFrame:
+        """个股基本信息（item/value两列）"""
+        self._simulate_call("stock_individual_info_em")
+        rng = _rng(self.seed, "A", symbol, "info")
+        shares = float(np.floor(MARKET_PROFILES["A"]["volume"] * 100 * rng.uniform(50, 400)))
+        price = float(generate_bars("A", symbol, self.seed, current_session()[0])['close'].iloc[-1])
+        return pd.DataFrame({
+            'item': ['总市值', '流通市值', '行业', '上市时间', '股票代码', '股票简称', '总股本', '流通股'],
+            'value': [round(shares * 1.2 * price, 2), round(shares * price, 2), '测试行业',
+                      int(SERIES_START.strftime('%Y%m%d')), symbol, f"测试{symbol}", shares * 1.2, shares]
+        })
+
+    def stock_industry_clf_hist_sw(self) -> pd.DataFrame:
+        """申万行业分类变动历史（实时行情中的A股各一条）"""
+        from services.stock_data_service import SW_INDUSTRY_NAMES
+
+        self._simulate_call("stock_industry_clf_hist_sw")
+        industries = sorted(SW_INDUSTRY_NAMES)
+        codes = self.universe("A")
+        return pd.DataFrame({
+            'symbol': codes,
+            'start_date': pd.Timestamp(SERIES_START),
+            'industry_code': [f"{industries[zlib.crc32(code.encode('utf-8')) % len(industries)]}0101"
+                              for code in codes],
+            'update_time': pd.Timestamp(SERIES_START),
+        })
+
+    def tool_trade_date_hist_sina(self) -> pd.DataFrame:
+        """交易日历（工作日，不考虑节假日）"""
+        self._simulate_call("tool_trade_date_hist_sina")
+        days = trading_calendar()
+        year_end = np.datetime64(f"{date.today().year}-12-31")
+        return pd.DataFrame({'trade_date': days[days <= year_end].astype(object)})
+
+    def __getattr__(self, name: str):
+        raise AttributeError(f"合成数据源未实现akshare接口: {name}")
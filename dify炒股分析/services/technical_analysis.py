@@ -10,6 +10,7 @@ except ImportError:
     HAS_TALIB = False
     print("警告: talib未安装，将使用pandas实现技术指标计算")
 from typing import Dict, List, Tuple, Optional
+import hashlib
 import logging
 from config import settings
 
@@ -29,6 +30,22 @@ class TechnicalAnalysis:
         self.bollinger_period = settings.BOLLINGER_PERIOD
         self.bollinger_std = settings.BOLLINGER_STD
     
+    def get_param_fingerprint(self) -> str:
+        """
+        获取指标参数指纹
+        
+        参数变化后指纹随之变化，用于缓存键和ETag计算
+        
+        Returns:
+            str: 参数指纹
+        """
+        params = (
+            tuple(self.ma_periods), self.macd_fast, self.macd_slow, self.macd_signal,
+            self.rsi_period, self.kdj_period, self.bollinger_period, self.bollinger_std,
+            HAS_TALIB
+        )
+        return hashlib.md5(repr(params).encode('utf-8')).hexdigest()[:12]
+    
     def calculate_all_indicators(self, df: pd.DataFrame) -> Dict:
         """
         计算所有技术指标
@@ -42,7 +59,7 @@ class TechnicalAnalysis:
         try:
             if df.empty or len(df) < 20:
                 logger.warning("数据不足，无法计算技术指标")
-                return self._get_empty_indicators()
+                return self.get_empty_indicators()
             
             # 确保数据格式正确
             df = self._prepare_data(df)
@@ -75,7 +92,7 @@ class TechnicalAnalysis:
             
         except Exception as e:
             logger.error(f"计算技术指标失败: {str(e)}")
-            return self._get_empty_indicators()
+            return self.get_empty_indicators()
     
     def _prepare_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """准备数据格式"""
@@ -462,7 +479,7 @@ class TechnicalAnalysis:
             logger.error(f"判断趋势失败: {str(e)}")
             return "未知"
     
-    def _get_empty_indicators(self) -> Dict:
+    def get_empty_indicators(self) -> Dict:
         """返回空的技术指标字典"""
         return {
             'trend': '数据不足',
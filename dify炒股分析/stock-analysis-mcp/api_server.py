@@ -5,24 +5,78 @@
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, Iterator, List
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import asyncio
+import pandas as pd
+import numpy as np
 import uvicorn
+import json
 import sys
 import os
 
 # 添加src目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from src.stock_data import stock_data_provider
+from src.stock_data import stock_data_provider, AsyncStockDataProvider
 from src.technical_analysis import technical_analyzer
 from src.utils import validate_stock_code, normalize_stock_code
 
+# 同时进行的akshare请求数（阻塞I/O，在线程池中执行）
+IO_CONCURRENCY = int(os.getenv("API_IO_CONCURRENCY", "8"))
+# 技术分析进程池大小（CPU计算，0表示按CPU核数）
+CPU_WORKERS = int(os.getenv("API_CPU_WORKERS", "0")) or os.cpu_count() or 1
+
+data_provider = AsyncStockDataProvider(
+    stock_data_provider, max_data_concurrency=IO_CONCURRENCY
+)
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """获取技术分析进程池（首次使用时创建，使用spawn避免fork事件循环和线程池状态）"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=CPU_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+async def run_analysis(df: pd.DataFrame) -> Dict:
+    """在进程池中执行综合技术分析"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_process_pool(), technical_analyzer.comprehensive_analysis, df
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动时预热进程池，关闭时释放线程池和进程池"""
+    global _process_pool
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(
+        loop.run_in_executor(get_process_pool(), os.getpid) for _ in range(CPU_WORKERS)
+    ))
+    yield
+    data_provider.shutdown()
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
 # 创建FastAPI应用
 app = FastAPI(
     title="股票分析API",
     description="为Dify工作流提供股票数据获取和技术分析功能",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 添加CORS中间件
@@ -48,6 +102,13 @@ class StockHistoryRequest(BaseModel):
     stock_code: str
     period: Optional[str] = "30"
     market_type: str = "A"
+    # json：逐条记录；columnar：按列返回（dates[]、open[]…）；ndjson：分块流式导出，适合多年历史数据
+    format: str = "json"
+    start_date: Optional[str] = None  # 开始日期（含），如 2015-01-01；指定后忽略period
+    end_date: Optional[str] = None  # 结束日期（含），默认到最新
+    cursor: Optional[str] = None  # 上一页返回的next_cursor
+    # 每页行数，json/columnar默认HISTORY_PAGE_ROWS，ndjson默认不分页
+    limit: Optional[int] = Field(None, ge=1, le=5000)
 
 # 响应模型
 class APIResponse(BaseModel):
@@ -56,6 +117,58 @@ class APIResponse(BaseModel):
     message: Optional[str] = None
     error: Optional[str] = None
 
+# 流式导出历史数据时每块包含的行数
+HISTORY_CHUNK_ROWS = 500
+# json/columnar格式每页默认行数
+HISTORY_PAGE_ROWS = 1000
+
+def _column(df: pd.DataFrame, name: str, dtype=float) -> List[Any]:
+    """取出一列并转换为Python数值列表，缺失值为None"""
+    if name not in df.columns:
+        return [None] * len(df)
+    values = pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float)
+    missing = np.isnan(values)
+    if dtype is float:
+        converted = values.astype(dtype)
+    else:
+        converted = np.where(missing, 0, values).astype(np.int64)
+    return [None if is_missing else value
+            for value, is_missing in zip(converted.tolist(), missing.tolist())]
+
+
+def _history_columns(df: pd.DataFrame) -> Dict[str, List[Any]]:
+    """将历史数据转换为按列的Python列表"""
+    return {
+        "date": df['date'].astype(str).tolist(),
+        "open": _column(df, 'open'),
+        "close": _column(df, 'close'),
+        "high": _column(df, 'high'),
+        "low": _column(df, 'low'),
+        "volume": _column(df, 'volume', int),
+        "amount": _column(df, 'amount')
+    }
+
+
+def _history_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """将历史数据按列批量转换为字典列表（避免逐行iterrows）"""
+    columns = _history_columns(df)
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+def _stream_history(meta: Dict[str, Any], df: pd.DataFrame) -> Iterator[bytes]:
+    """
+    按块生成NDJSON格式的历史数据
+
+    第一行为元信息，之后每行一条K线；每次只转换HISTORY_CHUNK_ROWS行，首字节无需等待全部数据序列化
+    """
+    yield (json.dumps(meta, ensure_ascii=False) + "\n").encode("utf-8")
+    
+    for start in range(0, len(df), HISTORY_CHUNK_ROWS):
+        chunk = df.iloc[start:start + HISTORY_CHUNK_ROWS]
+        lines = [json.dumps(record, ensure_ascii=False)
+                 for record in _history_records(chunk)]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -87,7 +200,7 @@ async def get_stock_info(request: StockInfoRequest):
             raise HTTPException(status_code=400, detail="无效的股票代码格式")
         
         # 获取股票信息
-        stock_info = stock_data_provider.get_stock_info(stock_code)
+        stock_info = await data_provider.get_stock_info(stock_code)
         
         return APIResponse(
             status="success",
@@ -113,36 +226,54 @@ async def get_stock_history(request: StockHistoryRequest):
         if not validate_stock_code(stock_code):
             raise HTTPException(status_code=400, detail="无效的股票代码格式")
         
-        # 获取历史数据
-        df = stock_data_provider.get_stock_history(stock_code, request.period)
+        # 未指定开始日期时按period换算；cursor为上一页最后一行之后的日期
+        start_date = request.cursor or request.start_date
+        if start_date is None:
+            days = int(request.period or "30")
+            start_date = (pd.Timestamp.now().normalize()
+                          - pd.Timedelta(days=days)).strftime("%Y-%m-%d")
+        limit = request.limit
+        if limit is None and request.format != "ndjson":
+            limit = HISTORY_PAGE_ROWS
         
-        if df.empty:
+        # 从缓存的历史K线中按日期二分查找截取本页
+        page = await data_provider.get_history_range(
+            stock_code, start_date, request.end_date, limit
+        )
+        df = page['data']
+        
+        if df.empty and request.cursor is None:
             return APIResponse(
                 status="error",
                 error="无法获取历史数据"
             )
         
-        # 转换为字典格式
-        history_data = []
-        for _, row in df.iterrows():
-            history_data.append({
-                "date": str(row['date']),
-                "open": float(row['open']) if row['open'] is not None else None,
-                "close": float(row['close']) if row['close'] is not None else None,
-                "high": float(row['high']) if row['high'] is not None else None,
-                "low": float(row['low']) if row['low'] is not None else None,
-                "volume": int(row['volume']) if row['volume'] is not None else None,
-                "amount": float(row['amount']) if 'amount' in row and row['amount'] is not None else None
-            })
+        meta = {
+            "stock_code": stock_code,
+            "period": request.period,
+            "start_date": start_date,
+            "end_date": request.end_date,
+            "total_records": len(df),
+            "range_records": page['total'],
+            "next_cursor": page['next_cursor']
+        }
+        
+        if request.format == "ndjson":
+            return StreamingResponse(
+                _stream_history(meta, df),
+                media_type="application/x-ndjson"
+            )
+        
+        if request.format == "columnar":
+            columns = _history_columns(df)
+            meta["columns"] = {"dates": columns.pop("date"), **columns}
+        else:
+            # 转换为字典格式
+            meta["history_data"] = _history_records(df)
         
         return APIResponse(
             status="success",
-            data={
-                "stock_code": stock_code,
-                "period": request.period,
-                "total_records": len(history_data),
-                "history_data": history_data
-            }
+            data=meta
         )
         
     except Exception as e:
@@ -162,11 +293,11 @@ async def analyze_stock(request: StockAnalysisRequest):
         if not validate_stock_code(stock_code):
             raise HTTPException(status_code=400, detail="无效的股票代码格式")
         
-        # 获取股票基本信息
-        stock_info = stock_data_provider.get_stock_info(stock_code)
-        
-        # 获取历史数据
-        df = stock_data_provider.get_stock_history(stock_code, request.period)
+        # 并行获取股票基本信息和历史数据
+        stock_info, df = await asyncio.gather(
+            data_provider.get_stock_info(stock_code),
+            data_provider.get_stock_history(stock_code, request.period)
+        )
         
         if df.empty:
             return APIResponse(
@@ -175,7 +306,7 @@ async def analyze_stock(request: StockAnalysisRequest):
             )
         
         # 进行技术分析
-        analysis = technical_analyzer.comprehensive_analysis(df)
+        analysis = await run_analysis(df)
         
         if 'error' in analysis:
             return APIResponse(
@@ -205,17 +336,7 @@ async def analyze_stock(request: StockAnalysisRequest):
         }
         
         # 获取最近几天的数据
-        recent_data = []
-        for _, row in df.tail(5).iterrows():
-            recent_data.append({
-                "date": str(row['date']),
-                "open": float(row['open']) if row['open'] is not None else None,
-                "close": float(row['close']) if row['close'] is not None else None,
-                "high": float(row['high']) if row['high'] is not None else None,
-                "low": float(row['low']) if row['low'] is not None else None,
-                "volume": int(row['volume']) if row['volume'] is not None else None,
-                "amount": float(row['amount']) if 'amount' in row and row['amount'] is not None else None
-            })
+        recent_data = _history_records(df.tail(5))
         
         return APIResponse(
             status="success",
@@ -247,7 +368,7 @@ async def get_market_status():
     获取市场状态
     """
     try:
-        market_status = stock_data_provider.get_market_status()
+        market_status = await data_provider.get_market_status()
         
         return APIResponse(
             status="success",
@@ -0,0 +1,70 @@
+"""
+MCP服务器启动基准测试
+像Claude Desktop一样通过stdio启动 start_server.py，分别统计从启动进程到
+initialize握手完成、list_tools返回、第一次工具调用返回（需要数据模块导入完成）的耗时，
+并与服务器进程中导入数据模块本身的耗时对比（修改前initialize至少要等这么久）
+"""
+
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from mcp import ClientSession
+from mcp.client.stdio import StdioServerParameters, stdio_client
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+RUNS = 5
+
+
+async def measure_session() -> dict:
+    """启动一次服务器，返回各阶段耗时（秒）"""
+    params = StdioServerParameters(
+        command=sys.executable, args=[os.path.join(ROOT, "start_server.py")], cwd=ROOT
+    )
+    with open(os.devnull, "w") as devnull:
+        start = time.perf_counter()
+        async with stdio_client(params, errlog=devnull) as (read_stream, write_stream):
+            async with ClientSession(read_stream, write_stream) as session:
+                await session.initialize()
+                initialized = time.perf_counter() - start
+                await session.list_tools()
+                listed = time.perf_counter() - start
+                await session.call_tool("get_market_status", {})
+                first_call = time.perf_counter() - start
+    return {"initialize": initialized, "list_tools": listed,
+            "first_tool_call": first_call}
+
+
+def measure_import(statement: str) -> float:
+    """在新进程中执行导入语句，返回导入耗时（秒）"""
+    code = (f"import time; t = time.perf_counter(); {statement}; "
+            "print(time.perf_counter() - t)")
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    sessions = [asyncio.run(measure_session()) for _ in range(RUNS)]
+    imports = {
+        "导入服务器模块（mcp）": [measure_import("import src.server") for _ in range(RUNS)],
+        "导入数据模块（akshare、pandas）": [
+            measure_import("import src.stock_data, src.technical_analysis")
+            for _ in range(RUNS)
+        ],
+    }
+
+    print(f"MCP服务器启动耗时（{RUNS}次中位数，从启动进程开始计时）")
+    for stage in ("initialize", "list_tools", "first_tool_call"):
+        median = statistics.median(run[stage] for run in sessions)
+        print(f"  {stage:<18}{median * 1000:>8.0f} ms")
+    print("导入耗时（新进程）")
+    for name, values in imports.items():
+        print(f"  {name:<28}{statistics.median(values) * 1000:>8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
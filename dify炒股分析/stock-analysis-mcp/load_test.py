@@ -0,0 +1,108 @@
+"""
+HTTP API负载测试
+用固定延迟的模拟数据源代替akshare，按不同并发度请求 /analyze-stock，
+验证吞吐随并发线性增长，直到达到上游并发上限（API_IO_CONCURRENCY）后持平
+"""
+import time
+import asyncio
+import threading
+import numpy as np
+import pandas as pd
+import httpx
+
+import api_server
+
+UPSTREAM_LATENCY = 0.2
+REQUESTS_PER_CLIENT = 4
+CONCURRENCY_LEVELS = (1, 2, 4, 8, 16, 32)
+
+
+class SlowProvider:
+    """每次调用阻塞UPSTREAM_LATENCY秒的模拟数据源，并记录同时进行的调用数峰值"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def _call(self):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(UPSTREAM_LATENCY)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def get_stock_info(self, stock_code: str) -> dict:
+        self._call()
+        return {"code": stock_code, "name": f"测试{stock_code}", "market": "A",
+                "current_price": 10.0, "change": 0.1, "change_percent": 1.0}
+
+    def get_stock_history(self, stock_code: str, period: str = "30",
+                          adjust: str = "qfq") -> pd.DataFrame:
+        self._call()
+        days = int(period)
+        rng = np.random.default_rng(int(stock_code))
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+        return pd.DataFrame({
+            "date": pd.date_range("2024-01-01", periods=days).strftime("%Y-%m-%d"),
+            "open": close * 0.99,
+            "close": close,
+            "high": close * 1.01,
+            "low": close * 0.98,
+            "volume": rng.integers(1000, 100000, days),
+            "amount": close * 1e6,
+        })
+
+    def get_market_status(self) -> dict:
+        return {"is_trading_time": False}
+
+
+async def run(concurrency: int, provider: SlowProvider, next_code) -> float:
+    """concurrency个客户端各自顺序发送REQUESTS_PER_CLIENT个请求，返回吞吐（请求/秒）"""
+    transport = httpx.ASGITransport(app=api_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                 timeout=60) as client:
+        async def client_loop():
+            for _ in range(REQUESTS_PER_CLIENT):
+                # 每个请求使用不同代码，避免命中缓存或合并重复请求
+                response = await client.post(
+                    "/analyze-stock", json={"stock_code": next_code(), "period": "120"}
+                )
+                assert response.json()["status"] == "success", response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        return concurrency * REQUESTS_PER_CLIENT / (time.perf_counter() - start)
+
+
+async def main():
+    provider = SlowProvider()
+    api_server.data_provider.provider = provider
+    codes = iter(range(600000, 700000))
+
+    def next_code() -> str:
+        return str(next(codes))
+
+    # 预热进程池（spawn启动子进程需要导入pandas）
+    await api_server.run_analysis(provider.get_stock_history("600000", "120"))
+
+    limit = api_server.IO_CONCURRENCY
+    # 每个请求包含两次并行的上游调用，理想吞吐 = min(并发, 上游上限/2) / 延迟
+    print(f"上游延迟 {UPSTREAM_LATENCY}s，上游并发上限 {limit}，计算进程 {api_server.CPU_WORKERS}")
+    print(f"{'并发':>6}{'吞吐(请求/秒)':>16}{'理想':>10}{'效率':>8}{'上游峰值':>10}")
+    for concurrency in CONCURRENCY_LEVELS:
+        provider.peak = 0
+        throughput = await run(concurrency, provider, next_code)
+        ideal = min(concurrency, limit / 2) / UPSTREAM_LATENCY
+        print(f"{concurrency:>6}{throughput:>16.1f}{ideal:>10.1f}"
+              f"{throughput / ideal:>8.0%}{provider.peak:>10}")
+
+    api_server.data_provider.shutdown()
+    api_server.get_process_pool().shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""
+数据与分析模块的延迟加载
+导入akshare、pandas需要数秒，MCP客户端每个会话启动一次服务器；
+服务器先完成initialize握手和工具列表，数据模块在后台线程中导入，第一次工具调用时等待导入完成
+"""
+
+import asyncio
+import os
+from typing import Any, NamedTuple, Optional
+from loguru import logger
+
+# 缓存快照文件路径（为空时不启用）：退出时保存缓存，下次启动时恢复其中未过期的数据
+SNAPSHOT_PATH = os.getenv("STOCK_MCP_CACHE_SNAPSHOT", "")
+
+
+class Backend(NamedTuple):
+    """已加载的数据与分析模块"""
+    provider: Any  # AsyncStockDataProvider
+    analyzer: Any  # TechnicalAnalyzer
+
+
+def _import_backend(snapshot_path: str) -> Backend:
+    """导入数据与分析模块并加载缓存快照（在后台线程中执行）"""
+    from .stock_data import async_stock_data_provider, stock_data_provider
+    from .technical_analysis import technical_analyzer
+
+    if snapshot_path:
+        stock_data_provider.load_snapshot(snapshot_path)
+    return Backend(async_stock_data_provider, technical_analyzer)
+
+
+class LazyBackend:
+    """只加载一次的后端，并发的调用方等待同一次加载"""
+
+    def __init__(self, snapshot_path: str = SNAPSHOT_PATH):
+        """
+        Args:
+            snapshot_path: 缓存快照文件路径，为空时不启用
+        """
+        self.snapshot_path = snapshot_path
+        self._future: Optional[asyncio.Future] = None
+
+    @property
+    def loaded(self) -> bool:
+        """是否已加载完成"""
+        return self._future is not None and self._future.done() and not self._failed()
+
+    def _failed(self) -> bool:
+        return self._future.cancelled() or self._future.exception() is not None
+
+    def start(self):
+        """在后台线程中开始加载（需在事件循环中调用），重复调用无效果；上次加载失败时重新加载"""
+        if self._future is None or (self._future.done() and self._failed()):
+            self._future = asyncio.ensure_future(
+                asyncio.to_thread(_import_backend, self.snapshot_path)
+            )
+
+    async def get(self) -> Backend:
+        """获取后端，尚未加载时开始加载并等待完成"""
+        self.start()
+        return await asyncio.shield(self._future)
+
+    async def close(self):
+        """保存缓存快照并关闭线程池（未加载时无需处理）"""
+        if not self.loaded:
+            return
+        backend = self._future.result()
+        if self.snapshot_path:
+            await asyncio.to_thread(
+                backend.provider.provider.save_snapshot, self.snapshot_path
+            )
+        backend.provider.shutdown()
+        logger.info("数据模块已关闭")
@@ -4,23 +4,73 @@
 
 import asyncio
 import json
-from typing import Any, Dict, List
-from mcp.server import Server
+from typing import Any, Callable, Dict, List
+from mcp.server import NotificationOptions, Server
+from mcp.server.lowlevel.helper_types import ReadResourceContents
 from mcp.server.models import InitializationOptions
 from mcp.server.stdio import stdio_server
 from mcp.types import (
-    CallToolRequest,
     CallToolResult,
-    ListToolsRequest,
-    ListToolsResult,
+    Resource,
+    ResourceTemplate,
+    ServerCapabilities,
     Tool,
     TextContent,
 )
-from pydantic import BaseModel
+from pydantic import AnyUrl, BaseModel
 from loguru import logger
 
-from .stock_data import stock_data_provider
-from .technical_analysis import technical_analyzer
+from .backend import LazyBackend
+from .subscriptions import ResourceWatcher, parse_resource_uri, resource_uri
+from .utils import (
+    format_number, format_percentage, normalize_stock_code,
+    to_json_value, validate_stock_code
+)
+
+# analyze_stocks单次最多分析的股票数
+MAX_BATCH_SYMBOLS = 20
+
+# 工具返回形式：都附带structuredContent数据，区别只在文字部分
+OUTPUT_FULL = "full"  # 完整文字报告
+OUTPUT_BRIEF = "brief"  # 一行摘要
+OUTPUT_JSON = "json"  # 文字部分为紧凑JSON（兼容不读取structuredContent的客户端）
+OUTPUT_PROPERTY = {
+    "type": "string",
+    "enum": [OUTPUT_FULL, OUTPUT_BRIEF, OUTPUT_JSON],
+    "default": OUTPUT_FULL,
+    "description": "返回形式：full 完整报告；brief 一行摘要；json 仅数据。数值都在structuredContent中，"
+                   "只需要数值时使用brief或json可大幅减少token"
+}
+
+
+def _tool_result(data: Dict[str, Any], output: str,
+                 full: Callable[[Dict[str, Any]], str],
+                 brief: Callable[[Dict[str, Any]], str]) -> CallToolResult:
+    """
+    生成工具结果：structuredContent为紧凑数据，文字部分按output选择完整报告、一行摘要或JSON
+
+    Args:
+        data: 结果数据
+        output: 返回形式
+        full: 根据数据生成完整报告的函数
+        brief: 根据数据生成一行摘要的函数
+    """
+    payload = to_json_value(data)
+    if output == OUTPUT_JSON:
+        text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    elif output == OUTPUT_BRIEF:
+        text = brief(payload)
+    else:
+        text = full(payload)
+    return CallToolResult(
+        content=[
+            TextContent(
+                type="text",
+                text=text
+            )
+        ],
+        structuredContent=payload
+    )
 
 
 class StockAnalysisServer:
@@ -28,104 +78,197 @@ class StockAnalysisServer:
     
     def __init__(self):
         self.server = Server("stock-analysis")
+        # pandas、akshare在后台线程中导入，不阻塞initialize握手和工具列表
+        self.backend = LazyBackend()
+        self.watcher = ResourceWatcher(self.backend)
         self._setup_handlers()
+
+    def get_capabilities(self) -> ServerCapabilities:
+        """服务器能力（资源支持订阅）"""
+        capabilities = self.server.get_capabilities(
+            notification_options=NotificationOptions(),
+            experimental_capabilities={},
+        )
+        capabilities.resources.subscribe = True
+        return capabilities
     
     def _setup_handlers(self):
         """设置处理器"""
+
+        @self.server.list_resource_templates()
+        async def list_resource_templates() -> List[ResourceTemplate]:
+            """列出资源模板"""
+            return [
+                ResourceTemplate(
+                    name="stock_quote",
+                    uriTemplate=resource_uri("{stock_code}", "quote"),
+                    description="股票实时行情（价格、涨跌额、涨跌幅），可订阅，价格变化时通知",
+                    mimeType="application/json"
+                ),
+                ResourceTemplate(
+                    name="stock_indicators",
+                    uriTemplate=resource_uri("{stock_code}", "indicators"),
+                    description="股票技术指标（趋势、均线、MACD、RSI、KDJ、布林带），可订阅，指标变化时通知",
+                    mimeType="application/json"
+                ),
+            ]
+
+        @self.server.list_resources()
+        async def list_resources() -> List[Resource]:
+            """列出当前被订阅的资源"""
+            resources = []
+            for uri in self.watcher.uris:
+                stock_code, kind = parse_resource_uri(uri)
+                resources.append(Resource(
+                    uri=AnyUrl(uri),
+                    name=f"{stock_code} {kind}",
+                    mimeType="application/json"
+                ))
+            return resources
+
+        @self.server.read_resource()
+        async def read_resource(uri: AnyUrl) -> List[ReadResourceContents]:
+            """读取资源"""
+            content = await self.watcher.read(uri)
+            return [ReadResourceContents(content=content, mime_type="application/json")]
+
+        @self.server.subscribe_resource()
+        async def subscribe_resource(uri: AnyUrl):
+            """订阅资源，内容变化时发送notifications/resources/updated"""
+            await self.watcher.subscribe(uri, self.server.request_context.session)
+
+        @self.server.unsubscribe_resource()
+        async def unsubscribe_resource(uri: AnyUrl):
+            """取消订阅资源"""
+            self.watcher.unsubscribe(uri, self.server.request_context.session)
         
         @self.server.list_tools()
-        async def list_tools() -> ListToolsResult:
+        async def list_tools() -> List[Tool]:
             """列出可用工具"""
-            return ListToolsResult(
-                tools=[
-                    Tool(
-                        name="get_stock_info",
-                        description="获取股票基本信息，包括当前价格、涨跌幅等",
-                        inputSchema={
-                            "type": "object",
-                            "properties": {
-                                "stock_code": {
-                                    "type": "string",
-                                    "description": "股票代码，如 '000001'"
-                                }
+            return [
+                Tool(
+                    name="get_stock_info",
+                    description="获取股票基本信息，包括当前价格、涨跌幅等",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "stock_code": {
+                                "type": "string",
+                                "description": "股票代码，如 '000001'"
                             },
-                            "required": ["stock_code"]
-                        }
-                    ),
-                    Tool(
-                        name="get_stock_history",
-                        description="获取股票历史数据",
-                        inputSchema={
-                            "type": "object",
-                            "properties": {
-                                "stock_code": {
-                                    "type": "string",
-                                    "description": "股票代码，如 '000001'"
-                                },
-                                "period": {
-                                    "type": "string",
-                                    "description": "获取天数，默认30天",
-                                    "default": "30"
-                                }
+                            "output": OUTPUT_PROPERTY
+                        },
+                        "required": ["stock_code"]
+                    }
+                ),
+                Tool(
+                    name="get_stock_history",
+                    description="获取股票历史数据",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "stock_code": {
+                                "type": "string",
+                                "description": "股票代码，如 '000001'"
                             },
-                            "required": ["stock_code"]
-                        }
-                    ),
-                    Tool(
-                        name="analyze_stock",
-                        description="综合股票技术分析，包括趋势、技术指标、支撑阻力位等",
-                        inputSchema={
-                            "type": "object",
-                            "properties": {
-                                "stock_code": {
-                                    "type": "string",
-                                    "description": "股票代码，如 '000001'"
-                                },
-                                "period": {
-                                    "type": "string",
-                                    "description": "分析周期天数，默认30天",
-                                    "default": "30"
-                                }
+                            "period": {
+                                "type": "string",
+                                "description": "获取天数，默认30天",
+                                "default": "30"
                             },
-                            "required": ["stock_code"]
-                        }
-                    ),
-                    Tool(
-                        name="get_market_status",
-                        description="获取市场状态信息",
-                        inputSchema={
-                            "type": "object",
-                            "properties": {},
-                            "required": []
-                        }
-                    )
-                ]
-            )
+                            "output": OUTPUT_PROPERTY
+                        },
+                        "required": ["stock_code"]
+                    }
+                ),
+                Tool(
+                    name="analyze_stock",
+                    description="综合股票技术分析，包括趋势、技术指标、支撑阻力位等",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "stock_code": {
+                                "type": "string",
+                                "description": "股票代码，如 '000001'"
+                            },
+                            "period": {
+                                "type": "string",
+                                "description": "分析周期天数，默认30天",
+                                "default": "30"
+                            },
+                            "output": OUTPUT_PROPERTY
+                        },
+                        "required": ["stock_code"]
+                    }
+                ),
+                Tool(
+                    name="analyze_stocks",
+                    description="批量分析多只股票并返回对比表（价格、涨跌幅、趋势、RSI、MACD、均线位置），"
+                                "比较多只股票时应优先使用，而不是多次调用analyze_stock",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "stock_codes": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "minItems": 1,
+                                "maxItems": MAX_BATCH_SYMBOLS,
+                                "description": "股票代码列表，如 ['000001', '600519']"
+                            },
+                            "period": {
+                                "type": "string",
+                                "description": "分析周期天数，默认60天",
+                                "default": "60"
+                            },
+                            "output": OUTPUT_PROPERTY
+                        },
+                        "required": ["stock_codes"]
+                    }
+                ),
+                Tool(
+                    name="get_market_status",
+                    description="获取市场状态信息",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "output": OUTPUT_PROPERTY
+                        },
+                        "required": []
+                    }
+                )
+            ]
         
         @self.server.call_tool()
-        async def call_tool(request: CallToolRequest) -> CallToolResult:
-            """调用工具"""
+        async def call_tool(name: str, arguments: Dict[str, Any]) -> CallToolResult:
+            """
+            调用工具
+
+            MCP服务器为每个请求创建独立任务，数据下载和计算都在线程池中执行，多个工具调用可以并行
+            """
             try:
-                if request.name == "get_stock_info":
-                    return await self._get_stock_info(request.arguments)
-                elif request.name == "get_stock_history":
-                    return await self._get_stock_history(request.arguments)
-                elif request.name == "analyze_stock":
-                    return await self._analyze_stock(request.arguments)
-                elif request.name == "get_market_status":
-                    return await self._get_market_status(request.arguments)
+                if name == "get_stock_info":
+                    return await self._get_stock_info(arguments)
+                elif name == "get_stock_history":
+                    return await self._get_stock_history(arguments)
+                elif name == "analyze_stock":
+                    return await self._analyze_stock(arguments)
+                elif name == "analyze_stocks":
+                    return await self._analyze_stocks(arguments)
+                elif name == "get_market_status":
+                    return await self._get_market_status(arguments)
                 else:
-                    raise ValueError(f"未知工具: {request.name}")
+                    raise ValueError(f"未知工具: {name}")
                     
             except Exception as e:
-                logger.error(f"工具调用失败 {request.name}: {e}")
+                logger.error(f"工具调用失败 {name}: {e}")
                 return CallToolResult(
                     content=[
                         TextContent(
                             type="text",
                             text=f"错误: {str(e)}"
                         )
-                    ]
+                    ],
+                    isError=True
                 )
     
     async def _get_stock_info(self, arguments: Dict[str, Any]) -> CallToolResult:
@@ -135,29 +278,38 @@ class StockAnalysisServer:
             raise ValueError("缺少股票代码参数")
         
         # 获取股票信息
-        stock_info = stock_data_provider.get_stock_info(stock_code)
+        backend = await self.backend.get()
+        stock_info = await backend.provider.get_stock_info(stock_code)
         
-        # 格式化输出
-        result_text = f"""📈 股票信息 - {stock_info['name']} ({stock_info['code']})
+        data = {
+            'code': stock_info['code'],
+            'name': stock_info['name'],
+            'market': stock_info.get('market'),
+            'price': stock_info.get('current_price'),
+            'change': stock_info.get('change'),
+            'change_pct': stock_info.get('change_percent')
+        }
+        if 'error' in stock_info:
+            data['error'] = stock_info['error']
+        
+        def full(data: Dict[str, Any]) -> str:
+            text = f"""📈 股票信息 - {data['name']} ({data['code']})
 
-💰 当前价格: {stock_info['current_price']:.2f} 元
-📊 涨跌额: {stock_info['change']:.2f} 元
-📈 涨跌幅: {stock_info['change_percent']:.2f}%
-🏢 市场: {stock_info['market']}股
+💰 当前价格: {format_number(data['price'])} 元
+📊 涨跌额: {format_number(data['change'])} 元
+📈 涨跌幅: {format_percentage(data['change_pct'])}
+🏢 市场: {data['market']}股
 
 """
+            if 'error' in data:
+                text += f"⚠️ 注意: {data['error']}"
+            return text
         
-        if 'error' in stock_info:
-            result_text += f"⚠️ 注意: {stock_info['error']}"
+        def brief(data: Dict[str, Any]) -> str:
+            return (f"{data['name']}({data['code']}) 现价 {format_number(data['price'])} "
+                    f"涨跌幅 {format_percentage(data['change_pct'])}")
         
-        return CallToolResult(
-            content=[
-                TextContent(
-                    type="text",
-                    text=result_text
-                )
-            ]
-        )
+        return _tool_result(data, arguments.get("output", OUTPUT_FULL), full, brief)
     
     async def _get_stock_history(self, arguments: Dict[str, Any]) -> CallToolResult:
         """获取股票历史数据"""
@@ -168,7 +320,8 @@ class StockAnalysisServer:
             raise ValueError("缺少股票代码参数")
         
         # 获取历史数据
-        df = stock_data_provider.get_stock_history(stock_code, period)
+        backend = await self.backend.get()
+        df = await backend.provider.get_stock_history(stock_code, period)
         
         if df.empty:
             return CallToolResult(
@@ -180,30 +333,47 @@ class StockAnalysisServer:
                 ]
             )
         
-        # 格式化输出最近几天的数据
-        recent_data = df.tail(5)
-        result_text = f"""📊 股票历史数据 - {stock_code} (最近5天)
+        # 按列输出，比逐条记录少重复字段名
+        columns = ['date', 'open', 'close', 'high', 'low', 'volume']
+        data = {
+            'code': stock_code,
+            'days': len(df),
+            'bars': {
+                column: (
+                    (df[column].astype(str) if column == 'date'
+                     else df[column]).tolist()
+                    if column in df.columns else [None] * len(df)
+                )
+                for column in columns
+            }
+        }
+        
+        def full(data: Dict[str, Any]) -> str:
+            bars = data['bars']
+            # 格式化输出最近几天的数据
+            text = f"""📊 股票历史数据 - {data['code']} (最近5天)
 
 """
-        
-        for _, row in recent_data.iterrows():
-            result_text += f"""📅 {row['date']}
-   开盘: {row['open']:.2f}  收盘: {row['close']:.2f}
-   最高: {row['high']:.2f}  最低: {row['low']:.2f}
-   成交量: {row['volume']:,.0f}
+            for i in range(max(data['days'] - 5, 0), data['days']):
+                volume = bars['volume'][i]
+                text += f"""📅 {bars['date'][i]}
+   开盘: {format_number(bars['open'][i])}  收盘: {format_number(bars['close'][i])}
+   最高: {format_number(bars['high'][i])}  最低: {format_number(bars['low'][i])}
+   成交量: {f'{volume:,.0f}' if volume is not None else 'N/A'}
 
 """
+            text += f"📈 总共获取 {data['days']} 天的数据"
+            return text
         
-        result_text += f"📈 总共获取 {len(df)} 天的数据"
+        def brief(data: Dict[str, Any]) -> str:
+            bars = data['bars']
+            first, last = bars['close'][0], bars['close'][-1]
+            change = (last / first - 1) * 100 if first and last is not None else None
+            return (f"{data['code']} {bars['date'][0]}~{bars['date'][-1]} "
+                    f"共{data['days']}条 收盘 {format_number(first)}→{format_number(last)} "
+                    f"({format_percentage(change)})")
         
-        return CallToolResult(
-            content=[
-                TextContent(
-                    type="text",
-                    text=result_text
-                )
-            ]
-        )
+        return _tool_result(data, arguments.get("output", OUTPUT_FULL), full, brief)
     
     async def _analyze_stock(self, arguments: Dict[str, Any]) -> CallToolResult:
         """综合股票分析"""
@@ -213,11 +383,12 @@ class StockAnalysisServer:
         if not stock_code:
             raise ValueError("缺少股票代码参数")
         
-        # 获取股票基本信息
-        stock_info = stock_data_provider.get_stock_info(stock_code)
-        
-        # 获取历史数据
-        df = stock_data_provider.get_stock_history(stock_code, period)
+        # 并行获取股票基本信息和历史数据
+        backend = await self.backend.get()
+        stock_info, df = await asyncio.gather(
+            backend.provider.get_stock_info(stock_code),
+            backend.provider.get_stock_history(stock_code, period)
+        )
         
         if df.empty:
             return CallToolResult(
@@ -230,7 +401,9 @@ class StockAnalysisServer:
             )
         
         # 进行技术分析
-        analysis = technical_analyzer.comprehensive_analysis(df)
+        analysis = await backend.provider.run_compute(
+            backend.analyzer.comprehensive_analysis, df
+        )
         
         if 'error' in analysis:
             return CallToolResult(
@@ -242,99 +415,223 @@ class StockAnalysisServer:
                 ]
             )
         
-        # 格式化分析结果
-        result_text = f"""🔍 股票技术分析报告 - {stock_info['name']} ({stock_code})
+        # 数据不足时部分指标（如MA60）为None
+        data = {
+            'code': stock_code,
+            'name': stock_info.get('name'),
+            'period': period,
+            'price': stock_info.get('current_price'),
+            'change_pct': stock_info.get('change_percent'),
+            'trend': analysis.get('trend'),
+            'ma': {window: analysis.get(f'ma{window}')
+                   for window in ('5', '10', '20', '60')},
+            'macd': {
+                'macd': analysis.get('macd'),
+                'signal': analysis.get('macd_signal'),
+                'histogram': analysis.get('macd_histogram')
+            },
+            'rsi': analysis.get('rsi'),
+            'kdj': {key: analysis.get(f'kdj_{key}') for key in ('k', 'd', 'j')},
+            'bollinger': {key: analysis.get(f'bollinger_{key}')
+                          for key in ('upper', 'middle', 'lower')},
+            'support': analysis.get('support_levels') or [],
+            'resistance': analysis.get('resistance_levels') or []
+        }
+        
+        def full(data: Dict[str, Any]) -> str:
+            ma, macd = data['ma'], data['macd']
+            kdj, bollinger = data['kdj'], data['bollinger']
+            return f"""🔍 股票技术分析报告 - {data['name']} ({data['code']})
 
-💰 当前价格: {stock_info['current_price']:.2f} 元
-📈 涨跌幅: {stock_info['change_percent']:.2f}%
+💰 当前价格: {format_number(data['price'])} 元
+📈 涨跌幅: {format_percentage(data['change_pct'])}
 
-📊 趋势分析: {analysis['trend']}
+📊 趋势分析: {data['trend']}
 
 📈 移动平均线:
-   MA5:  {analysis['ma5']:.2f} 元
-   MA10: {analysis['ma10']:.2f} 元  
-   MA20: {analysis['ma20']:.2f} 元
-   MA60: {analysis['ma60']:.2f} 元 (如有)
+   MA5:  {format_number(ma['5'])} 元
+   MA10: {format_number(ma['10'])} 元  
+   MA20: {format_number(ma['20'])} 元
+   MA60: {format_number(ma['60'])} 元
 
 🎯 技术指标:
-   MACD: {analysis['macd']:.4f}
-   信号线: {analysis['macd_signal']:.4f}
-   柱状图: {analysis['macd_histogram']:.4f}
+   MACD: {format_number(macd['macd'], 4)}
+   信号线: {format_number(macd['signal'], 4)}
+   柱状图: {format_number(macd['histogram'], 4)}
    
-   RSI: {analysis['rsi']:.2f}
+   RSI: {format_number(data['rsi'])}
    
    KDJ:
-   K: {analysis['kdj_k']:.2f}
-   D: {analysis['kdj_d']:.2f}  
-   J: {analysis['kdj_j']:.2f}
+   K: {format_number(kdj['k'])}
+   D: {format_number(kdj['d'])}  
+   J: {format_number(kdj['j'])}
 
 📊 布林带:
-   上轨: {analysis['bollinger_upper']:.2f}
-   中轨: {analysis['bollinger_middle']:.2f}
-   下轨: {analysis['bollinger_lower']:.2f}
+   上轨: {format_number(bollinger['upper'])}
+   中轨: {format_number(bollinger['middle'])}
+   下轨: {format_number(bollinger['lower'])}
 
 🎯 关键位置:
-   支撑位: {', '.join([f'{level:.2f}' for level in analysis['support_levels']])}
-   阻力位: {', '.join([f'{level:.2f}' for level in analysis['resistance_levels']])}
+   支撑位: {', '.join(format_number(level) for level in data['support']) or 'N/A'}
+   阻力位: {', '.join(format_number(level) for level in data['resistance']) or 'N/A'}
 
-📝 分析基于最近 {period} 天的数据
+📝 分析基于最近 {data['period']} 天的数据
 """
         
-        return CallToolResult(
-            content=[
-                TextContent(
-                    type="text",
-                    text=result_text
-                )
-            ]
-        )
+        def brief(data: Dict[str, Any]) -> str:
+            return (f"{data['name']}({data['code']}) 现价 {format_number(data['price'])} "
+                    f"涨跌幅 {format_percentage(data['change_pct'])} 趋势 {data['trend']} "
+                    f"RSI {format_number(data['rsi'], 1)} "
+                    f"MACD柱 {format_number(data['macd']['histogram'], 3)} "
+                    f"MA20 {format_number(data['ma']['20'])}")
+        
+        return _tool_result(data, arguments.get("output", OUTPUT_FULL), full, brief)
     
+    async def _analyze_stocks(self, arguments: Dict[str, Any]) -> CallToolResult:
+        """
+        批量股票分析
+
+        所有股票的实时价格取自同一份行情快照，历史数据在数据并发上限内同时获取，
+        每只股票下载完成后立即开始计算，总耗时接近单只股票
+        """
+        period = arguments.get("period", "60")
+        raw_codes = [str(code) for code in arguments.get("stock_codes") or []]
+        if not raw_codes:
+            raise ValueError("缺少股票代码参数")
+        # 不含数字的输入会被补零成000000，先单独排除
+        invalid = [
+            code for code in raw_codes
+            if not any(ch.isdigit() for ch in code)
+            or not validate_stock_code(normalize_stock_code(code))
+        ]
+        if invalid:
+            raise ValueError(f"股票代码格式不正确: {', '.join(invalid)}")
+        stock_codes = list(dict.fromkeys(
+            normalize_stock_code(code) for code in raw_codes
+        ))
+        if len(stock_codes) > MAX_BATCH_SYMBOLS:
+            raise ValueError(f"单次最多分析 {MAX_BATCH_SYMBOLS} 只股票")
+
+        backend = await self.backend.get()
+
+        async def analyze(stock_code: str) -> Dict[str, Any]:
+            df = await backend.provider.get_stock_history(stock_code, period)
+            if df.empty:
+                return {'error': '无历史数据'}
+            return await backend.provider.run_compute(
+                backend.analyzer.comprehensive_analysis, df
+            )
+
+        quotes, *analyses = await asyncio.gather(
+            backend.provider.get_quotes(stock_codes),
+            *(analyze(code) for code in stock_codes),
+            return_exceptions=True
+        )
+        if isinstance(quotes, Exception):
+            logger.warning(f"获取实时行情失败: {quotes}")
+            quotes = {}
+
+        stocks = []
+        for stock_code, analysis in zip(stock_codes, analyses):
+            quote = quotes.get(stock_code) or {'name': f"股票{stock_code}"}
+            if isinstance(analysis, Exception):
+                analysis = {'error': str(analysis)}
+            stock = {
+                'code': stock_code,
+                'name': quote['name'],
+                'price': quote.get('current_price'),
+                'change_pct': quote.get('change_percent')
+            }
+            if 'error' in analysis:
+                stock['error'] = analysis['error']
+            else:
+                price = stock['price']
+                ma20 = analysis.get('ma20')
+                stock.update({
+                    'trend': analysis.get('trend'),
+                    'rsi': analysis.get('rsi'),
+                    'macd_histogram': analysis.get('macd_histogram'),
+                    'vs_ma20_pct': (price / ma20 - 1) * 100 if price and ma20 else None
+                })
+            stocks.append(stock)
+
+        data = {'period': period, 'stocks': stocks}
+
+        def full(data: Dict[str, Any]) -> str:
+            rows = []
+            for stock in data['stocks']:
+                prefix = (f"| {stock['code']} | {stock['name']} | "
+                          f"{format_number(stock['price'])} | "
+                          f"{format_percentage(stock['change_pct'])} |")
+                if 'error' in stock:
+                    rows.append(f"{prefix} ❌ {stock['error']} | | | |")
+                else:
+                    rows.append(f"{prefix} {stock['trend']} | "
+                                f"{format_number(stock['rsi'], 1)} | "
+                                f"{format_number(stock['macd_histogram'], 3)} | "
+                                f"{format_percentage(stock['vs_ma20_pct'], 1)} |")
+            return f"""📊 股票对比分析 ({len(data['stocks'])} 只，最近 {data['period']} 天)
+
+| 代码 | 名称 | 现价 | 涨跌幅 | 趋势 | RSI | MACD柱 | 相对MA20 |
+|---|---|---|---|---|---|---|---|
+""" + "\n".join(rows)
+
+        def brief(data: Dict[str, Any]) -> str:
+            return "; ".join(
+                f"{stock['code']} {stock['name']} {format_number(stock['price'])} "
+                f"{format_percentage(stock['change_pct'])} "
+                f"{stock.get('trend') or stock.get('error')}"
+                for stock in data['stocks']
+            )
+
+        return _tool_result(data, arguments.get("output", OUTPUT_FULL), full, brief)
+
     async def _get_market_status(self, arguments: Dict[str, Any]) -> CallToolResult:
         """获取市场状态"""
-        market_status = stock_data_provider.get_market_status()
-        
-        status_emoji = "🟢" if market_status['market_status'] == 'open' else "🔴"
+        backend = await self.backend.get()
+        market_status = await backend.provider.get_market_status()
         
-        result_text = f"""🏢 A股市场状态
+        def full(data: Dict[str, Any]) -> str:
+            status_emoji = "🟢" if data.get('market_status') == 'open' else "🔴"
+            text = f"""🏢 A股市场状态
 
-{status_emoji} 市场状态: {market_status['market_status']}
-🕐 当前时间: {market_status['current_time']}
-📅 是否交易日: {'是' if market_status['is_trading_day'] else '否'}
-⏰ 是否交易时间: {'是' if market_status['is_trading_time'] else '否'}
+{status_emoji} 市场状态: {data.get('market_status')}
+🕐 当前时间: {data.get('current_time')}
+📅 是否交易日: {'是' if data.get('is_trading_day') else '否'}
+⏰ 是否交易时间: {'是' if data.get('is_trading_time') else '否'}
 
 📋 交易时间:
    上午: 09:30 - 11:30
    下午: 13:00 - 15:00
 """
+            if 'error' in data:
+                text += f"\n⚠️ 注意: {data['error']}"
+            return text
         
-        if 'error' in market_status:
-            result_text += f"\n⚠️ 注意: {market_status['error']}"
+        def brief(data: Dict[str, Any]) -> str:
+            return f"A股 {data.get('market_status')} {data.get('current_time')}"
         
-        return CallToolResult(
-            content=[
-                TextContent(
-                    type="text",
-                    text=result_text
-                )
-            ]
-        )
+        return _tool_result(market_status, arguments.get("output", OUTPUT_FULL),
+                            full, brief)
     
     async def run(self):
         """运行服务器"""
         logger.info("启动股票分析MCP服务器...")
-        async with stdio_server() as (read_stream, write_stream):
-            await self.server.run(
-                read_stream,
-                write_stream,
-                InitializationOptions(
-                    server_name="stock-analysis",
-                    server_version="1.0.0",
-                    capabilities=self.server.get_capabilities(
-                        notification_options=None,
-                        experimental_capabilities=None,
+        self.backend.start()
+        try:
+            async with stdio_server() as (read_stream, write_stream):
+                await self.server.run(
+                    read_stream,
+                    write_stream,
+                    InitializationOptions(
+                        server_name="stock-analysis",
+                        server_version="1.0.0",
+                        capabilities=self.get_capabilities(),
                     ),
-                ),
-            )
+                )
+        finally:
+            await self.watcher.stop()
+            await self.backend.close()
 
 
 async def main():
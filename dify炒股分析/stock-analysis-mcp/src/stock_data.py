@@ -3,33 +3,218 @@
 支持从多个数据源获取股票数据
 """
 
-import akshare as ak
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from loguru import logger
+import asyncio
+import os
+import pickle
+import sys
+import threading
 import time
 
+# 本包位于主应用目录下，合成行情和录制回放直接使用主应用的实现
+APP_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+def load_data_source():
+    """
+    按DATA_SOURCE环境变量选择行情数据源，与主应用使用同一个开关和配置：
+    akshare（默认）直接使用akshare模块；synthetic、record、replay使用主应用services.data_source
+    创建的数据源，FIXTURE_DIR等录制回放配置也与主应用相同
+    """
+    if os.getenv("DATA_SOURCE", "akshare") == "akshare":
+        import akshare
+        return akshare
+    if APP_ROOT not in sys.path:
+        sys.path.append(APP_ROOT)
+    from services.data_source import data_source
+    return data_source
+
+
+ak = load_data_source()
+
+
+def _to_float(value) -> Optional[float]:
+    """转换为浮点数，缺失值（停牌股票的价格等）返回None"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if np.isnan(value) else value
+
+
+class LRUCache:
+    """
+    有界LRU缓存（线程安全）
+
+    条目数超过max_entries时淘汰最久未使用的条目，读取时检查过期
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 300):
+        """
+        Args:
+            max_entries: 最大条目数
+            ttl: 过期时间（秒）
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Any:
+        """
+        获取缓存值，不存在或已过期时返回None
+
+        Args:
+            key: 缓存键
+            max_age: 可接受的最长缓存时间（秒），比ttl更严格时使用，超过时视为未命中但不删除
+        """
+        with self._lock:
+            item = self._data.get(key)
+            age = time.time() - item[0] if item is not None else None
+            if item is None or age >= self.ttl:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            if max_age is not None and age >= max_age:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: str, value: Any):
+        """写入缓存值"""
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def dump(self, path: str) -> int:
+        """
+        将未过期的条目（连同写入时间）保存到文件，先写临时文件再替换，避免中途退出留下损坏的文件
+
+        Returns:
+            int: 保存的条目数
+        """
+        now = time.time()
+        with self._lock:
+            items = [(key, stored_at, value)
+                     for key, (stored_at, value) in self._data.items()
+                     if now - stored_at < self.ttl]
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(items, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        return len(items)
+
+    def load(self, path: str) -> int:
+        """
+        从dump保存的文件中恢复条目，保留原写入时间，已过期的条目丢弃
+
+        Returns:
+            int: 恢复的条目数
+        """
+        with open(path, 'rb') as f:
+            items = pickle.load(f)
+        now = time.time()
+        loaded = 0
+        with self._lock:
+            for key, stored_at, value in items:
+                if now - stored_at < self.ttl and key not in self._data:
+                    self._data[key] = (stored_at, value)
+                    loaded += 1
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return loaded
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._data),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
+
 
 class StockDataProvider:
-    """股票数据提供者"""
+    """
+    股票数据提供者
+
+    缓存为有界LRU；同一数据的并发请求只下载一次，其余线程等待共享结果；
+    历史数据按(代码, 复权类型)缓存并至少下载history_min_days天，较短周期直接从缓存中截取
+    """
     
-    def __init__(self):
-        self.cache = {}
-        self.cache_timeout = 300  # 5分钟缓存
+    def __init__(self, max_entries: int = 512, cache_timeout: float = 300,
+                 history_min_days: int = 120):
+        """
+        Args:
+            max_entries: 缓存最大条目数
+            cache_timeout: 缓存时间（秒）
+            history_min_days: 历史数据最少下载的天数
+        """
+        self.cache_timeout = cache_timeout  # 5分钟缓存
+        self.cache = LRUCache(max_entries, cache_timeout)
+        self.history_min_days = history_min_days
+        self.downloads = 0  # 实际发起的akshare下载次数
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
         
     def _get_cache_key(self, stock_code: str, data_type: str) -> str:
         """生成缓存键"""
         return f"{stock_code}_{data_type}"
-    
-    def _is_cache_valid(self, cache_key: str) -> bool:
-        """检查缓存是否有效"""
-        if cache_key not in self.cache:
-            return False
-        
-        cache_time = self.cache[cache_key].get('timestamp', 0)
-        return time.time() - cache_time < self.cache_timeout
+
+    def _single_flight(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        同一键同时只执行一次loader，其余调用等待并共享结果（包括异常）
+
+        Args:
+            key: 请求键
+            loader: 实际下载数据的函数
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+                self.downloads += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = loader()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
     
     def get_stock_info(self, stock_code: str) -> Dict:
         """
@@ -42,44 +227,22 @@ class StockDataProvider:
             股票基本信息字典
         """
         cache_key = self._get_cache_key(stock_code, 'info')
-        
-        if self._is_cache_valid(cache_key):
-            return self.cache[cache_key]['data']
+        result = self.cache.get(cache_key)
+        if result is not None:
+            return result
         
         try:
             # 获取股票基本信息
-            stock_info = ak.stock_individual_info_em(symbol=stock_code)
-            
-            # 获取实时价格
-            realtime_data = ak.stock_zh_a_spot_em()
-            stock_realtime = realtime_data[realtime_data['代码'] == stock_code]
-            
-            if not stock_realtime.empty:
-                current_price = float(stock_realtime.iloc[0]['最新价'])
-                change = float(stock_realtime.iloc[0]['涨跌额'])
-                change_percent = float(stock_realtime.iloc[0]['涨跌幅'])
-                name = stock_realtime.iloc[0]['名称']
-            else:
-                current_price = None
-                change = None
-                change_percent = None
-                name = f"股票{stock_code}"
+            stock_info = self._single_flight(
+                cache_key, lambda: ak.stock_individual_info_em(symbol=stock_code)
+            )
             
-            result = {
-                'code': stock_code,
-                'name': name,
-                'market': 'A',  # A股
-                'current_price': current_price,
-                'change': change,
-                'change_percent': change_percent,
-                'info': stock_info.to_dict() if not stock_info.empty else {}
-            }
+            # 从全市场行情快照中取实时价格
+            result = self.get_quotes([stock_code])[stock_code]
+            result['info'] = stock_info.to_dict() if not stock_info.empty else {}
             
             # 缓存结果
-            self.cache[cache_key] = {
-                'data': result,
-                'timestamp': time.time()
-            }
+            self.cache.set(cache_key, result)
             
             logger.info(f"获取股票 {stock_code} 基本信息成功")
             return result
@@ -96,6 +259,63 @@ class StockDataProvider:
                 'error': str(e)
             }
     
+    def get_spot_snapshot(self, max_age: Optional[float] = None) -> pd.DataFrame:
+        """
+        获取A股全市场实时行情快照（按代码索引）
+
+        一次下载包含全部股票，缓存cache_timeout秒；并发调用时只有一个线程下载，其余等待共享结果
+
+        Args:
+            max_age: 可接受的最长缓存时间（秒），默认cache_timeout
+        """
+        cache_key = self._get_cache_key('all', 'spot')
+        snapshot = self.cache.get(cache_key, max_age)
+        if snapshot is not None:
+            return snapshot
+
+        def load() -> pd.DataFrame:
+            data = ak.stock_zh_a_spot_em()
+            data = data.drop_duplicates('代码').set_index('代码')
+            self.cache.set(cache_key, data)
+            logger.info(f"获取A股实时行情快照成功，共 {len(data)} 只股票")
+            return data
+
+        return self._single_flight(cache_key, load)
+
+    def get_quotes(self, stock_codes: List[str],
+                   max_age: Optional[float] = None) -> Dict[str, Dict]:
+        """
+        从同一份行情快照中获取多只股票的实时价格
+
+        Args:
+            stock_codes: 股票代码列表
+            max_age: 可接受的行情快照最长缓存时间（秒），默认cache_timeout
+
+        Returns:
+            股票代码 -> 名称、当前价格、涨跌额、涨跌幅（快照中没有的股票价格为None）
+        """
+        snapshot = self.get_spot_snapshot(max_age)
+        quotes = {}
+        for stock_code in stock_codes:
+            quote = {
+                'code': stock_code,
+                'name': f"股票{stock_code}",
+                'market': 'A',  # A股
+                'current_price': None,
+                'change': None,
+                'change_percent': None
+            }
+            if stock_code in snapshot.index:
+                row = snapshot.loc[stock_code]
+                quote.update({
+                    'name': row['名称'],
+                    'current_price': _to_float(row['最新价']),
+                    'change': _to_float(row['涨跌额']),
+                    'change_percent': _to_float(row['涨跌幅'])
+                })
+            quotes[stock_code] = quote
+        return quotes
+
     def get_stock_history(self, stock_code: str, period: str = "30", 
                          adjust: str = "qfq") -> pd.DataFrame:
         """
@@ -109,62 +329,155 @@ class StockDataProvider:
         Returns:
             包含历史数据的DataFrame
         """
-        cache_key = self._get_cache_key(stock_code, f'history_{period}_{adjust}')
+        days = int(period)
+        entry = self._history_entry(stock_code, days, adjust)
+        if entry is None:
+            return pd.DataFrame()
+        return self._slice_history(entry, days)
+
+    def get_history_range(self, stock_code: str, start_date: Optional[str] = None,
+                          end_date: Optional[str] = None, limit: Optional[int] = None,
+                          adjust: str = "qfq") -> Dict:
+        """
+        按日期范围分页获取历史数据
+
+        数据来自按股票缓存的历史K线，起止位置在日期索引上二分查找，每页只截取limit行
+
+        Args:
+            stock_code: 股票代码
+            start_date: 开始日期（含），如 2015-01-01；为空时取最近30天
+            end_date: 结束日期（含），为空时取到最新
+            limit: 每页最多返回的行数，为空时返回范围内全部数据
+            adjust: 复权类型
+
+        Returns:
+            Dict: data为本页DataFrame，total为范围内总行数，
+                  next_cursor为下一页的开始日期（没有下一页时为None）
+        """
+        today = pd.Timestamp(datetime.now().date())
+        if start_date:
+            start = pd.Timestamp(start_date)
+        else:
+            start = today - pd.Timedelta(days=30)
+        end = pd.Timestamp(end_date) if end_date else None
+        empty = {'data': pd.DataFrame(), 'total': 0, 'next_cursor': None}
+        if start > today or (end is not None and end < start):
+            return empty
+
+        entry = self._history_entry(stock_code, (today - start).days, adjust)
+        if entry is None:
+            return empty
+
+        dates = entry['dates']
+        first = int(np.searchsorted(dates, start.to_datetime64(), side='left'))
+        if end is None:
+            last = len(dates)
+        else:
+            last = int(np.searchsorted(dates, end.to_datetime64(), side='right'))
+        stop = last if limit is None else min(last, first + limit)
+        next_cursor = str(pd.Timestamp(dates[stop]).date()) if stop < last else None
+        return {
+            'data': entry['data'].iloc[first:stop].reset_index(drop=True),
+            'total': max(last - first, 0),
+            'next_cursor': next_cursor
+        }
+
+    def _history_entry(self, stock_code: str, days: int, adjust: str) -> Optional[Dict]:
+        """获取至少覆盖最近days天的历史数据缓存条目，缓存不足时重新下载（失败返回None）"""
+        cache_key = self._get_cache_key(stock_code, f'history_{adjust}')
+        entry = self.cache.get(cache_key)
+        if entry is None or entry['days'] < days:
+            fetch_days = max(days, self.history_min_days)
+            try:
+                entry = self._single_flight(
+                    f"{cache_key}_{fetch_days}",
+                    lambda: self._download_history(stock_code, fetch_days, adjust)
+                )
+            except Exception as e:
+                logger.error(f"获取股票 {stock_code} 历史数据失败: {e}")
+                return None
+            if entry is None:
+                return None
+            self.cache.set(cache_key, entry)
+        return entry
+
+    def _download_history(self, stock_code: str, days: int,
+                          adjust: str) -> Optional[Dict]:
+        """下载最近days天的历史数据，返回缓存条目（数据为空时返回None）"""
+        # 计算开始日期
+        end_date = datetime.now().strftime('%Y%m%d')
+        start_date = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
+        
+        # 获取历史数据
+        df = ak.stock_zh_a_hist(
+            symbol=stock_code,
+            period="daily",
+            start_date=start_date,
+            end_date=end_date,
+            adjust=adjust
+        )
+        
+        if df.empty:
+            logger.warning(f"股票 {stock_code} 历史数据为空")
+            return None
         
-        if self._is_cache_valid(cache_key):
-            return self.cache[cache_key]['data']
+        # 重命名列
+        df = df.rename(columns={
+            '日期': 'date',
+            '开盘': 'open',
+            '收盘': 'close',
+            '最高': 'high',
+            '最低': 'low',
+            '成交量': 'volume',
+            '成交额': 'amount'
+        })
         
+        # 确保数据类型正确
+        numeric_columns = ['open', 'close', 'high', 'low', 'volume']
+        for col in numeric_columns:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+        
+        # 按日期排序
+        df = df.sort_values('date').reset_index(drop=True)
+        
+        logger.info(f"获取股票 {stock_code} 历史数据成功，共 {len(df)} 条记录")
+        return {
+            'data': df,
+            'dates': pd.to_datetime(df['date']).to_numpy(),
+            'days': days,
+            'fetched_at': datetime.now()
+        }
+
+    @staticmethod
+    def _slice_history(entry: Dict, days: int) -> pd.DataFrame:
+        """从缓存的较长历史数据中截取最近days天（与直接下载days天的日期范围一致）"""
+        if entry['days'] == days:
+            return entry['data']
+        start = np.datetime64((entry['fetched_at'] - timedelta(days=days)).date())
+        position = int(np.searchsorted(entry['dates'], start, side='left'))
+        return entry['data'].iloc[position:].reset_index(drop=True)
+
+    def save_snapshot(self, path: str):
+        """将缓存保存到文件，下次启动时用load_snapshot预热"""
         try:
-            # 计算开始日期
-            end_date = datetime.now().strftime('%Y%m%d')
-            start_date = (datetime.now() - timedelta(days=int(period))).strftime('%Y%m%d')
-            
-            # 获取历史数据
-            df = ak.stock_zh_a_hist(
-                symbol=stock_code,
-                period="daily",
-                start_date=start_date,
-                end_date=end_date,
-                adjust=adjust
-            )
-            
-            if df.empty:
-                logger.warning(f"股票 {stock_code} 历史数据为空")
-                return pd.DataFrame()
-            
-            # 重命名列
-            df = df.rename(columns={
-                '日期': 'date',
-                '开盘': 'open',
-                '收盘': 'close',
-                '最高': 'high',
-                '最低': 'low',
-                '成交量': 'volume',
-                '成交额': 'amount'
-            })
-            
-            # 确保数据类型正确
-            numeric_columns = ['open', 'close', 'high', 'low', 'volume']
-            for col in numeric_columns:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            # 按日期排序
-            df = df.sort_values('date').reset_index(drop=True)
-            
-            # 缓存结果
-            self.cache[cache_key] = {
-                'data': df,
-                'timestamp': time.time()
-            }
-            
-            logger.info(f"获取股票 {stock_code} 历史数据成功，共 {len(df)} 条记录")
-            return df
-            
+            count = self.cache.dump(path)
+            logger.info(f"已保存缓存快照 {path}，共 {count} 条")
         except Exception as e:
-            logger.error(f"获取股票 {stock_code} 历史数据失败: {e}")
-            return pd.DataFrame()
-    
+            logger.warning(f"保存缓存快照失败: {e}")
+
+    def load_snapshot(self, path: str) -> int:
+        """从文件恢复未过期的缓存（文件不存在或损坏时忽略），返回恢复的条目数"""
+        if not os.path.exists(path):
+            return 0
+        try:
+            count = self.cache.load(path)
+        except Exception as e:
+            logger.warning(f"加载缓存快照失败: {e}")
+            return 0
+        logger.info(f"已从缓存快照 {path} 恢复 {count} 条")
+        return count
+
     def get_market_status(self) -> Dict:
         """
         获取市场状态
@@ -211,5 +524,102 @@ class StockDataProvider:
             }
 
 
+class AsyncStockDataProvider:
+    """
+    异步股票数据提供者
+
+    同步的akshare下载和pandas计算放到有界线程池中执行，事件循环只负责调度；
+    数据请求和计算任务分别限制并发数，避免同时向数据源发起过多请求；
+    参数相同的并发请求共用一个任务，不重复占用线程和并发名额
+    """
+
+    def __init__(self, provider: StockDataProvider, max_data_concurrency: int = 8,
+                 max_compute_concurrency: int = 2):
+        """
+        Args:
+            provider: 同步数据提供者
+            max_data_concurrency: 同时进行的数据请求数
+            max_compute_concurrency: 同时进行的计算任务数
+        """
+        self.provider = provider
+        self.max_data_concurrency = max_data_concurrency
+        self.max_compute_concurrency = max_compute_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_data_concurrency + max_compute_concurrency,
+            thread_name_prefix="stock-data"
+        )
+        # 信号量在首次使用时创建，绑定到实际运行的事件循环
+        self._data_semaphore: Optional[asyncio.Semaphore] = None
+        self._compute_semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+
+    async def _run(self, semaphore: asyncio.Semaphore, func: Callable, *args) -> Any:
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _run_data(self, func: Callable, *args) -> Any:
+        if self._data_semaphore is None:
+            self._data_semaphore = asyncio.Semaphore(self.max_data_concurrency)
+        return await self._run(self._data_semaphore, func, *args)
+
+    async def _shared(self, key: Tuple, func: Callable, *args) -> Any:
+        """参数相同的并发请求等待同一个任务；单个调用方被取消不影响其他调用方"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run_data(func, *args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def run_compute(self, func: Callable, *args) -> Any:
+        """
+        在线程池中执行计算任务（如技术分析）
+
+        Args:
+            func: 同步计算函数
+            *args: 函数参数
+        """
+        if self._compute_semaphore is None:
+            self._compute_semaphore = asyncio.Semaphore(self.max_compute_concurrency)
+        return await self._run(self._compute_semaphore, func, *args)
+
+    async def get_stock_info(self, stock_code: str) -> Dict:
+        """获取股票基本信息，参数与返回值同StockDataProvider.get_stock_info"""
+        return await self._shared(('info', stock_code),
+                                  self.provider.get_stock_info, stock_code)
+
+    async def get_quotes(self, stock_codes: List[str],
+                         max_age: Optional[float] = None) -> Dict[str, Dict]:
+        """从同一份行情快照中获取多只股票的实时价格，参数与返回值同StockDataProvider.get_quotes"""
+        return await self._run_data(self.provider.get_quotes, stock_codes, max_age)
+
+    async def get_stock_history(self, stock_code: str, period: str = "30",
+                                adjust: str = "qfq") -> pd.DataFrame:
+        """获取股票历史数据，参数与返回值同StockDataProvider.get_stock_history"""
+        return await self._shared(('history', stock_code, period, adjust),
+                                  self.provider.get_stock_history,
+                                  stock_code, period, adjust)
+
+    async def get_history_range(self, stock_code: str,
+                                start_date: Optional[str] = None,
+                                end_date: Optional[str] = None,
+                                limit: Optional[int] = None,
+                                adjust: str = "qfq") -> Dict:
+        """按日期范围分页获取历史数据，参数与返回值同StockDataProvider.get_history_range"""
+        key = ('history_range', stock_code, start_date, end_date, limit, adjust)
+        return await self._shared(key, self.provider.get_history_range,
+                                  stock_code, start_date, end_date, limit, adjust)
+
+    async def get_market_status(self) -> Dict:
+        """获取市场状态（只读本地时间，直接执行）"""
+        return self.provider.get_market_status()
+
+    def shutdown(self):
+        """关闭线程池"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
 # 全局数据提供者实例
 stock_data_provider = StockDataProvider()
+async_stock_data_provider = AsyncStockDataProvider(stock_data_provider)
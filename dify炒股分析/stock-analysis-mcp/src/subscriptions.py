@@ -0,0 +1,197 @@
+"""
+股票资源订阅
+提供 stock://A/<代码>/quote（实时行情）和 stock://A/<代码>/indicators（技术指标）两类MCP资源；
+一个后台任务按固定间隔统一刷新所有被订阅的资源，内容确实变化时才向订阅的会话发送更新通知
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Set, Tuple
+from loguru import logger
+
+from .backend import LazyBackend
+from .utils import to_json_value, validate_stock_code
+
+RESOURCE_SCHEME = "stock"
+RESOURCE_MARKET = "A"
+RESOURCE_KINDS = ("quote", "indicators")
+
+# 技术指标资源使用的历史数据天数
+INDICATOR_PERIOD = "60"
+
+
+def resource_uri(stock_code: str, kind: str) -> str:
+    """生成资源URI，如 stock://A/600519/quote"""
+    return f"{RESOURCE_SCHEME}://{RESOURCE_MARKET}/{stock_code}/{kind}"
+
+
+def parse_resource_uri(uri: Any) -> Tuple[str, str]:
+    """
+    解析资源URI
+
+    Returns:
+        Tuple[str, str]: (股票代码, 资源类型)
+
+    Raises:
+        ValueError: 不是受支持的股票资源URI
+    """
+    text = str(uri)
+    prefix = f"{RESOURCE_SCHEME}://{RESOURCE_MARKET}/"
+    if not text.startswith(prefix):
+        raise ValueError(f"不支持的资源: {text}")
+    parts = text[len(prefix):].split("/")
+    if (len(parts) != 2 or parts[1] not in RESOURCE_KINDS
+            or not validate_stock_code(parts[0])):
+        raise ValueError(f"不支持的资源: {text}")
+    return parts[0], parts[1]
+
+
+class ResourceWatcher:
+    """
+    资源订阅管理
+
+    订阅时读取一次当前内容作为基准；刷新任务只在存在订阅时运行，
+    每轮所有行情资源共用一份行情快照，技术指标按股票并行计算
+    """
+
+    def __init__(self, backend: LazyBackend, interval: float = 30.0):
+        """
+        Args:
+            backend: 数据与分析模块
+            interval: 刷新间隔（秒）
+        """
+        self.backend = backend
+        self.interval = interval
+        self._subscribers: Dict[str, Set[Any]] = {}
+        self._contents: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def uris(self) -> List[str]:
+        """当前被订阅的资源"""
+        return sorted(self._subscribers)
+
+    async def read(self, uri: Any) -> str:
+        """读取资源内容（JSON文本）；已订阅的资源直接返回最近一次刷新的内容"""
+        stock_code, kind = parse_resource_uri(uri)
+        key = resource_uri(stock_code, kind)
+        if key in self._contents:
+            return self._contents[key]
+        if kind == "quote":
+            backend = await self.backend.get()
+            quotes = await backend.provider.get_quotes([stock_code])
+            return self._render(quotes[stock_code])
+        return self._render(await self._load_indicators(stock_code))
+
+    async def subscribe(self, uri: Any, session: Any):
+        """订阅资源，并在需要时启动刷新任务"""
+        parse_resource_uri(uri)
+        key = str(uri)
+        if key not in self._contents:
+            self._contents[key] = await self.read(key)
+        self._subscribers.setdefault(key, set()).add(session)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def unsubscribe(self, uri: Any, session: Any):
+        """取消订阅，资源没有订阅者后不再刷新"""
+        key = str(uri)
+        sessions = self._subscribers.get(key)
+        if sessions is None:
+            return
+        sessions.discard(session)
+        if not sessions:
+            del self._subscribers[key]
+            self._contents.pop(key, None)
+
+    async def stop(self):
+        """停止刷新任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while self._subscribers:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"刷新订阅资源失败: {e}")
+
+    async def refresh(self) -> List[str]:
+        """
+        刷新所有被订阅的资源，向内容有变化的资源的订阅者发送通知
+
+        Returns:
+            List[str]: 内容有变化的资源
+        """
+        targets = [(uri, *parse_resource_uri(uri)) for uri in self.uris]
+        quote_codes = [code for _, code, kind in targets if kind == "quote"]
+        indicator_targets = [(uri, code) for uri, code, kind in targets
+                             if kind == "indicators"]
+
+        async def load_quotes() -> Dict[str, Dict]:
+            if not quote_codes:
+                return {}
+            # 行情快照不超过一个刷新间隔，否则缓存期内的价格变化要等缓存过期才能发现
+            backend = await self.backend.get()
+            return await backend.provider.get_quotes(quote_codes, max_age=self.interval)
+
+        quotes, *indicators = await asyncio.gather(
+            load_quotes(),
+            *(self._load_indicators(code) for _, code in indicator_targets),
+            return_exceptions=True
+        )
+
+        updates: Dict[str, Any] = {}
+        if isinstance(quotes, Exception):
+            logger.warning(f"刷新实时行情失败: {quotes}")
+        else:
+            updates.update({uri: quotes[code] for uri, code, kind in targets
+                            if kind == "quote"})
+        for (uri, code), result in zip(indicator_targets, indicators):
+            if isinstance(result, Exception) or 'error' in result:
+                logger.warning(f"刷新股票 {code} 技术指标失败: {result}")
+                continue
+            updates[uri] = result
+
+        changed = []
+        for uri, data in updates.items():
+            content = self._render(data)
+            # 刷新期间可能已取消订阅
+            if uri not in self._subscribers or self._contents.get(uri) == content:
+                continue
+            self._contents[uri] = content
+            changed.append(uri)
+            await self._notify(uri)
+        return changed
+
+    async def _load_indicators(self, stock_code: str) -> Dict[str, Any]:
+        backend = await self.backend.get()
+        df = await backend.provider.get_stock_history(stock_code, INDICATOR_PERIOD)
+        if df.empty:
+            return {'code': stock_code, 'error': '无历史数据'}
+        analysis = await backend.provider.run_compute(
+            backend.analyzer.comprehensive_analysis, df
+        )
+        date = str(df['date'].iloc[-1]) if 'date' in df.columns else None
+        return {'code': stock_code, 'date': date, **analysis}
+
+    @staticmethod
+    def _render(data: Dict[str, Any]) -> str:
+        # 浮点数保留4位小数，避免计算误差触发无意义的更新
+        return json.dumps(to_json_value(data), ensure_ascii=False, sort_keys=True)
+
+    async def _notify(self, uri: str):
+        """通知订阅者资源已更新，发送失败的会话（客户端已断开）移除其全部订阅"""
+        for session in list(self._subscribers.get(uri, ())):
+            try:
+                await session.send_resource_updated(uri)
+            except Exception as e:
+                logger.info(f"会话已断开，移除订阅: {e}")
+                for subscribed in list(self._subscribers):
+                    self.unsubscribe(subscribed, session)
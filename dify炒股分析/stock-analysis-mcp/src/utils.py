@@ -3,7 +3,8 @@
 """
 
 import re
-from typing import Optional, Tuple
+import math
+from typing import Any, Optional, Tuple
 from datetime import datetime, timedelta
 
 
@@ -88,7 +89,7 @@ def format_number(number: Optional[float], decimal_places: int = 2) -> str:
     Returns:
         格式化后的字符串
     """
-    if number is None:
+    if number is None or number != number:  # None或NaN
         return "N/A"
     
     try:
@@ -108,7 +109,7 @@ def format_percentage(number: Optional[float], decimal_places: int = 2) -> str:
     Returns:
         格式化后的百分比字符串
     """
-    if number is None:
+    if number is None or number != number:  # None或NaN
         return "N/A"
     
     try:
@@ -127,7 +128,7 @@ def format_volume(volume: Optional[float]) -> str:
     Returns:
         格式化后的成交量字符串
     """
-    if volume is None:
+    if volume is None or volume != volume:  # None或NaN
         return "N/A"
     
     try:
@@ -141,6 +142,34 @@ def format_volume(volume: Optional[float]) -> str:
         return "N/A"
 
 
+def to_json_value(value: Any, decimal_places: int = 4) -> Any:
+    """
+    转换为紧凑的可JSON序列化的值
+    
+    numpy标量转为Python数值，浮点数保留decimal_places位小数，NaN和无穷大转为None
+    
+    Args:
+        value: 要转换的值（可嵌套dict、list）
+        decimal_places: 浮点数保留的小数位数
+        
+    Returns:
+        转换后的值
+    """
+    if isinstance(value, dict):
+        return {key: to_json_value(item, decimal_places) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(item, decimal_places) for item in value]
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            return None
+        return round(value, decimal_places)
+    if hasattr(value, "item"):  # numpy标量
+        return to_json_value(value.item(), decimal_places)
+    return value
+
+
 def get_trading_days(start_date: datetime, end_date: datetime) -> int:
     """
     计算交易日天数（简单计算，不考虑节假日）
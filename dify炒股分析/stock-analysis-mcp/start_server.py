@@ -12,16 +12,17 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 from src.server import main
 
 if __name__ == "__main__":
-    print("🚀 启动股票分析MCP服务器...")
-    print("📝 服务器将通过stdio与Claude Desktop通信")
-    print("🔧 请确保在Claude Desktop中正确配置了MCP服务器")
-    print("=" * 50)
+    # stdout用于MCP协议通信，提示信息输出到stderr
+    print("🚀 启动股票分析MCP服务器...", file=sys.stderr)
+    print("📝 服务器将通过stdio与Claude Desktop通信", file=sys.stderr)
+    print("🔧 请确保在Claude Desktop中正确配置了MCP服务器", file=sys.stderr)
+    print("=" * 50, file=sys.stderr)
     
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        print("\n👋 服务器已停止")
+        print("\n👋 服务器已停止", file=sys.stderr)
     except Exception as e:
-        print(f"\n❌ 服务器启动失败: {e}")
+        print(f"\n❌ 服务器启动失败: {e}", file=sys.stderr)
         import traceback
         traceback.print_exc()
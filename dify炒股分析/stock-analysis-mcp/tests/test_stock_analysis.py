@@ -3,6 +3,8 @@
 """
 
 import pytest
+import asyncio
+import time
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -12,7 +14,7 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from stock_data import StockDataProvider
+from stock_data import StockDataProvider, AsyncStockDataProvider
 from technical_analysis import TechnicalAnalyzer
 from utils import validate_stock_code, normalize_stock_code, get_market_from_code
 
@@ -54,6 +56,497 @@ class TestStockDataProvider:
         assert 'market_status' in status
 
 
+class _SlowProvider:
+    """模拟下载耗时的同步数据提供者"""
+
+    delay = 0.1
+
+    def get_stock_info(self, stock_code):
+        time.sleep(self.delay)
+        return {'code': stock_code}
+
+    def get_stock_history(self, stock_code, period, adjust):
+        time.sleep(self.delay)
+        return pd.DataFrame({'close': [1.0] * int(period)})
+
+
+class TestAsyncStockDataProvider:
+    """测试异步数据提供者"""
+
+    def test_calls_run_in_parallel(self):
+        """多个请求在线程池中并行执行"""
+        provider = AsyncStockDataProvider(_SlowProvider(), max_data_concurrency=4)
+
+        async def run():
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                *(provider.get_stock_info(f"00000{i}") for i in range(4))
+            )
+            return results, time.perf_counter() - start
+
+        results, elapsed = asyncio.run(run())
+        provider.shutdown()
+
+        assert [result['code'] for result in results] == [f"00000{i}" for i in range(4)]
+        assert elapsed < _SlowProvider.delay * 3
+
+    def test_concurrency_limit(self):
+        """同时进行的数据请求数不超过上限"""
+        provider = AsyncStockDataProvider(_SlowProvider(), max_data_concurrency=2)
+
+        async def run():
+            start = time.perf_counter()
+            await asyncio.gather(
+                *(provider.get_stock_history(f"00000{i}", "5") for i in range(4))
+            )
+            return time.perf_counter() - start
+
+        elapsed = asyncio.run(run())
+        provider.shutdown()
+
+        assert elapsed >= _SlowProvider.delay * 2 * 0.9
+
+    def test_duplicate_requests_share_one_call(self):
+        """参数相同的并发请求只执行一次"""
+        slow = _SlowProvider()
+        calls = []
+        original = slow.get_stock_info
+        slow.get_stock_info = (
+            lambda stock_code: calls.append(stock_code) or original(stock_code)
+        )
+        provider = AsyncStockDataProvider(slow)
+
+        async def run():
+            return await asyncio.gather(
+                *(provider.get_stock_info("000001") for _ in range(5))
+            )
+
+        results = asyncio.run(run())
+        provider.shutdown()
+
+        assert calls == ["000001"]
+        assert all(result['code'] == "000001" for result in results)
+
+    def test_event_loop_not_blocked(self):
+        """数据下载期间事件循环仍能调度其他任务"""
+        provider = AsyncStockDataProvider(_SlowProvider())
+
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            await provider.get_stock_info("000001")
+            task.cancel()
+            return ticks
+
+        ticks = asyncio.run(run())
+        provider.shutdown()
+
+        assert ticks >= 3
+
+
+def _fake_hist(calls):
+    """按请求的日期范围生成日线数据的stock_zh_a_hist替身"""
+    def fake(symbol, period, start_date, end_date, adjust):
+        calls.append((symbol, start_date))
+        time.sleep(0.05)
+        dates = pd.date_range(start_date, end_date, freq='D')
+        close = np.linspace(10, 12, len(dates))
+        return pd.DataFrame({
+            '日期': dates.date, '开盘': close, '收盘': close, '最高': close, '最低': close,
+            '成交量': np.full(len(dates), 1000.0), '成交额': close * 1000
+        })
+    return fake
+
+
+class TestHistoryCache:
+    """测试历史数据缓存"""
+
+    def test_shorter_period_sliced_from_cache(self, monkeypatch):
+        """较短周期从已缓存的较长历史中截取，与直接下载的日期范围一致"""
+        import stock_data
+
+        calls = []
+        monkeypatch.setattr(stock_data.ak, 'stock_zh_a_hist', _fake_hist(calls))
+        provider = StockDataProvider(history_min_days=60)
+
+        df60 = provider.get_stock_history("000001", "60")
+        df30 = provider.get_stock_history("000001", "30")
+        df10 = provider.get_stock_history("000001", "10")
+
+        assert len(calls) == 1
+        assert len(df60) == 61
+        assert len(df30) == 31 and df30['date'].iloc[-1] == df60['date'].iloc[-1]
+        assert len(df10) == 11
+
+        # 更长的周期需要重新下载
+        provider.get_stock_history("000001", "90")
+        assert len(calls) == 2
+
+    def test_concurrent_requests_download_once(self, monkeypatch):
+        """多个线程同时请求同一股票时只下载一次"""
+        import stock_data
+        from concurrent.futures import ThreadPoolExecutor
+
+        calls = []
+        monkeypatch.setattr(stock_data.ak, 'stock_zh_a_hist', _fake_hist(calls))
+        provider = StockDataProvider()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            frames = list(executor.map(
+                lambda period: provider.get_stock_history("000001", period),
+                ["30", "60", "30", "20"]
+            ))
+
+        assert len(calls) == 1
+        assert [len(df) for df in frames] == [31, 61, 31, 21]
+
+    def test_history_range_pages(self, monkeypatch):
+        """按日期范围分页：各页首尾相接、覆盖整个范围，十年数据只下载一次"""
+        import stock_data
+
+        calls = []
+        monkeypatch.setattr(stock_data.ak, 'stock_zh_a_hist', _fake_hist(calls))
+        provider = StockDataProvider()
+        start = (datetime.now() - timedelta(days=3650)).strftime('%Y-%m-%d')
+
+        pages, cursor = [], start
+        while cursor is not None:
+            page = provider.get_history_range("000001", cursor, limit=1000)
+            assert len(page['data']) <= 1000
+            pages.append(page)
+            cursor = page['next_cursor']
+
+        combined = pd.concat([page['data'] for page in pages], ignore_index=True)
+        assert len(calls) == 1
+        assert len(pages) == 4
+        assert len(combined) == pages[0]['total'] == 3651
+        assert combined['date'].is_unique and combined['date'].is_monotonic_increasing
+
+        window = provider.get_history_range(
+            "000001", combined['date'].iloc[10], combined['date'].iloc[19]
+        )
+        assert list(window['data']['date']) == list(combined['date'].iloc[10:20])
+        assert window['next_cursor'] is None
+
+    def test_lru_is_bounded(self):
+        """缓存条目数不超过上限，淘汰最久未使用的条目"""
+        from stock_data import LRUCache
+
+        cache = LRUCache(max_entries=3, ttl=60)
+        for i in range(3):
+            cache.set(f"k{i}", i)
+        cache.get("k0")
+        cache.set("k3", 3)
+
+        assert len(cache) == 3
+        assert cache.get("k1") is None
+        assert cache.get("k0") == 0
+        assert cache.evictions == 1
+
+    def test_snapshot_round_trip(self, tmp_path):
+        """缓存快照保留写入时间，恢复时丢弃已过期的条目"""
+        from stock_data import LRUCache
+
+        path = str(tmp_path / "cache.pkl")
+        cache = LRUCache(max_entries=10, ttl=60)
+        cache.set("fresh", pd.DataFrame({'close': [1.0, 2.0]}))
+        cache.set("stale", 1)
+        cache._data["stale"] = (time.time() - 120, 1)
+        assert cache.dump(path) == 1
+
+        restored = LRUCache(max_entries=10, ttl=60)
+        assert restored.load(path) == 1
+        assert restored.get("fresh")['close'].tolist() == [1.0, 2.0]
+        assert restored._data["fresh"][0] == cache._data["fresh"][0]
+        assert restored.get("stale") is None
+
+
+class TestFixtureReplay:
+    """测试录制回放（使用主应用的录制回放实现，录制合成行情，不访问网络）"""
+
+    def setup_method(self):
+        import stock_data
+
+        if stock_data.APP_ROOT not in sys.path:
+            sys.path.append(stock_data.APP_ROOT)
+
+    def test_record_then_replay(self, tmp_path, monkeypatch):
+        """录制后回放得到相同的数据，调用的接口和次数一致"""
+        import stock_data
+        from services.fixture_source import FixtureRecorder, FixtureReplayer
+        from services.synthetic_market import SyntheticMarket
+
+        recorder = FixtureRecorder(SyntheticMarket(seed=7), str(tmp_path))
+        monkeypatch.setattr(stock_data, 'ak', recorder)
+        recorded = StockDataProvider().get_stock_history("600001", "60")
+        recorded_info = StockDataProvider().get_stock_info("600001")
+
+        replayer = FixtureReplayer(str(tmp_path), latency_ms=0)
+        monkeypatch.setattr(stock_data, 'ak', replayer)
+        replayed = StockDataProvider().get_stock_history("600001", "60")
+        replayed_info = StockDataProvider().get_stock_info("600001")
+
+        assert len(recorded) > 20
+        pd.testing.assert_frame_equal(recorded, replayed)
+        assert replayed_info == recorded_info
+        assert replayer.calls == recorder.calls
+        assert set(recorder.calls) == {
+            'stock_zh_a_hist', 'stock_individual_info_em', 'stock_zh_a_spot_em'
+        }
+
+    def test_missing_fixture_not_retried(self, tmp_path, monkeypatch):
+        """没有夹具时抛出FixtureNotFoundError，数据获取只查找一次、不重试"""
+        import stock_data
+        from services.fixture_source import FixtureNotFoundError, FixtureReplayer
+
+        replayer = FixtureReplayer(str(tmp_path), latency_ms=0)
+        with pytest.raises(FixtureNotFoundError, match="未找到"):
+            replayer.stock_zh_a_hist(symbol="600001", period="daily",
+                                     start_date="20240101", end_date="20240301",
+                                     adjust="")
+
+        monkeypatch.setattr(stock_data, 'ak', replayer)
+        assert StockDataProvider().get_stock_history("600001", "60").empty
+        assert replayer.misses == {'stock_zh_a_hist': 2}
+        assert not replayer.calls
+
+
+class TestSpotQuotes:
+    """测试基于行情快照的批量报价"""
+
+    def test_quotes_share_one_snapshot(self, monkeypatch):
+        """多次获取报价只下载一次行情快照，快照中没有或停牌的股票价格为None"""
+        import stock_data
+
+        calls = []
+
+        def fake_spot():
+            calls.append(1)
+            return pd.DataFrame({
+                '代码': ['000001', '600519'],
+                '名称': ['平安银行', '贵州茅台'],
+                '最新价': [10.5, np.nan],
+                '涨跌额': [0.1, np.nan],
+                '涨跌幅': [0.96, np.nan]
+            })
+
+        monkeypatch.setattr(stock_data.ak, 'stock_zh_a_spot_em', fake_spot)
+        provider = StockDataProvider()
+
+        quotes = provider.get_quotes(['000001', '600519', '000002'])
+        provider.get_quotes(['000001'])
+
+        assert len(calls) == 1
+        assert quotes['000001']['name'] == '平安银行'
+        assert quotes['000001']['current_price'] == 10.5
+        assert quotes['600519']['current_price'] is None
+        assert quotes['000002']['name'] == '股票000002'
+
+
+class TestAnalyzeStocksTool:
+    """测试批量分析工具"""
+
+    def test_analyze_stocks_table(self, monkeypatch):
+        """批量分析并行获取历史数据并输出对比表"""
+        from mcp.shared.memory import create_connected_server_and_client_session
+        from src import stock_data as server_stock_data
+        from src.server import StockAnalysisServer
+
+        class FakeProvider(_SlowProvider):
+            def get_quotes(self, stock_codes, max_age=None):
+                time.sleep(self.delay)
+                return {code: {'code': code, 'name': f"测试{code}", 'current_price': 12.0,
+                               'change_percent': 1.5} for code in stock_codes}
+
+            def get_stock_history(self, stock_code, period, adjust):
+                time.sleep(self.delay)
+                close = np.linspace(10, 12, int(period))
+                return pd.DataFrame(
+                    {'close': close, 'high': close * 1.01, 'low': close * 0.99}
+                )
+
+        monkeypatch.setattr(
+            server_stock_data.async_stock_data_provider, 'provider', FakeProvider()
+        )
+        codes = ['000001', '000002', '600000', '600519']
+
+        async def run():
+            server = StockAnalysisServer().server
+            async with create_connected_server_and_client_session(server) as client:
+                start = time.perf_counter()
+                result = await client.call_tool(
+                    "analyze_stocks", {"stock_codes": codes, "period": "30"}
+                )
+                return result, time.perf_counter() - start
+
+        result, elapsed = asyncio.run(run())
+        text = result.content[0].text
+
+        assert not result.isError
+        for code in codes:
+            assert f"| {code} | 测试{code} | 12.00 | 1.50% |" in text
+        # 4只股票的报价和历史数据并行获取
+        assert elapsed < FakeProvider.delay * 4
+
+
+class TestStructuredOutput:
+    """测试工具的结构化输出"""
+
+    def test_analyze_stock_output_modes(self, monkeypatch):
+        """价格缺失、数据不足以计算MA60时仍能生成报告；三种形式的结构化数据一致，brief和json更短"""
+        import json
+        from mcp.shared.memory import create_connected_server_and_client_session
+        from src import stock_data as server_stock_data
+        from src.server import StockAnalysisServer
+
+        class FakeProvider(_SlowProvider):
+            delay = 0
+
+            def get_stock_info(self, stock_code):
+                # 停牌或行情获取失败时价格为None
+                return {'code': stock_code, 'name': f"测试{stock_code}", 'market': 'A',
+                        'current_price': None, 'change': None, 'change_percent': None}
+
+            def get_stock_history(self, stock_code, period, adjust):
+                close = np.linspace(10, 12, int(period))
+                return pd.DataFrame(
+                    {'close': close, 'high': close * 1.01, 'low': close * 0.99}
+                )
+
+        monkeypatch.setattr(
+            server_stock_data.async_stock_data_provider, 'provider', FakeProvider()
+        )
+
+        async def run():
+            server = StockAnalysisServer().server
+            async with create_connected_server_and_client_session(server) as client:
+                return {
+                    output: await client.call_tool(
+                        "analyze_stock", {"stock_code": "600519", "output": output}
+                    )
+                    for output in ("full", "brief", "json")
+                }
+
+        results = asyncio.run(run())
+
+        for result in results.values():
+            assert not result.isError
+            assert result.structuredContent == results["full"].structuredContent
+        data = results["full"].structuredContent
+        assert data['price'] is None and data['ma']['60'] is None
+        assert data['ma']['20'] is not None
+        assert "当前价格: N/A 元" in results["full"].content[0].text
+        assert "MA60: N/A 元" in results["full"].content[0].text
+        assert json.loads(results["json"].content[0].text) == data
+        sizes = {output: len(result.content[0].text.encode())
+                 for output, result in results.items()}
+        assert sizes["brief"] < sizes["json"] < sizes["full"]
+
+
+class TestResourceSubscriptions:
+    """测试股票资源订阅"""
+
+    def test_notify_only_on_change(self, monkeypatch):
+        """订阅后由刷新任务统一更新，只有内容变化的资源发送通知"""
+        import json
+        from mcp import types
+        from pydantic import AnyUrl
+        from mcp.shared.memory import create_connected_server_and_client_session
+        from src import stock_data as server_stock_data
+        from src.server import StockAnalysisServer
+
+        class FakeProvider(_SlowProvider):
+            delay = 0
+            prices = {'600519': 1500.0, '000001': 10.0}
+            quote_calls = []
+
+            def get_quotes(self, stock_codes, max_age=None):
+                self.quote_calls.append(list(stock_codes))
+                return {
+                    code: {'code': code, 'name': f"测试{code}",
+                           'current_price': self.prices[code]}
+                    for code in stock_codes
+                }
+
+            def get_stock_history(self, stock_code, period, adjust):
+                close = np.linspace(10, 12, int(period))
+                return pd.DataFrame({
+                    'date': pd.date_range('2024-01-01', periods=int(period)).date,
+                    'close': close, 'high': close * 1.01, 'low': close * 0.99
+                })
+
+        fake = FakeProvider()
+        monkeypatch.setattr(
+            server_stock_data.async_stock_data_provider, 'provider', fake
+        )
+        server = StockAnalysisServer()
+        server.watcher.interval = 3600  # 手动调用refresh
+        updated = []
+
+        async def on_message(message):
+            if isinstance(message, types.ServerNotification) and \
+                    isinstance(message.root, types.ResourceUpdatedNotification):
+                updated.append(str(message.root.params.uri))
+
+        async def run():
+            async with create_connected_server_and_client_session(
+                server.server, message_handler=on_message
+            ) as client:
+                quote = await client.read_resource(AnyUrl("stock://A/600519/quote"))
+                for uri in ("stock://A/600519/quote", "stock://A/000001/quote",
+                            "stock://A/600519/indicators"):
+                    await client.subscribe_resource(AnyUrl(uri))
+                listed = await client.list_resources()
+
+                fake.quote_calls.clear()
+                first = await server.watcher.refresh()
+                fake.prices['600519'] = 1510.0
+                second = await server.watcher.refresh()
+                await asyncio.sleep(0.05)
+                updated_quote = await client.read_resource(
+                    AnyUrl("stock://A/600519/quote")
+                )
+
+                await client.unsubscribe_resource(AnyUrl("stock://A/600519/quote"))
+                await server.watcher.stop()
+                return quote, listed, first, second, updated_quote
+
+        quote, listed, first, second, updated_quote = asyncio.run(run())
+
+        assert json.loads(quote.contents[0].text)['current_price'] == 1500.0
+        assert len(listed.resources) == 3
+        assert first == []
+        assert second == ["stock://A/600519/quote"]
+        assert updated == ["stock://A/600519/quote"]
+        assert json.loads(updated_quote.contents[0].text)['current_price'] == 1510.0
+        # 每轮刷新所有行情资源共用一次行情请求
+        assert sorted(map(sorted, fake.quote_calls)) == [
+            ['000001', '600519'], ['000001', '600519']
+        ]
+        assert server.watcher.uris == [
+            "stock://A/000001/quote", "stock://A/600519/indicators"
+        ]
+
+    def test_invalid_resource_uri(self):
+        """不支持的资源URI报错"""
+        from src.subscriptions import parse_resource_uri
+
+        assert parse_resource_uri("stock://A/600519/indicators") == (
+            "600519", "indicators"
+        )
+        for uri in ("stock://HK/00700/quote", "stock://A/abc/quote",
+                    "stock://A/600519/news"):
+            with pytest.raises(ValueError):
+                parse_resource_uri(uri)
+
+
 class TestTechnicalAnalyzer:
     """测试技术分析器"""
     
@@ -0,0 +1,117 @@
+"""
+准入控制测试
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.admission import (
+    AdmissionController, AdmissionRejected, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+)
+
+
+async def _settle():
+    """让已创建的任务运行到各自的等待点"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestAdmissionController:
+    """测试准入控制器"""
+
+    def test_timeout_after_handover_does_not_leak(self, monkeypatch):
+        """名额移交与排队超时在同一轮事件循环中发生时，等待者保留名额，归还后in_flight回到0"""
+        controller = AdmissionController(max_in_flight=1, max_queue=4, max_wait=1.0)
+        original_wait_for = asyncio.wait_for
+
+        async def handover_then_timeout(waiter, timeout):
+            # 持有者归还名额（移交给等待者）后，超时才被处理
+            controller.release(0.01)
+            await asyncio.sleep(0)
+            raise asyncio.TimeoutError
+
+        async def run():
+            await controller.acquire()
+            monkeypatch.setattr(asyncio, 'wait_for', handover_then_timeout)
+            try:
+                await controller.acquire()
+            finally:
+                monkeypatch.setattr(asyncio, 'wait_for', original_wait_for)
+            in_flight_while_running = controller.in_flight
+            controller.release(0.01)
+            return in_flight_while_running
+
+        assert asyncio.run(run()) == 1
+        assert controller.in_flight == 0
+        assert controller.queued == 0
+        assert controller.admitted == 2
+
+    def test_interactive_sheds_newest_batch_waiter(self):
+        """队列已满时交互请求挤出最晚入队的批量请求，并先于其余批量请求获得名额"""
+        controller = AdmissionController(max_in_flight=1, max_queue=2, max_wait=1.0,
+                                         batch_queue_ratio=1.0)
+        order = []
+
+        async def one(name, priority):
+            async with controller.admit(priority):
+                order.append(name)
+
+        async def run():
+            await controller.acquire()
+            first = asyncio.create_task(one("batch-1", PRIORITY_BATCH))
+            await _settle()
+            newest = asyncio.create_task(one("batch-2", PRIORITY_BATCH))
+            await _settle()
+            interactive = asyncio.create_task(one("interactive", PRIORITY_INTERACTIVE))
+            await _settle()
+
+            with pytest.raises(AdmissionRejected) as shed:
+                await newest
+            assert not first.done()
+
+            controller.release(0.01)
+            await asyncio.gather(first, interactive)
+            return shed.value
+
+        rejected = asyncio.run(run())
+
+        assert rejected.reason == "shed"
+        assert order == ["interactive", "batch-1"]
+        assert controller.in_flight == 0
+        assert controller.queued == 0
+
+    def test_check_rejects_batch_at_queue_limit(self):
+        """批量请求排队数达到batch_queue_limit后check拒绝批量请求，交互请求不受影响"""
+        controller = AdmissionController(max_in_flight=1, max_queue=8, max_wait=1.0,
+                                         batch_queue_ratio=0.25)
+        assert controller.batch_queue_limit == 2
+
+        async def run():
+            await controller.acquire()
+            waiters = []
+            for _ in range(controller.batch_queue_limit):
+                # 未达到上限前不拒绝
+                controller.check(PRIORITY_BATCH)
+                waiters.append(asyncio.create_task(controller.acquire(PRIORITY_BATCH)))
+                await _settle()
+
+            with pytest.raises(AdmissionRejected) as rejected:
+                controller.check(PRIORITY_BATCH)
+            controller.check(PRIORITY_INTERACTIVE)
+
+            for _ in range(len(waiters) + 1):
+                controller.release(0.01)
+                await _settle()
+            await asyncio.gather(*waiters)
+            return rejected.value
+
+        rejected = asyncio.run(run())
+
+        assert rejected.reason == "queue_full"
+        assert rejected.retry_after_header == "1"
+        assert controller.in_flight == 0
@@ -0,0 +1,77 @@
+"""
+请求频率限制测试
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.rate_limiter import _gcra
+
+
+LIMIT = 5
+WINDOW = 10.0
+INTERVAL = WINDOW / LIMIT
+
+
+def _burst(now: float, count: int, tat=None):
+    """在同一时刻连续发送count个请求，返回各次结果和最后保存的TAT"""
+    results = []
+    for _ in range(count):
+        result, new_tat = _gcra(tat, now, LIMIT, WINDOW)
+        results.append(result)
+        if new_tat is not None:
+            tat = new_tat
+    return results, tat
+
+
+class TestGCRA:
+    """测试GCRA判断"""
+
+    def test_first_request(self):
+        """首次请求放行，剩余limit-1个，配额在一个间隔后恢复"""
+        result, tat = _gcra(None, 100.0, LIMIT, WINDOW)
+
+        assert result.allowed
+        assert result.remaining == LIMIT - 1
+        assert result.retry_after == 0.0
+        assert result.reset_after == pytest.approx(INTERVAL)
+        assert tat == pytest.approx(100.0 + INTERVAL)
+
+    def test_burst_boundary(self):
+        """同一时刻最多放行limit个请求，remaining逐个递减，第limit+1个被拒绝且不更新TAT"""
+        results, tat = _burst(100.0, LIMIT + 1)
+
+        assert [result.allowed for result in results] == [True] * LIMIT + [False]
+        assert [result.remaining for result in results] == [4, 3, 2, 1, 0, 0]
+        denied = results[-1]
+        assert denied.retry_after == pytest.approx(INTERVAL)
+        assert denied.reset_after == pytest.approx(WINDOW)
+        assert tat == pytest.approx(100.0 + WINDOW)
+
+    def test_allowed_exactly_at_retry_after(self):
+        """retry_after之前仍被拒绝，到达retry_after时正好放行一个请求"""
+        results, tat = _burst(100.0, LIMIT + 1)
+        retry_after = results[-1].retry_after
+
+        early, early_tat = _gcra(tat, 100.0 + retry_after - 0.001, LIMIT, WINDOW)
+        assert not early.allowed and early_tat is None
+
+        result, new_tat = _gcra(tat, 100.0 + retry_after, LIMIT, WINDOW)
+        assert result.allowed
+        assert result.remaining == 0
+        assert new_tat == pytest.approx(tat + INTERVAL)
+
+    def test_remaining_recovers_over_time(self):
+        """每经过一个间隔恢复一个配额，空闲一个窗口后与首次请求相同"""
+        _, tat = _burst(100.0, LIMIT)
+
+        half, _ = _gcra(tat, 100.0 + 2 * INTERVAL, LIMIT, WINDOW)
+        assert half.allowed and half.remaining == 1
+
+        idle, _ = _gcra(tat, 100.0 + 3 * WINDOW, LIMIT, WINDOW)
+        assert idle.allowed and idle.remaining == LIMIT - 1
+        assert idle.reset_after == pytest.approx(INTERVAL)
@@ -0,0 +1,227 @@
+"""
+准入控制
+限制同时执行的分析任务数，超出部分在有界队列中等待；预计等待时间超过上限或队列已满时立即拒绝（503 + Retry-After），
+避免上游变慢时请求堆积在线程池和重试等待中、直到客户端超时才被丢弃。
+交互请求优先于批量请求：空出的名额先分给交互请求，批量请求只能占用部分队列，队列满时交互请求可挤掉排队中的批量请求
+"""
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict
+
+from config import settings
+from utils.metrics import Counter, Gauge, Histogram, register_metric
+
+logger = logging.getLogger(__name__)
+
+# 请求优先级
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+
+admission_rejected = register_metric(Counter(
+    "admission_rejected_total",
+    "准入控制拒绝的请求数（reason: queue_full 队列已满, overloaded 预计等待超时, timeout 排队超时, shed 被交互请求挤出）",
+    labelnames=("priority", "reason")
+))
+admission_wait = register_metric(Histogram(
+    "admission_queue_wait_seconds",
+    "获得执行名额前的排队时间",
+    labelnames=("priority",)
+))
+
+
+class AdmissionRejected(Exception):
+    """准入控制拒绝请求"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Retry-After头部取值（整秒，至少1秒）"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class AdmissionController:
+    """
+    准入控制器
+
+    名额释放时直接交给下一个等待者（先交互、后批量，同优先级先到先得），
+    平均执行时间按指数加权移动平均估计，用于在入队前判断能否在max_wait内得到名额
+    """
+
+    def __init__(self, max_in_flight: int = 16, max_queue: int = 64, max_wait: float = 5.0,
+                 batch_queue_ratio: float = 0.25):
+        """
+        Args:
+            max_in_flight: 同时执行的任务数上限
+            max_queue: 排队任务数上限
+            max_wait: 最长排队时间（秒）
+            batch_queue_ratio: 批量请求最多占用的队列比例
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.batch_queue_limit = max(1, int(max_queue * batch_queue_ratio))
+        self.in_flight = 0
+        self.admitted = 0
+        self._service_time = 0.0
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {
+            PRIORITY_INTERACTIVE: deque(),
+            PRIORITY_BATCH: deque(),
+        }
+
+    @property
+    def queued(self) -> int:
+        """排队中的任务数"""
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def estimated_wait(self, position: int) -> float:
+        """队列中第position个（从1开始）等待者获得名额的预计时间（秒）"""
+        return position * self._service_time / self.max_in_flight
+
+    def _position(self, priority: str) -> int:
+        """新请求入队后的位置：交互请求排在所有批量请求之前"""
+        if priority == PRIORITY_INTERACTIVE:
+            return len(self._waiters[PRIORITY_INTERACTIVE]) + 1
+        return self.queued + 1
+
+    def check(self, priority: str):
+        """
+        判断当前能否接受该优先级的请求，不能时抛出AdmissionRejected
+
+        供批量接口在开始流式输出前提前拒绝，不占用名额
+        """
+        if self.in_flight < self.max_in_flight:
+            return
+        position = self._position(priority)
+        if priority == PRIORITY_BATCH and self.queued >= self.batch_queue_limit:
+            self._reject(priority, "queue_full")
+        if priority == PRIORITY_INTERACTIVE and self.queued >= self.max_queue \
+                and not self._waiters[PRIORITY_BATCH]:
+            self._reject(priority, "queue_full")
+        if self.estimated_wait(position) > self.max_wait:
+            self._reject(priority, "overloaded", position)
+
+    def _reject(self, priority: str, reason: str, position: int = 0):
+        admission_rejected.inc(priority=priority, reason=reason)
+        retry_after = self.estimated_wait(max(position, self.queued + 1))
+        raise AdmissionRejected(reason, retry_after)
+
+    async def acquire(self, priority: str = PRIORITY_INTERACTIVE):
+        """
+        获取执行名额
+
+        Raises:
+            AdmissionRejected: 队列已满、预计等待超过max_wait、排队超时或被交互请求挤出
+        """
+        if self.in_flight < self.max_in_flight and not self.queued:
+            self.in_flight += 1
+            self.admitted += 1
+            admission_wait.observe(0.0, priority=priority)
+            return
+
+        self.check(priority)
+        if priority == PRIORITY_INTERACTIVE and self.queued >= self.max_queue:
+            self._shed_batch()
+
+        start = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except asyncio.TimeoutError:
+            if not self._granted(waiter):
+                self._discard(priority, waiter)
+                self._reject(priority, "timeout")
+        except asyncio.CancelledError:
+            # 客户端断开：已分到的名额交给下一个等待者
+            if self._granted(waiter):
+                self._release_slot()
+            else:
+                self._discard(priority, waiter)
+            raise
+        self.admitted += 1
+        admission_wait.observe(time.monotonic() - start, priority=priority)
+
+    def release(self, duration: float):
+        """
+        归还执行名额
+
+        Args:
+            duration: 本次任务的执行耗时（秒），用于更新平均执行时间
+        """
+        self._service_time = duration if not self._service_time else 0.8 * self._service_time + 0.2 * duration
+        self._release_slot()
+
+    def _release_slot(self):
+        for priority in (PRIORITY_INTERACTIVE, PRIORITY_BATCH):
+            waiters = self._waiters[priority]
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    # 名额直接移交，in_flight不变
+                    waiter.set_result(None)
+                    return
+        self.in_flight -= 1
+
+    def _shed_batch(self):
+        """挤出最晚入队的批量请求，为交互请求腾出队列位置"""
+        waiters = self._waiters[PRIORITY_BATCH]
+        while waiters:
+            waiter = waiters.pop()
+            if not waiter.done():
+                admission_rejected.inc(priority=PRIORITY_BATCH, reason="shed")
+                waiter.set_exception(AdmissionRejected("shed", self.estimated_wait(self.queued + 1)))
+                return
+
+    def _discard(self, priority: str, waiter: asyncio.Future):
+        try:
+            self._waiters[priority].remove(waiter)
+        except ValueError:
+            pass
+
+    @staticmethod
+    def _granted(waiter: asyncio.Future) -> bool:
+        """等待者是否已分到名额（超时或取消与名额移交可能发生在同一轮事件循环中）"""
+        return waiter.done() and not waiter.cancelled() and waiter.exception() is None
+
+    @asynccontextmanager
+    async def admit(self, priority: str = PRIORITY_INTERACTIVE) -> AsyncIterator[None]:
+        """获取名额并在执行结束后归还"""
+        await self.acquire(priority)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def get_stats(self) -> dict:
+        """获取准入控制状态"""
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued_interactive": len(self._waiters[PRIORITY_INTERACTIVE]),
+            "queued_batch": len(self._waiters[PRIORITY_BATCH]),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "avg_service_seconds": round(self._service_time, 4)
+        }
+
+
+# 创建全局实例
+admission_controller = AdmissionController(
+    max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+    max_wait=settings.ADMISSION_MAX_WAIT,
+    batch_queue_ratio=settings.ADMISSION_BATCH_QUEUE_RATIO
+)
+register_metric(Gauge("admission_in_flight", "正在执行的分析任务数")) \
+    .set_function(lambda: {(): admission_controller.in_flight})
+register_metric(Gauge("admission_queued", "排队等待执行名额的任务数", labelnames=("priority",))) \
+    .set_function(lambda: {(priority,): len(waiters) for priority, waiters in admission_controller._waiters.items()})
@@ -64,6 +64,28 @@ def get_current_api_key(credentials: HTTPAuthorizationCredentials = Security(sec
     return verify_api_key(credentials)
 
 
+def get_admin_api_key(credentials: HTTPAuthorizationCredentials = Security(security)) -> str:
+    """
+    获取具有管理权限的API密钥（用于管理接口的依赖注入）
+    
+    Args:
+        credentials: HTTP认证凭据
+        
+    Returns:
+        str: 当前API密钥
+        
+    Raises:
+        HTTPException: 密钥无效或没有管理权限时抛出异常
+    """
+    api_key = verify_api_key(credentials)
+    if not check_api_key_permissions(api_key, ["admin"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="该API密钥没有管理权限",
+        )
+    return api_key
+
+
 class AuthenticationError(Exception):
     """认证错误异常"""
     def __init__(self, message: str = "认证失败"):
@@ -110,6 +132,10 @@ def check_api_key_permissions(api_key: str, required_permissions: list = None) -
     Returns:
         bool: 是否有权限
     """
-    # 目前所有有效的API密钥都有完全权限
-    # 未来可以根据需要实现更细粒度的权限控制
-    return api_key in settings.VALID_API_KEYS
+    if api_key not in settings.VALID_API_KEYS:
+        return False
+    
+    # 管理权限仅授予ADMIN_API_KEYS中的密钥，其余有效密钥拥有普通权限
+    if required_permissions and "admin" in required_permissions:
+        return api_key in settings.ADMIN_API_KEYS
+    return True
@@ -1,36 +1,68 @@
 """
 缓存相关工具函数
 """
+import os
+import io
+import sys
 import json
+import time
+import pickle
+import sqlite3
 import hashlib
-from typing import Any, Optional
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional, Tuple
 import logging
 from datetime import datetime, timedelta
+import pandas as pd
+from pydantic import BaseModel
+from config import settings
+from utils.frame_codec import encode_frame, decode_frame, FrameCodecError
+from utils.metrics import Counter as MetricCounter, Gauge, register_metric
 
 logger = logging.getLogger(__name__)
 
 
 class SimpleCache:
-    """简单的内存缓存实现"""
+    """简单的内存缓存实现（LRU淘汰，带命中统计）"""
     
-    def __init__(self):
-        self._cache = {}
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        初始化内存缓存
+
+        Args:
+            max_entries: 最大条目数，超出时淘汰最久未使用的条目，None表示不限制
+        """
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
         self._expire_times = {}
+        self._lock = threading.RLock()
+        self._key_hits = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
     
     def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
         try:
-            if key in self._cache:
-                # 检查是否过期
-                if key in self._expire_times:
-                    if datetime.now() > self._expire_times[key]:
-                        # 已过期，删除缓存
-                        del self._cache[key]
-                        del self._expire_times[key]
-                        return None
-                
-                return self._cache[key]
-            return None
+            with self._lock:
+                if key in self._cache:
+                    # 检查是否过期
+                    if key in self._expire_times:
+                        if datetime.now() > self._expire_times[key]:
+                            # 已过期，删除缓存
+                            self._remove(key)
+                            self.stale += 1
+                            self.misses += 1
+                            return None
+                    
+                    self._cache.move_to_end(key)
+                    self._key_hits[key] += 1
+                    self.hits += 1
+                    return self._cache[key]
+                self.misses += 1
+                return None
         except Exception as e:
             logger.error(f"获取缓存失败: {key}, 错误: {str(e)}")
             return None
@@ -38,20 +70,33 @@ class SimpleCache:
     def set(self, key: str, value: Any, expire_seconds: int = 300) -> bool:
         """设置缓存值"""
         try:
-            self._cache[key] = value
-            self._expire_times[key] = datetime.now() + timedelta(seconds=expire_seconds)
+            with self._lock:
+                self._cache[key] = value
+                self._cache.move_to_end(key)
+                self._expire_times[key] = datetime.now() + timedelta(seconds=expire_seconds)
+
+                # 超出容量时淘汰最久未使用的条目
+                if self.max_entries is not None:
+                    while len(self._cache) > self.max_entries:
+                        oldest_key = next(iter(self._cache))
+                        self._remove(oldest_key)
+                        self.evictions += 1
             return True
         except Exception as e:
             logger.error(f"设置缓存失败: {key}, 错误: {str(e)}")
             return False
+
+    def _remove(self, key: str):
+        """删除条目及其统计信息（调用方需持有锁）"""
+        self._cache.pop(key, None)
+        self._expire_times.pop(key, None)
+        self._key_hits.pop(key, None)
     
     def delete(self, key: str) -> bool:
         """删除缓存"""
         try:
-            if key in self._cache:
-                del self._cache[key]
-            if key in self._expire_times:
-                del self._expire_times[key]
+            with self._lock:
+                self._remove(key)
             return True
         except Exception as e:
             logger.error(f"删除缓存失败: {key}, 错误: {str(e)}")
@@ -60,8 +105,10 @@ class SimpleCache:
     def clear(self) -> bool:
         """清空所有缓存"""
         try:
-            self._cache.clear()
-            self._expire_times.clear()
+            with self._lock:
+                self._cache.clear()
+                self._expire_times.clear()
+                self._key_hits.clear()
             return True
         except Exception as e:
             logger.error(f"清空缓存失败: {str(e)}")
@@ -71,20 +118,445 @@ class SimpleCache:
         """清理过期缓存"""
         try:
             now = datetime.now()
-            expired_keys = []
-            
-            for key, expire_time in self._expire_times.items():
-                if now > expire_time:
-                    expired_keys.append(key)
-            
-            for key in expired_keys:
-                self.delete(key)
+            with self._lock:
+                expired_keys = [
+                    key for key, expire_time in self._expire_times.items() if now > expire_time
+                ]
+                for key in expired_keys:
+                    self._remove(key)
                 
             logger.info(f"清理了 {len(expired_keys)} 个过期缓存项")
             
         except Exception as e:
             logger.error(f"清理过期缓存失败: {str(e)}")
 
+    def invalidate(self, prefix: Optional[str] = None, symbol: Optional[str] = None) -> int:
+        """
+        按键前缀或股票代码批量删除缓存
+
+        Args:
+            prefix: 缓存键前缀，如 "stock_data" 或 "stock_data:000001"
+            symbol: 股票代码，匹配generate_cache_key生成的代码段
+
+        Returns:
+            int: 删除的条目数
+        """
+        with self._lock:
+            keys = [key for key in self._cache if _match_cache_key(key, prefix, symbol)]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def get_counters(self) -> dict:
+        """获取命中计数与条目数（不估算内存占用，供监控指标高频采集）"""
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "entries": len(self._cache)}
+
+    def get_stats(self, top_n: int = 10) -> dict:
+        """
+        获取缓存统计信息
+
+        Args:
+            top_n: 返回的热点键数量
+
+        Returns:
+            dict: 条目数、估算字节数、命中/未命中/过期/淘汰次数及热点键
+        """
+        with self._lock:
+            values = list(self._cache.values())
+            hot_keys = self._key_hits.most_common(top_n)
+            total = self.hits + self.misses
+            stats = {
+                "entries": len(values),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+        stats["bytes"] = sum(_estimate_size(value) for value in values)
+        stats["hot_keys"] = [{"key": key, "hits": hits} for key, hits in hot_keys]
+        return stats
+
+
+def _estimate_size(value: Any) -> int:
+    """估算缓存值占用的内存字节数"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            _estimate_size(k) + _estimate_size(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_estimate_size(item) for item in value)
+    if isinstance(value, BaseModel):
+        # 响应模型（如StockAnalysisResponse）按字段内容估算
+        return sys.getsizeof(value) + _estimate_size(value.model_dump())
+    return sys.getsizeof(value)
+
+
+def _match_cache_key(key: str, prefix: Optional[str] = None, symbol: Optional[str] = None) -> bool:
+    """判断缓存键是否匹配前缀或股票代码"""
+    if prefix and not key.startswith(prefix):
+        return False
+    if symbol and symbol not in key.split(":")[1:-1]:
+        return False
+    return bool(prefix or symbol)
+
+
+class _FramePickler(pickle.Pickler):
+    """将DataFrame交给二进制帧编码器处理，其余对象照常pickle"""
+
+    def persistent_id(self, obj):
+        if isinstance(obj, pd.DataFrame):
+            try:
+                return ("frame", encode_frame(obj))
+            except FrameCodecError as e:
+                logger.debug(f"数据帧无法使用二进制编码，回退到pickle: {str(e)}")
+        return None
+
+
+class _FrameUnpickler(pickle.Unpickler):
+    """与_FramePickler配套的反序列化器"""
+
+    def persistent_load(self, pid):
+        tag, payload = pid
+        if tag == "frame":
+            return decode_frame(payload)
+        raise pickle.UnpicklingError(f"未知的持久化对象类型: {tag}")
+
+
+class PersistentCache:
+    """
+    基于SQLite的持久化缓存
+
+    进程重启后缓存依然可用，键带有结构版本号，版本变更后旧数据自动失效
+    """
+
+    def __init__(self, db_path: str, version: int = 1):
+        """
+        初始化持久化缓存
+
+        Args:
+            db_path: SQLite数据库文件路径
+            version: 缓存数据结构版本
+        """
+        self.db_path = db_path
+        self.version = version
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "key TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+            "expire_at REAL NOT NULL, updated_at REAL NOT NULL, payload BLOB NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_expire ON cache_entries (expire_at)"
+        )
+        # 删除旧版本的缓存数据
+        self._conn.execute("DELETE FROM cache_entries WHERE version != ?", (self.version,))
+        self._conn.commit()
+
+    def _versioned_key(self, key: str) -> str:
+        """生成带版本号的键"""
+        return f"v{self.version}:{key}"
+
+    @staticmethod
+    def _serialize(value: Any) -> bytes:
+        """序列化缓存值，其中的DataFrame使用二进制帧格式"""
+        buffer = io.BytesIO()
+        _FramePickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(value)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _deserialize(payload: bytes) -> Any:
+        """反序列化缓存值"""
+        return _FrameUnpickler(io.BytesIO(payload)).load()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        获取缓存值
+
+        Returns:
+            Optional[Tuple]: (缓存值, 剩余有效秒数)，未命中或已过期时返回None
+        """
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT payload, expire_at FROM cache_entries WHERE key = ? AND expire_at > ?",
+                    (self._versioned_key(key), time.time())
+                ).fetchone()
+            if row is None:
+                return None
+            return self._deserialize(row[0]), row[1] - time.time()
+        except Exception as e:
+            logger.error(f"读取持久化缓存失败: {key}, 错误: {str(e)}")
+            return None
+
+    def set(self, key: str, value: Any, expire_seconds: int = 300) -> bool:
+        """设置缓存值"""
+        try:
+            payload = self._serialize(value)
+            now = time.time()
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries "
+                    "(key, version, expire_at, updated_at, payload) VALUES (?, ?, ?, ?, ?)",
+                    (self._versioned_key(key), self.version, now + expire_seconds, now,
+                     sqlite3.Binary(payload))
+                )
+                self._conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"写入持久化缓存失败: {key}, 错误: {str(e)}")
+            return False
+
+    def delete(self, key: str) -> bool:
+        """删除缓存"""
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "DELETE FROM cache_entries WHERE key = ?", (self._versioned_key(key),)
+                )
+                self._conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"删除持久化缓存失败: {key}, 错误: {str(e)}")
+            return False
+
+    def clear(self) -> bool:
+        """清空所有缓存"""
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM cache_entries")
+                self._conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"清空持久化缓存失败: {str(e)}")
+            return False
+
+    def cleanup_expired(self) -> int:
+        """清理过期缓存，返回清理的条目数"""
+        try:
+            with self._lock:
+                cursor = self._conn.execute(
+                    "DELETE FROM cache_entries WHERE expire_at <= ?", (time.time(),)
+                )
+                self._conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            logger.error(f"清理持久化缓存失败: {str(e)}")
+            return 0
+
+    @staticmethod
+    def _escape_like(text: str) -> str:
+        """转义LIKE通配符"""
+        return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+    def invalidate(self, prefix: Optional[str] = None, symbol: Optional[str] = None) -> int:
+        """按键前缀或股票代码批量删除缓存，返回删除的条目数"""
+        if not prefix and not symbol:
+            return 0
+
+        conditions = []
+        params = []
+        if prefix:
+            conditions.append("key LIKE ? ESCAPE '\\'")
+            params.append(self._escape_like(self._versioned_key(prefix)) + "%")
+        if symbol:
+            conditions.append("key LIKE ? ESCAPE '\\'")
+            params.append(self._escape_like(self._versioned_key("")) + "%:" +
+                          self._escape_like(symbol) + ":%")
+        try:
+            with self._lock:
+                cursor = self._conn.execute(
+                    "DELETE FROM cache_entries WHERE " + " AND ".join(conditions), params
+                )
+                self._conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            logger.error(f"批量删除持久化缓存失败: {str(e)}")
+            return 0
+
+    def get_stats(self) -> dict:
+        """获取持久化层的条目数与占用字节数"""
+        try:
+            with self._lock:
+                entries, size = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM cache_entries "
+                    "WHERE version = ? AND expire_at > ?",
+                    (self.version, time.time())
+                ).fetchone()
+            return {"entries": entries, "bytes": size, "path": self.db_path}
+        except Exception as e:
+            logger.error(f"获取持久化缓存统计失败: {str(e)}")
+            return {"entries": 0, "bytes": 0, "path": self.db_path}
+
+    def load_recent(self, limit: int):
+        """
+        按更新时间倒序读取未过期的缓存条目
+
+        Args:
+            limit: 最大读取条目数
+
+        Yields:
+            Tuple: (键, 缓存值, 剩余有效秒数)
+        """
+        prefix = self._versioned_key("")
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, payload, expire_at FROM cache_entries "
+                "WHERE version = ? AND expire_at > ? ORDER BY updated_at DESC LIMIT ?",
+                (self.version, time.time(), limit)
+            ).fetchall()
+
+        now = time.time()
+        for key, payload, expire_at in rows:
+            try:
+                yield key[len(prefix):], self._deserialize(payload), expire_at - now
+            except Exception as e:
+                logger.warning(f"跳过无法解析的持久化缓存: {key}, 错误: {str(e)}")
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """
+    两级缓存：内存缓存 + 可选的持久化缓存
+
+    读取时优先命中内存，未命中再查询持久化层并回填内存；写入时同时写两层
+    """
+
+    def __init__(self, memory: SimpleCache, persistent: Optional[PersistentCache] = None):
+        self.memory = memory
+        self.persistent = persistent
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.warm_loaded = 0
+        self.warm_up_ms = 0.0
+
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存值"""
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+
+        if self.persistent is not None:
+            entry = self.persistent.get(key)
+            if entry is not None:
+                value, remaining = entry
+                self.memory.set(key, value, max(1, int(remaining)))
+                self.persistent_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any, expire_seconds: int = 300) -> bool:
+        """设置缓存值"""
+        result = self.memory.set(key, value, expire_seconds)
+        if self.persistent is not None:
+            result = self.persistent.set(key, value, expire_seconds) and result
+        return result
+
+    def delete(self, key: str) -> bool:
+        """删除缓存"""
+        result = self.memory.delete(key)
+        if self.persistent is not None:
+            result = self.persistent.delete(key) and result
+        return result
+
+    def clear(self) -> bool:
+        """清空所有缓存"""
+        result = self.memory.clear()
+        if self.persistent is not None:
+            result = self.persistent.clear() and result
+        return result
+
+    def cleanup_expired(self):
+        """清理过期缓存"""
+        self.memory.cleanup_expired()
+        if self.persistent is not None:
+            removed = self.persistent.cleanup_expired()
+            logger.info(f"清理了 {removed} 个过期持久化缓存项")
+
+    def warm_up(self, limit: int = 500) -> int:
+        """
+        从持久化层预加载最近的缓存条目到内存
+
+        Args:
+            limit: 最大预加载条目数
+
+        Returns:
+            int: 预加载的条目数
+        """
+        if self.persistent is None:
+            return 0
+
+        start_time = time.perf_counter()
+        loaded = 0
+        try:
+            for key, value, remaining in self.persistent.load_recent(limit):
+                if self.memory.set(key, value, max(1, int(remaining))):
+                    loaded += 1
+        except Exception as e:
+            logger.error(f"预热缓存失败: {str(e)}")
+
+        self.warm_loaded = loaded
+        self.warm_up_ms = (time.perf_counter() - start_time) * 1000
+        logger.info(f"缓存预热完成: 加载 {loaded} 条, 耗时 {self.warm_up_ms:.1f}ms")
+        return loaded
+
+    def invalidate(self, prefix: Optional[str] = None, symbol: Optional[str] = None) -> int:
+        """按键前缀或股票代码批量删除两级缓存，返回删除的条目数"""
+        removed = self.memory.invalidate(prefix, symbol)
+        if self.persistent is not None:
+            removed = max(removed, self.persistent.invalidate(prefix, symbol))
+        return removed
+
+    def get_counters(self) -> dict:
+        """获取两级合计命中计数与内存层条目数"""
+        counters = self.memory.get_counters()
+        counters.update({"hits": self.memory_hits + self.persistent_hits, "misses": self.misses})
+        return counters
+
+    def get_stats(self, top_n: int = 10) -> dict:
+        """获取缓存统计信息（内存层明细 + 两级合计命中率）"""
+        stats = self.memory.get_stats(top_n)
+        total = self.memory_hits + self.persistent_hits + self.misses
+        hits = self.memory_hits + self.persistent_hits
+        stats.update({
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "warm_loaded": self.warm_loaded,
+            "warm_up_ms": round(self.warm_up_ms, 2),
+            "persistent_enabled": self.persistent is not None
+        })
+        if self.persistent is not None:
+            stats["persistent"] = self.persistent.get_stats()
+        return stats
+
+    def close(self):
+        """关闭持久化层"""
+        if self.persistent is not None:
+            self.persistent.close()
+
 
 def generate_cache_key(prefix: str, **kwargs) -> str:
     """
@@ -105,7 +577,11 @@ def generate_cache_key(prefix: str, **kwargs) -> str:
         # 生成MD5哈希
         hash_obj = hashlib.md5(params_str.encode('utf-8'))
         hash_str = hash_obj.hexdigest()
-        
+
+        # 股票代码作为独立的键段，便于按股票批量失效
+        stock_code = kwargs.get('stock_code')
+        if stock_code:
+            return f"{prefix}:{stock_code}:{hash_str}"
         return f"{prefix}:{hash_str}"
         
     except Exception as e:
@@ -113,5 +589,58 @@ def generate_cache_key(prefix: str, **kwargs) -> str:
         return f"{prefix}:default"
 
 
+# 缓存注册表：名称 -> 缓存实例，供管理接口统计与失效
+cache_registry: Dict[str, Any] = {}
+
+
+def register_cache(name: str, cache_instance: Any) -> Any:
+    """
+    注册命名缓存
+
+    Args:
+        name: 缓存名称，如 "data"
+        cache_instance: 提供get_stats/invalidate/clear方法的缓存实例
+
+    Returns:
+        传入的缓存实例
+    """
+    cache_registry[name] = cache_instance
+    return cache_instance
+
+
+def _collect_cache_counter(field: str) -> Dict[Tuple[str, ...], float]:
+    """采集所有已注册缓存的某项计数"""
+    return {(name,): instance.get_counters()[field] for name, instance in list(cache_registry.items())
+            if hasattr(instance, "get_counters")}
+
+
+def _collect_cache_hit_ratio() -> Dict[Tuple[str, ...], float]:
+    ratios = {}
+    for name, instance in list(cache_registry.items()):
+        if hasattr(instance, "get_counters"):
+            counters = instance.get_counters()
+            total = counters["hits"] + counters["misses"]
+            ratios[(name,)] = counters["hits"] / total if total else 0.0
+    return ratios
+
+
+# 缓存指标在导出时从各缓存的计数采集，不影响读写路径
+register_metric(MetricCounter("cache_hits_total", "缓存命中次数", labelnames=("cache",))) \
+    .set_function(lambda: _collect_cache_counter("hits"))
+register_metric(MetricCounter("cache_misses_total", "缓存未命中次数", labelnames=("cache",))) \
+    .set_function(lambda: _collect_cache_counter("misses"))
+register_metric(MetricCounter("cache_evictions_total", "缓存容量淘汰次数", labelnames=("cache",))) \
+    .set_function(lambda: _collect_cache_counter("evictions"))
+register_metric(Gauge("cache_entries", "缓存条目数", labelnames=("cache",))) \
+    .set_function(lambda: _collect_cache_counter("entries"))
+register_metric(Gauge("cache_hit_ratio", "缓存命中率（自启动以来）", labelnames=("cache",))) \
+    .set_function(_collect_cache_hit_ratio)
+
+
 # 创建全局缓存实例
-cache = SimpleCache()
+cache = TieredCache(
+    SimpleCache(settings.MEMORY_CACHE_MAX_ENTRIES),
+    PersistentCache(settings.PERSISTENT_CACHE_PATH, settings.CACHE_SCHEMA_VERSION)
+    if settings.PERSISTENT_CACHE_ENABLED else None
+)
+register_cache("data", cache)
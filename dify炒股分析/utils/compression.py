@@ -0,0 +1,149 @@
+"""
+响应压缩
+按Accept-Encoding协商brotli/gzip，只压缩一次性发送的完整响应体，流式响应（NDJSON、SSE）原样转发；
+带ETag的响应按(ETag, 编码)缓存压缩结果，内容未变化时不再重复压缩
+"""
+import gzip
+import logging
+from typing import Dict, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings
+from utils.cache import SimpleCache, register_cache
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+logger = logging.getLogger(__name__)
+
+# 不压缩的内容类型（流式或本身已压缩）
+EXCLUDED_MEDIA_TYPES = ("text/event-stream", "application/x-ndjson", "image/", "application/gzip", "application/zip")
+
+# 压缩结果缓存，键为 编码:ETag
+compressed_cache = register_cache("compressed", SimpleCache(settings.RESPONSE_CACHE_MAX_ENTRIES))
+
+
+def select_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    根据Accept-Encoding选择压缩编码
+
+    Args:
+        accept_encoding: Accept-Encoding请求头，如 "gzip, deflate, br;q=0.9"
+
+    Returns:
+        Optional[str]: "br"、"gzip"，客户端不接受任何可用编码时返回None
+    """
+    if not accept_encoding:
+        return None
+
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+
+    wildcard = weights.get("*", 0.0)
+    candidates = (["br"] if HAS_BROTLI else []) + ["gzip"]
+    best, best_quality = None, 0.0
+    for encoding in candidates:
+        quality = weights.get(encoding, wildcard)
+        # 权重相同时按候选顺序优先brotli
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """按指定编码压缩响应体"""
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    响应压缩中间件（ASGI）
+
+    响应头先暂存，收到第一个响应体分块后再决定是否压缩：分块标记more_body（流式响应）、
+    内容类型不适合压缩、已有Content-Encoding或小于minimum_size时原样转发
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = select_encoding(Headers(scope=scope).get("accept-encoding"))
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                passthrough = True
+                if start_message is not None:
+                    await send(start_message)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(scope=start_message)
+            if message.get("more_body", False) or not self._compressible(start_message, headers, body):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers.add_vary_header("Accept-Encoding")
+            if encoding is None:
+                await send(start_message)
+                await send(message)
+                return
+
+            etag = headers.get("etag")
+            cache_key = f"{encoding}:{etag}" if etag and start_message["status"] == 200 else None
+            compressed = compressed_cache.get(cache_key) if cache_key else None
+            if compressed is None:
+                compressed = compress(body, encoding)
+                if cache_key:
+                    compressed_cache.set(cache_key, compressed, settings.CACHE_EXPIRE_SECONDS)
+
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            # 压缩后的字节与原始表示不同，按惯例改为弱ETag，If-None-Match弱比较仍可命中
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compressible(self, start_message: Message, headers: MutableHeaders, body: bytes) -> bool:
+        if start_message["status"] in (204, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        if any(content_type.startswith(media_type) for media_type in EXCLUDED_MEDIA_TYPES):
+            return False
+        return len(body) >= self.minimum_size
@@ -0,0 +1,189 @@
+"""
+行情数据帧二进制编解码
+为缓存中的OHLCV DataFrame提供紧凑的定长二进制格式；decode_arrays直接返回NumPy视图，decode_frame复制为可修改的数据帧；
+无法原样还原的数据帧（非默认索引、其他对象类型的列）抛出FrameCodecError，由调用方回退到pickle
+"""
+import json
+import struct
+import logging
+from typing import Dict, Tuple, Union
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 文件头：魔数、格式版本、列数、行数、列描述长度
+_HEADER = struct.Struct('<4sBxHII')
+_MAGIC = b'OHLC'
+_FORMAT_VERSION = 1
+_ALIGNMENT = 8
+
+# 价格类列（中英文列名），可按需压缩为float32
+PRICE_COLUMNS = {'open', 'close', 'high', 'low', '开盘', '收盘', '最高', '最低'}
+
+# 日期列
+DATE_COLUMNS = {'date', '日期'}
+
+_EPOCH_DAY = np.datetime64(0, 'D')
+
+# 可以保存在列描述中的值类型（JSON往返后类型和值不变）
+_JSON_SCALARS = (str, bool, int, float, type(None))
+
+
+class FrameCodecError(ValueError):
+    """数据帧编解码错误"""
+    pass
+
+
+def _encode_column(name: str, series: pd.Series, price_dtype: str) -> Tuple[Dict, bytes]:
+    """将单列编码为（列描述, 原始字节）"""
+    if name in DATE_COLUMNS or pd.api.types.is_datetime64_any_dtype(series):
+        dates = pd.to_datetime(series).to_numpy(dtype='datetime64[ns]')
+        days = dates.astype('datetime64[D]')
+        if (dates == days.astype('datetime64[ns]')).all():
+            # 日线数据：以首日为基准存储int32天数偏移
+            base = int((days[0] - _EPOCH_DAY).astype(np.int64)) if len(days) else 0
+            offsets = (days - _EPOCH_DAY).astype(np.int64) - base
+            return {'name': name, 'kind': 'date', 'dtype': '<i4', 'base': base}, \
+                offsets.astype('<i4').tobytes()
+        return {'name': name, 'kind': 'datetime', 'dtype': '<i8'}, \
+            dates.astype('<i8').tobytes()
+
+    if pd.api.types.is_bool_dtype(series):
+        return {'name': name, 'kind': 'bool', 'dtype': '|u1'}, \
+            series.to_numpy(dtype='u1').tobytes()
+
+    if pd.api.types.is_integer_dtype(series):
+        return {'name': name, 'kind': 'int', 'dtype': '<i8'}, \
+            series.to_numpy(dtype='<i8').tobytes()
+
+    if pd.api.types.is_float_dtype(series):
+        dtype = price_dtype if name in PRICE_COLUMNS else '<f8'
+        return {'name': name, 'kind': 'float', 'dtype': dtype}, \
+            series.to_numpy(dtype=dtype).tobytes()
+
+    # 其他列（如股票代码）保存在列描述中，只接受JSON可以原样还原的值，其余类型交给调用方回退到pickle
+    if isinstance(series.dtype, pd.CategoricalDtype) or not (
+            pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+        raise FrameCodecError(f"不支持的列类型: {series.dtype}")
+    values = series.tolist()
+    unsupported = next((value for value in values if not isinstance(value, _JSON_SCALARS)), None)
+    if unsupported is not None:
+        raise FrameCodecError(f"不支持的值类型: {type(unsupported).__name__}")
+    if values and all(value == values[0] for value in values):
+        return {'name': name, 'kind': 'constant', 'value': values[0]}, b''
+    return {'name': name, 'kind': 'values', 'values': values}, b''
+
+
+def encode_frame(df: pd.DataFrame, price_dtype: str = '<f8') -> bytes:
+    """
+    将OHLCV DataFrame编码为二进制
+
+    Args:
+        df: 行情数据，日期列按int32天数偏移存储，价格列按price_dtype存储，整数列按int64存储
+        price_dtype: 价格列的存储类型，'<f8'（默认，无损）或'<f4'（体积减半）
+
+    Returns:
+        bytes: 编码后的二进制数据
+    """
+    if price_dtype not in ('<f4', '<f8'):
+        raise FrameCodecError(f"不支持的价格类型: {price_dtype}")
+    # 只保存列，索引必须是默认的0..n-1，列名必须是不重复的字符串
+    index = df.index
+    if not (isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1
+            and index.name is None):
+        raise FrameCodecError("只支持默认的RangeIndex索引")
+    if not all(isinstance(name, str) for name in df.columns) or not df.columns.is_unique:
+        raise FrameCodecError("列名必须是不重复的字符串")
+
+    columns = []
+    blocks = []
+    for name, series in df.items():
+        try:
+            descriptor, block = _encode_column(name, series, price_dtype)
+        except FrameCodecError:
+            raise
+        except (TypeError, ValueError) as e:
+            raise FrameCodecError(f"无法编码列 {name}: {str(e)}") from e
+        columns.append(descriptor)
+        blocks.append(block)
+
+    descriptor_bytes = json.dumps(columns, ensure_ascii=False).encode('utf-8')
+    parts = [_HEADER.pack(_MAGIC, _FORMAT_VERSION, len(columns), len(df), len(descriptor_bytes)),
+             descriptor_bytes]
+    offset = _HEADER.size + len(descriptor_bytes)
+    for block in blocks:
+        if not block:
+            continue
+        # 每列按8字节对齐，保证解码时可直接创建NumPy视图
+        padding = -offset % _ALIGNMENT
+        parts.append(b'\0' * padding)
+        parts.append(block)
+        offset += padding + len(block)
+
+    return b''.join(parts)
+
+
+def decode_arrays(data: Union[bytes, bytearray, memoryview]) -> Dict[str, np.ndarray]:
+    """
+    将二进制数据解码为列名到NumPy数组的映射
+
+    数值列为指向原始缓冲区的只读视图（不复制），日期列按天数偏移还原为datetime64
+
+    Args:
+        data: encode_frame生成的二进制数据
+
+    Returns:
+        Dict[str, np.ndarray]: 列名到数组的映射，保持原始列顺序
+    """
+    buffer = memoryview(data)
+    if len(buffer) < _HEADER.size:
+        raise FrameCodecError("数据长度不足")
+
+    magic, version, n_cols, n_rows, descriptor_len = _HEADER.unpack_from(buffer, 0)
+    if magic != _MAGIC or version != _FORMAT_VERSION:
+        raise FrameCodecError(f"无法识别的数据格式: {magic!r} v{version}")
+
+    offset = _HEADER.size
+    columns = json.loads(bytes(buffer[offset:offset + descriptor_len]).decode('utf-8'))
+    offset += descriptor_len
+    if len(columns) != n_cols:
+        raise FrameCodecError("列描述与列数不一致")
+
+    arrays = {}
+    for column in columns:
+        kind = column['kind']
+        if kind == 'constant':
+            arrays[column['name']] = np.full(n_rows, column['value'], dtype=object)
+            continue
+        if kind == 'values':
+            arrays[column['name']] = np.array(column['values'], dtype=object)
+            continue
+
+        offset += -offset % _ALIGNMENT
+        dtype = np.dtype(column['dtype'])
+        values = np.frombuffer(buffer, dtype=dtype, count=n_rows, offset=offset)
+        offset += n_rows * dtype.itemsize
+
+        if kind == 'date':
+            values = (values + column['base']).astype('datetime64[D]').astype('datetime64[ns]')
+        elif kind == 'datetime':
+            values = values.view('datetime64[ns]')
+        elif kind == 'bool':
+            values = values.view(np.bool_)
+        arrays[column['name']] = values
+
+    return arrays
+
+
+def decode_frame(data: Union[bytes, bytearray, memoryview]) -> pd.DataFrame:
+    """
+    将二进制数据解码为DataFrame
+
+    Args:
+        data: encode_frame生成的二进制数据
+
+    Returns:
+        pd.DataFrame: 解码后的行情数据（复制出缓冲区，可以修改）
+    """
+    return pd.DataFrame(decode_arrays(data), copy=True)
@@ -0,0 +1,67 @@
+"""
+HTTP条件请求工具函数
+提供ETag计算、If-None-Match匹配和按交易时段生成Cache-Control
+"""
+import hashlib
+from typing import Any, Optional
+from config import settings
+from utils.market_session import get_refresh_interval
+
+
+def compute_etag(*parts: Any) -> str:
+    """
+    根据给定字段计算强ETag
+
+    Args:
+        *parts: 决定响应内容的字段（股票代码、最新K线时间、指标参数指纹、响应结构版本等）
+
+    Returns:
+        str: 带双引号的ETag
+    """
+    raw = "|".join("" if part is None else str(part) for part in parts)
+    return '"' + hashlib.sha1(raw.encode('utf-8')).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    判断If-None-Match请求头是否与ETag匹配（按弱比较规则）
+
+    Args:
+        if_none_match: If-None-Match请求头的值
+        etag: 当前资源的ETag
+
+    Returns:
+        bool: 匹配时返回True
+    """
+    if not if_none_match:
+        return False
+
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+
+    opaque_tag = etag[2:] if etag.startswith("W/") else etag
+    return any(
+        (tag[2:] if tag.startswith("W/") else tag) == opaque_tag
+        for tag in candidates
+    )
+
+
+def build_cache_control(market_type: str) -> str:
+    """
+    按交易时段生成Cache-Control
+
+    交易时间内数据随时可能更新，缓存时间较短；休市期间可缓存至下次开盘
+
+    Args:
+        market_type: 市场类型
+
+    Returns:
+        str: Cache-Control头部值
+    """
+    max_age = get_refresh_interval(
+        market_type,
+        settings.HTTP_CACHE_MAX_AGE_TRADING,
+        settings.HTTP_CACHE_MAX_AGE_CLOSED
+    )
+    return f"private, max-age={max_age}"
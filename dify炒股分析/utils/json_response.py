@@ -0,0 +1,71 @@
+"""
+高性能JSON响应
+基于orjson序列化，原生支持NumPy标量和数组；未安装orjson时回退到标准json
+"""
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+import numpy as np
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+logger = logging.getLogger(__name__)
+
+if HAS_ORJSON:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    """处理json/orjson无法直接序列化的对象"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"无法序列化的类型: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    将内容序列化为JSON字节串
+
+    Args:
+        content: 字典、列表或pydantic模型，可包含NumPy标量、数组和datetime
+
+    Returns:
+        bytes: UTF-8编码的JSON
+    """
+    if isinstance(content, BaseModel):
+        content = content.model_dump()
+    if HAS_ORJSON:
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    使用orjson序列化的JSON响应
+
+    可直接传入pydantic响应模型，跳过FastAPI基于response_model的通用校验和序列化
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
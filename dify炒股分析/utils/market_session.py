@@ -0,0 +1,131 @@
+"""
+交易时段工具函数
+根据市场类型判断当前是否处于交易时间，以及距离下一次开盘的时长
+"""
+import logging
+from datetime import datetime, time, timedelta, timezone, tzinfo
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python 3.8
+    ZoneInfo = None
+    ZoneInfoNotFoundError = Exception
+
+logger = logging.getLogger(__name__)
+
+
+# 各市场所在时区（无时区数据库时使用固定偏移）
+_MARKET_TIMEZONES: Dict[str, Tuple[str, int]] = {
+    "A": ("Asia/Shanghai", 8),
+    "ETF": ("Asia/Shanghai", 8),
+    "HK": ("Asia/Hong_Kong", 8),
+    "US": ("America/New_York", -5),
+}
+
+# 各市场交易时段（当地时间）
+MARKET_SESSIONS: Dict[str, List[Tuple[time, time]]] = {
+    "A": [(time(9, 30), time(11, 30)), (time(13, 0), time(15, 0))],
+    "ETF": [(time(9, 30), time(11, 30)), (time(13, 0), time(15, 0))],
+    "HK": [(time(9, 30), time(12, 0)), (time(13, 0), time(16, 0))],
+    "US": [(time(9, 30), time(16, 0))],
+}
+
+
+def _get_timezone(market_type: str) -> tzinfo:
+    """获取市场时区"""
+    name, offset = _MARKET_TIMEZONES.get(market_type, _MARKET_TIMEZONES["A"])
+    if ZoneInfo is not None:
+        try:
+            return ZoneInfo(name)
+        except ZoneInfoNotFoundError:
+            logger.debug(f"未找到时区数据: {name}，使用固定偏移")
+    return timezone(timedelta(hours=offset))
+
+
+def get_market_now(market_type: str, now: Optional[datetime] = None) -> datetime:
+    """
+    获取市场当地时间
+
+    Args:
+        market_type: 市场类型
+        now: 参考时间（带时区），默认为当前时间
+
+    Returns:
+        datetime: 市场当地时间
+    """
+    tz = _get_timezone(market_type)
+    if now is None:
+        return datetime.now(tz)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    return now.astimezone(tz)
+
+
+def is_trading_time(market_type: str, now: Optional[datetime] = None) -> bool:
+    """
+    判断是否处于交易时间（简单判断，不考虑节假日）
+
+    Args:
+        market_type: 市场类型
+        now: 参考时间，默认为当前时间
+
+    Returns:
+        bool: 是否处于交易时间
+    """
+    local_now = get_market_now(market_type, now)
+    if local_now.weekday() >= 5:
+        return False
+
+    current = local_now.time()
+    sessions = MARKET_SESSIONS.get(market_type, MARKET_SESSIONS["A"])
+    return any(start <= current <= end for start, end in sessions)
+
+
+def seconds_until_next_open(market_type: str, now: Optional[datetime] = None) -> int:
+    """
+    计算距离下一个交易时段开始的秒数，交易时间内返回0
+
+    Args:
+        market_type: 市场类型
+        now: 参考时间，默认为当前时间
+
+    Returns:
+        int: 秒数
+    """
+    if is_trading_time(market_type, now):
+        return 0
+
+    local_now = get_market_now(market_type, now)
+    sessions = MARKET_SESSIONS.get(market_type, MARKET_SESSIONS["A"])
+    for day_offset in range(8):
+        day = (local_now + timedelta(days=day_offset)).date()
+        if day.weekday() >= 5:
+            continue
+        for start, _ in sessions:
+            session_start = datetime.combine(day, start, tzinfo=local_now.tzinfo)
+            if session_start > local_now:
+                return int((session_start - local_now).total_seconds())
+    return 0
+
+
+def get_refresh_interval(market_type: str, trading_interval: int, closed_interval: int,
+                         now: Optional[datetime] = None) -> int:
+    """
+    根据交易时段计算数据刷新间隔
+
+    交易时间内使用trading_interval；休市时使用closed_interval，但不超过距离下次开盘的时间
+
+    Args:
+        market_type: 市场类型
+        trading_interval: 交易时间内的刷新间隔（秒）
+        closed_interval: 休市时的最大刷新间隔（秒）
+        now: 参考时间，默认为当前时间
+
+    Returns:
+        int: 刷新间隔（秒）
+    """
+    if is_trading_time(market_type, now):
+        return trading_interval
+    until_open = seconds_until_next_open(market_type, now)
+    return max(trading_interval, min(closed_interval, until_open))
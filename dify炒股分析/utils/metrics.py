@@ -0,0 +1,415 @@
+"""
+运行指标收集
+提供线程安全的计数器、仪表和直方图，并以Prometheus文本格式导出；
+各指标的标签组合数量有上限，超出后归入溢出序列，避免内存随请求参数无限增长
+"""
+import bisect
+import time
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 默认分桶（秒），覆盖从亚毫秒级计算到多秒级的上游请求
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 超出标签组合上限后使用的标签值
+OVERFLOW_LABEL = "__overflow__"
+
+
+class _Metric:
+    """带标签指标的公共部分"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 max_series: Optional[int] = None):
+        """
+        Args:
+            name: 指标名称
+            documentation: 指标说明
+            labelnames: 标签名称
+            max_series: 标签组合数量上限，默认取METRICS_MAX_SERIES
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series or settings.METRICS_MAX_SERIES
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """生成标签值元组，新组合超出上限时归入溢出序列（调用方需持有锁）"""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        if key not in self._series and len(self._series) >= self.max_series:
+            return (OVERFLOW_LABEL,) * len(self.labelnames)
+        return key
+
+    def set_function(self, function: Callable[[], Dict[Tuple[str, ...], float]]):
+        """
+        设置采集回调，导出时调用而不是在业务路径上更新
+
+        Args:
+            function: 返回标签值元组到数值的映射
+        """
+        self._function = function
+        return self
+
+    def _label_text(self, key: Tuple[str, ...]) -> str:
+        """生成转义后的标签文本，如 method="GET",route="/" """
+        return ",".join(f'{name}="{_escape_label(str(value))}"' for name, value in zip(self.labelnames, key))
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """导出样本：(指标名后缀, 标签文本, 数值)"""
+        if self._function is not None:
+            try:
+                values = self._function()
+            except Exception as e:
+                logger.warning(f"采集指标失败: {self.name}, {str(e)}")
+                values = {}
+        else:
+            with self._lock:
+                values = dict(self._series)
+        if not values and not self.labelnames:
+            values = {(): 0}
+        return [("", self._label_text(key), value) for key, value in sorted(values.items())]
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        """
+        增加计数
+
+        Args:
+            amount: 增加量
+            **labels: 标签值，需与labelnames一致
+        """
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def get(self, **labels: str) -> float:
+        """获取当前计数"""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        return self._series.get(key, 0.0)
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels: str):
+        """设置当前值"""
+        with self._lock:
+            self._series[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        """增加当前值"""
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        """减少当前值"""
+        self.inc(-amount, **labels)
+
+    def get(self, **labels: str) -> float:
+        """获取当前值"""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        return self._series.get(key, 0.0)
+
+
+class Histogram(_Metric):
+    """带标签的累积直方图"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, max_series: Optional[int] = None):
+        """
+        Args:
+            name: 指标名称
+            documentation: 指标说明
+            labelnames: 标签名称
+            buckets: 分桶上界（升序），最后自动追加+Inf
+            max_series: 标签组合数量上限
+        """
+        super().__init__(name, documentation, labelnames, max_series)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str):
+        """
+        记录一次观测值
+
+        Args:
+            value: 观测值（秒）
+            **labels: 标签值，需与labelnames一致
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            key = self._key(labels)
+            series = self._series.get(key)
+            if series is None:
+                # [各分桶计数（含+Inf）, 总和, 次数]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self) -> Dict[Tuple[str, ...], Dict]:
+        """
+        导出所有序列的累积分桶计数
+
+        Returns:
+            Dict: 标签值元组到 {'buckets': [(上界, 累积计数)], 'sum': 总和, 'count': 次数} 的映射
+        """
+        with self._lock:
+            snapshot = {key: (list(series[0]), series[1], series[2])
+                        for key, series in self._series.items()}
+
+        result = {}
+        bounds = list(self.buckets) + [float("inf")]
+        for key, (counts, total, count) in snapshot.items():
+            cumulative = 0
+            buckets = []
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                buckets.append((bound, cumulative))
+            result[key] = {'buckets': buckets, 'sum': total, 'count': count}
+        return result
+
+    def quantile(self, q: float, **labels: str) -> Optional[float]:
+        """
+        按分桶线性插值估算分位数
+
+        Args:
+            q: 分位（0~1）
+            **labels: 标签值
+
+        Returns:
+            Optional[float]: 估算值（秒），无数据时返回None
+        """
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self.collect().get(key)
+        if not series or not series['count']:
+            return None
+
+        rank = q * series['count']
+        lower_bound, lower_count = 0.0, 0
+        for bound, cumulative in series['buckets']:
+            if cumulative >= rank:
+                if bound == float("inf"):
+                    return lower_bound
+                width = cumulative - lower_count
+                fraction = (rank - lower_count) / width if width else 0.0
+                return lower_bound + (bound - lower_bound) * fraction
+            lower_bound, lower_count = bound, cumulative
+        return lower_bound
+
+    def get_stats(self) -> List[Dict]:
+        """
+        按标签汇总次数、平均值和P50/P95/P99（毫秒）
+
+        Returns:
+            List[Dict]: 每个标签组合一项
+        """
+        stats = []
+        for key, series in sorted(self.collect().items()):
+            labels = dict(zip(self.labelnames, key))
+            count = series['count']
+            item = dict(labels)
+            item.update({
+                'count': count,
+                'avg_ms': round(series['sum'] / count * 1000, 3) if count else None,
+            })
+            for q in (0.5, 0.95, 0.99):
+                value = self.quantile(q, **labels)
+                item[f'p{int(q * 100)}_ms'] = round(value * 1000, 3) if value is not None else None
+            stats.append(item)
+        return stats
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """导出样本：每个序列的_bucket、_sum和_count"""
+        le_texts = [f'le="{_format_value(bound)}"' for bound in self.buckets] + ['le="+Inf"']
+        samples = []
+        for key, series in sorted(self.collect().items()):
+            labels = self._label_text(key)
+            prefix = labels + "," if labels else ""
+            for le, (_, cumulative) in zip(le_texts, series['buckets']):
+                samples.append(("_bucket", prefix + le, cumulative))
+            samples.append(("_sum", labels, series['sum']))
+            samples.append(("_count", labels, series['count']))
+        return samples
+
+
+# 全局指标注册表
+metrics_registry: Dict[str, _Metric] = {}
+
+
+def register_metric(metric: _Metric) -> _Metric:
+    """
+    注册指标，重复注册同名指标时返回已有实例
+
+    Args:
+        metric: 指标实例
+
+    Returns:
+        注册表中的实例
+    """
+    return metrics_registry.setdefault(metric.name, metric)
+
+
+def _format_value(value: float) -> str:
+    if type(value) is int:
+        return str(value)
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus() -> str:
+    """
+    以Prometheus文本格式（0.0.4）导出所有已注册指标
+
+    Returns:
+        str: 指标文本
+    """
+    lines = []
+    for name, metric in sorted(metrics_registry.items()):
+        help_text = metric.documentation.replace("\\", "\\\\").replace("\n", "\\n")
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric.type}")
+        for suffix, labels, value in metric.samples():
+            if labels:
+                lines.append(f"{name}{suffix}{{{labels}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name}{suffix} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# 请求与运行时指标
+# ---------------------------------------------------------------------------
+
+http_request_duration = register_metric(Histogram(
+    "http_request_duration_seconds",
+    "HTTP请求耗时（按路由模板统计，流式响应计到最后一个分块发送完成）",
+    labelnames=("method", "route", "status")
+))
+
+http_requests_in_progress = register_metric(Gauge(
+    "http_requests_in_progress",
+    "正在处理的HTTP请求数"
+))
+
+event_loop_lag = register_metric(Histogram(
+    "event_loop_lag_seconds",
+    "事件循环调度延迟（定时器实际唤醒时间与预期时间之差）",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+))
+
+event_loop_lag_last = register_metric(Gauge(
+    "event_loop_lag_last_seconds",
+    "最近一次测得的事件循环调度延迟"
+))
+
+
+class MetricsMiddleware:
+    """
+    请求耗时中间件（ASGI）
+
+    route标签取匹配到的路由模板（如/live/stream），未匹配的路径统一记为unmatched，
+    因此标签组合数只与路由数量有关，不随请求路径和参数增长
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_progress.dec()
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", None) or "unmatched",
+                status=str(status_code)
+            )
+
+
+class EventLoopLagMonitor:
+    """
+    事件循环延迟监控
+
+    周期性睡眠interval秒，以实际唤醒时间超出预期的部分作为调度延迟；
+    延迟持续升高说明有同步代码阻塞了事件循环
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """在当前事件循环中启动监控任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """停止监控任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            event_loop_lag.observe(lag)
+            event_loop_lag_last.set(lag)
+
+
+# 创建全局实例
+loop_lag_monitor = EventLoopLagMonitor(settings.METRICS_LOOP_LAG_INTERVAL)
@@ -0,0 +1,287 @@
+"""
+请求频率限制
+基于GCRA（通用信元速率算法）按API密钥限流，每个密钥只保存一个时间戳，判断为O(1)；
+默认保存在进程内存中，多进程部署时可使用Redis共享状态
+"""
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings, ERROR_MESSAGES
+from models.response_models import ErrorResponse
+from utils.auth import validate_bearer_token, AuthenticationError
+from utils.json_response import dumps as json_dumps
+from utils.metrics import Counter, register_metric
+
+try:
+    import redis.asyncio as redis_asyncio
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RateLimitResult:
+    """限流判断结果"""
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float   # 被拒绝时距离可重试的秒数
+    reset_after: float   # 配额完全恢复所需的秒数
+
+
+def _gcra(tat: Optional[float], now: float, limit: int, window: float) -> Tuple[RateLimitResult, Optional[float]]:
+    """
+    GCRA判断
+
+    每个请求消耗 window/limit 秒的"理论到达时间"(TAT)，TAT超前当前时间不超过window时放行，
+    等价于窗口内最多limit个请求且允许突发，但不会出现固定窗口边界处的双倍流量
+
+    Args:
+        tat: 上次保存的理论到达时间，首次请求为None
+        now: 当前时间（秒）
+        limit: 窗口内允许的请求数
+        window: 窗口长度（秒）
+
+    Returns:
+        Tuple[RateLimitResult, Optional[float]]: 判断结果和需要保存的新TAT（拒绝时为None）
+    """
+    interval = window / limit
+    tat = max(tat or now, now)
+    new_tat = tat + interval
+    allow_at = new_tat - window
+
+    if now < allow_at:
+        return RateLimitResult(
+            allowed=False, limit=limit, remaining=0,
+            retry_after=allow_at - now, reset_after=tat - now
+        ), None
+
+    remaining = min(limit, int((now - allow_at) / interval + 1e-9))
+    return RateLimitResult(
+        allowed=True, limit=limit, remaining=remaining,
+        retry_after=0.0, reset_after=new_tat - now
+    ), new_tat
+
+
+class MemoryRateLimitBackend:
+    """进程内存限流存储"""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._tats: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    async def hit(self, key: str, limit: int, window: float) -> RateLimitResult:
+        now = time.monotonic()
+        with self._lock:
+            result, new_tat = _gcra(self._tats.get(key), now, limit, window)
+            if new_tat is not None:
+                self._tats[key] = new_tat
+                if len(self._tats) > self.max_keys:
+                    self._purge(now)
+        return result
+
+    def _purge(self, now: float):
+        """清理配额已完全恢复的键（TAT早于当前时间即与从未请求过等价）"""
+        expired = [key for key, tat in self._tats.items() if tat <= now]
+        for key in expired:
+            del self._tats[key]
+
+    async def ping(self) -> Optional[bool]:
+        """存储连通性检查，进程内存存储没有外部依赖，返回None"""
+        return None
+
+    async def close(self):
+        pass
+
+
+class RedisRateLimitBackend:
+    """Redis限流存储，GCRA判断在Lua脚本中原子执行，多个工作进程共享配额"""
+
+    # KEYS[1]: 键  ARGV: 当前时间(ms)、单个请求间隔(ms)、窗口(ms)
+    _SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - window
+if now < allow_at then
+  return {0, tostring(tat)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil(new_tat - now) + 1)
+return {1, tostring(tat)}
+"""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        if not HAS_REDIS:
+            raise RuntimeError("未安装redis，无法使用Redis限流存储")
+        self.prefix = prefix
+        self._client = redis_asyncio.from_url(url)
+        self._script = self._client.register_script(self._SCRIPT)
+
+    async def hit(self, key: str, limit: int, window: float) -> RateLimitResult:
+        now_ms = time.time() * 1000
+        interval_ms = window * 1000 / limit
+        allowed, tat_ms = await self._script(
+            keys=[self.prefix + key],
+            args=[now_ms, interval_ms, window * 1000]
+        )
+        # 以Redis返回的TAT在本地复算结果，保证与内存后端的计算口径一致
+        result, _ = _gcra(float(tat_ms) / 1000, now_ms / 1000, limit, window)
+        result.allowed = bool(allowed)
+        return result
+
+    async def ping(self) -> Optional[bool]:
+        """Redis连通性检查"""
+        return bool(await self._client.ping())
+
+    async def close(self):
+        await self._client.close()
+
+
+class RateLimiter:
+    """按API密钥限流"""
+
+    def __init__(self, backend, default_limit: int, window: float,
+                 key_limits: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            backend: 限流存储（MemoryRateLimitBackend或RedisRateLimitBackend）
+            default_limit: 窗口内默认允许的请求数
+            window: 窗口长度（秒）
+            key_limits: 按API密钥单独配置的请求数
+        """
+        self.backend = backend
+        self.default_limit = default_limit
+        self.window = window
+        self.key_limits = key_limits or {}
+        self.rejected = 0
+
+    def get_limit(self, api_key: Optional[str]) -> int:
+        """获取API密钥的配额"""
+        if api_key is not None and api_key in self.key_limits:
+            return self.key_limits[api_key]
+        return self.default_limit
+
+    @staticmethod
+    def identity(api_key: Optional[str], client_host: Optional[str]) -> str:
+        """
+        生成限流键：有Bearer Token时按密钥（取摘要，避免密钥明文出现在Redis中），否则按客户端地址
+        """
+        if api_key:
+            return "key:" + hashlib.sha1(api_key.encode("utf-8")).hexdigest()[:16]
+        return f"ip:{client_host or 'unknown'}"
+
+    async def hit(self, api_key: Optional[str], client_host: Optional[str]) -> RateLimitResult:
+        """
+        记录一次请求并判断是否放行
+
+        存储不可用时放行请求，避免限流组件故障导致服务不可用
+        """
+        limit = self.get_limit(api_key)
+        if limit <= 0:
+            return RateLimitResult(allowed=True, limit=0, remaining=0, retry_after=0.0, reset_after=0.0)
+        try:
+            result = await self.backend.hit(self.identity(api_key, client_host), limit, self.window)
+        except Exception as e:
+            logger.warning(f"限流存储不可用，放行请求: {str(e)}")
+            return RateLimitResult(allowed=True, limit=limit, remaining=limit, retry_after=0.0, reset_after=0.0)
+        if not result.allowed:
+            self.rejected += 1
+        return result
+
+
+class RateLimitMiddleware:
+    """
+    限流中间件（ASGI）
+
+    超出配额时返回429及Retry-After，放行的响应附带X-RateLimit-*头部
+    """
+
+    def __init__(self, app: ASGIApp, limiter: 'RateLimiter', exempt_paths=()):
+        self.app = app
+        self.limiter = limiter
+        self.exempt_paths = set(exempt_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        authorization = headers.get(b"authorization", b"").decode("latin-1")
+        try:
+            api_key = validate_bearer_token(authorization)
+        except AuthenticationError:
+            api_key = None
+        client = scope.get("client")
+        result = await self.limiter.hit(api_key, client[0] if client else None)
+
+        rate_headers = [
+            (b"x-ratelimit-limit", str(result.limit).encode()),
+            (b"x-ratelimit-remaining", str(result.remaining).encode()),
+            (b"x-ratelimit-reset", str(int(result.reset_after + 0.999)).encode()),
+        ]
+
+        if not result.allowed:
+            retry_after = str(max(1, int(result.retry_after + 0.999)))
+            logger.warning(f"请求频率超限: {self.limiter.identity(api_key, client[0] if client else None)}, "
+                           f"{retry_after}秒后可重试")
+            body = json_dumps(ErrorResponse(
+                error_code="RATE_LIMIT_EXCEEDED",
+                message=ERROR_MESSAGES["RATE_LIMIT_EXCEEDED"]
+            ))
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": rate_headers + [
+                    (b"retry-after", retry_after.encode()),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + rate_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+def create_rate_limiter() -> RateLimiter:
+    """根据配置创建限流器，Redis不可用时回退到内存存储"""
+    backend = None
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        try:
+            backend = RedisRateLimitBackend(settings.REDIS_URL)
+            logger.info("限流使用Redis存储")
+        except Exception as e:
+            logger.warning(f"无法使用Redis限流存储，回退到内存存储: {str(e)}")
+    if backend is None:
+        backend = MemoryRateLimitBackend()
+
+    return RateLimiter(
+        backend,
+        default_limit=settings.RATE_LIMIT_REQUESTS,
+        window=settings.RATE_LIMIT_WINDOW,
+        key_limits=settings.RATE_LIMIT_KEY_LIMITS
+    )
+
+
+# 创建全局实例
+rate_limiter = create_rate_limiter()
+register_metric(Counter("rate_limit_rejected_total", "因超出频率限制被拒绝的请求数")) \
+    .set_function(lambda: {(): rate_limiter.rejected})
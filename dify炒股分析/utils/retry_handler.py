@@ -6,8 +6,9 @@ import asyncio
 import time
 import random
 import logging
+import threading
 from functools import wraps
-from typing import Callable, Any, Optional, Tuple, List, Union
+from typing import Callable, Any, Dict, Optional, Tuple, List, Union
 from enum import Enum
 import requests
 from requests.exceptions import (
@@ -15,8 +16,23 @@ from requests.exceptions import (
     HTTPError, TooManyRedirects, ChunkedEncodingError
 )
 
+from utils.metrics import Counter, Gauge, register_metric
+
 logger = logging.getLogger(__name__)
 
+# 重试指标，function标签为被装饰函数名，取值范围固定
+retry_attempts = register_metric(Counter(
+    "retry_attempts_total",
+    "失败后发起的重试次数",
+    labelnames=("handler", "function")
+))
+
+retry_failures = register_metric(Counter(
+    "retry_failures_total",
+    "最终失败的调用次数（reason: non_retryable 不可重试, exhausted 重试耗尽, circuit_open 熔断器打开）",
+    labelnames=("handler", "function", "reason")
+))
+
 
 class RetryStrategy(Enum):
     """重试策略枚举"""
@@ -41,6 +57,137 @@ class NonRetryableError(NetworkError):
     pass
 
 
+class CircuitOpenError(NonRetryableError):
+    """熔断器处于打开状态，请求被直接拒绝"""
+    pass
+
+
+class CircuitState(Enum):
+    """熔断器状态枚举"""
+    CLOSED = "closed"         # 正常放行
+    OPEN = "open"             # 快速失败
+    HALF_OPEN = "half_open"   # 放行少量探测请求
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    连续失败达到failure_threshold次后打开，recovery_timeout秒内的请求直接失败，不再占用线程和重试等待；
+    之后进入半开状态放行half_open_max_calls个探测请求，成功则关闭，失败则重新打开
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        """
+        Args:
+            name: 熔断器名称
+            failure_threshold: 打开熔断器的连续失败次数
+            recovery_timeout: 打开后进入半开状态的等待时间(秒)
+            half_open_max_calls: 半开状态下同时放行的探测请求数
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def state(self) -> CircuitState:
+        """当前状态（打开超过recovery_timeout后视为半开）"""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> CircuitState:
+        if self._state == CircuitState.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def allow_request(self) -> bool:
+        """判断是否放行请求"""
+        with self._lock:
+            state = self._current_state()
+            if state == CircuitState.CLOSED:
+                return True
+            if state == CircuitState.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def release(self):
+        """归还未完成的探测名额（请求被取消，未得到成功或失败结果）"""
+        with self._lock:
+            if self._state == CircuitState.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_success(self):
+        """记录一次成功调用"""
+        with self._lock:
+            if self._state != CircuitState.CLOSED:
+                logger.info(f"熔断器恢复: {self.name}")
+            self._state = CircuitState.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        """记录一次失败调用"""
+        with self._lock:
+            self._failures += 1
+            state = self._current_state()
+            if state == CircuitState.HALF_OPEN or (
+                    state == CircuitState.CLOSED and self._failures >= self.failure_threshold):
+                self._state = CircuitState.OPEN
+                self._opened_at = time.monotonic()
+                logger.warning(f"熔断器打开: {self.name}, 连续失败{self._failures}次, "
+                               f"{self.recovery_timeout:.0f}秒内直接拒绝请求")
+
+    def get_stats(self) -> dict:
+        """获取熔断器状态"""
+        with self._lock:
+            state = self._current_state()
+            retry_in = self.recovery_timeout - (time.monotonic() - self._opened_at)
+            return {
+                "state": state.value,
+                "failures": self._failures,
+                "rejected": self.rejected,
+                "retry_in_seconds": round(retry_in, 1) if state == CircuitState.OPEN else 0
+            }
+
+
+# 熔断器注册表：名称 -> 熔断器
+circuit_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """
+    获取命名熔断器，不存在时按kwargs创建
+
+    Args:
+        name: 熔断器名称，如 "akshare:stock_zh_a_hist"
+        **kwargs: CircuitBreaker的构造参数
+
+    Returns:
+        CircuitBreaker: 熔断器实例
+    """
+    breaker = circuit_breakers.get(name)
+    if breaker is None:
+        breaker = circuit_breakers.setdefault(name, CircuitBreaker(name, **kwargs))
+    return breaker
+
+
+_CIRCUIT_STATE_VALUES = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+
+register_metric(Gauge("circuit_breaker_state", "熔断器状态（0 关闭, 1 半开, 2 打开）", labelnames=("name",))) \
+    .set_function(lambda: {(name,): _CIRCUIT_STATE_VALUES[breaker.state]
+                           for name, breaker in list(circuit_breakers.items())})
+
+
 class RetryHandler:
     """智能重试处理器"""
     
@@ -52,7 +199,8 @@ class RetryHandler:
         strategy: RetryStrategy = RetryStrategy.EXPONENTIAL,
         backoff_factor: float = 2.0,
         jitter: bool = True,
-        timeout: float = 30.0
+        timeout: float = 30.0,
+        name: str = "custom"
     ):
         """
         初始化重试处理器
@@ -65,7 +213,9 @@ class RetryHandler:
             backoff_factor: 退避因子(用于指数退避)
             jitter: 是否添加随机抖动
             timeout: 请求超时时间
+            name: 处理器名称，用作监控指标标签
         """
+        self.name = name
         self.max_retries = max_retries
         self.base_delay = base_delay
         self.max_delay = max_delay
@@ -165,19 +315,30 @@ class RetryHandler:
                         logger.error(f"{func.__name__} 达到最大重试次数({self.max_retries})")
                         break
                     
+                    # 熔断快速失败原样抛出，调用方可据此区分熔断与数据错误
+                    if isinstance(e, CircuitOpenError):
+                        retry_failures.inc(handler=self.name, function=func.__name__, reason="circuit_open")
+                        raise
+
                     if not self._is_retryable_error(e):
                         logger.error(f"{func.__name__} 遇到不可重试错误: {str(e)}")
+                        retry_failures.inc(handler=self.name, function=func.__name__, reason="non_retryable")
                         raise NonRetryableError(f"不可重试错误: {str(e)}") from e
                     
+                    if attempt > self.max_retries:
+                        break
+                    
                     delay = self._calculate_delay(attempt)
                     logger.warning(
                         f"{func.__name__} 第{attempt}次尝试失败: {str(e)}, "
                         f"{delay:.2f}秒后重试"
                     )
                     
+                    retry_attempts.inc(handler=self.name, function=func.__name__)
                     time.sleep(delay)
             
             # 所有重试都失败了
+            retry_failures.inc(handler=self.name, function=func.__name__, reason="exhausted")
             raise RetryableError(f"重试{self.max_retries}次后仍然失败: {str(last_exception)}") from last_exception
         
         return wrapper
@@ -205,19 +366,30 @@ class RetryHandler:
                         logger.error(f"{func.__name__} 达到最大重试次数({self.max_retries})")
                         break
                     
+                    # 熔断快速失败原样抛出，调用方可据此区分熔断与数据错误
+                    if isinstance(e, CircuitOpenError):
+                        retry_failures.inc(handler=self.name, function=func.__name__, reason="circuit_open")
+                        raise
+
                     if not self._is_retryable_error(e):
                         logger.error(f"{func.__name__} 遇到不可重试错误: {str(e)}")
+                        retry_failures.inc(handler=self.name, function=func.__name__, reason="non_retryable")
                         raise NonRetryableError(f"不可重试错误: {str(e)}") from e
                     
+                    if attempt > self.max_retries:
+                        break
+                    
                     delay = self._calculate_delay(attempt)
                     logger.warning(
                         f"{func.__name__} 第{attempt}次尝试失败: {str(e)}, "
                         f"{delay:.2f}秒后重试"
                     )
                     
+                    retry_attempts.inc(handler=self.name, function=func.__name__)
                     await asyncio.sleep(delay)
             
             # 所有重试都失败了
+            retry_failures.inc(handler=self.name, function=func.__name__, reason="exhausted")
             raise RetryableError(f"重试{self.max_retries}次后仍然失败: {str(last_exception)}") from last_exception
         
         return wrapper
@@ -230,7 +402,8 @@ default_retry_handler = RetryHandler(
     strategy=RetryStrategy.EXPONENTIAL,
     backoff_factor=2.0,
     jitter=True,
-    timeout=30.0
+    timeout=30.0,
+    name="default"
 )
 
 aggressive_retry_handler = RetryHandler(
@@ -240,7 +413,8 @@ aggressive_retry_handler = RetryHandler(
     strategy=RetryStrategy.EXPONENTIAL,
     backoff_factor=1.5,
     jitter=True,
-    timeout=45.0
+    timeout=45.0,
+    name="aggressive"
 )
 
 gentle_retry_handler = RetryHandler(
@@ -248,7 +422,8 @@ gentle_retry_handler = RetryHandler(
     base_delay=2.0,
     strategy=RetryStrategy.LINEAR,
     jitter=False,
-    timeout=20.0
+    timeout=20.0,
+    name="gentle"
 )
 
 